@@ -0,0 +1,445 @@
+from fowt_force_gen import fast_io
+from fowt_force_gen import filegen
+from fowt_force_gen import parse
+from fowt_force_gen import synthetic
+from fowt_force_gen import windbins
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+template_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'template_files')
+
+# Size of one benchmark input at 1x scale. A case is a 10-minute OC4 simulation with ~100 output channels; NDBC files
+# are one year of hourly standard meteorological, 10-minute continuous wind, and hourly ADCP data; a file campaign is
+# 5 wind speeds x 16 directions x 12 wave climates, the defaults of windbins.Wind and windbins.Wave.partition.
+case_length = 600.
+case_dt = .05
+case_channels = 100
+moordyn_params = ['Seg' + str(num) + 'Ten' for num in range(1, 7)]
+ndbc_rows = {'stdmet': (8760, 60), 'cwind': (52560, 10), 'adcp': (8760, 60)}
+campaign_speeds = 5
+campaign_directions = np.arange(0, 360, 22.5)
+campaign_climates = 12
+
+# Start-up time budget (s) of the filegen command line tool, which is run thousands of times from shell loops, and the
+# slow-to-import modules that importing it must not pull in
+startup_budget = 1.
+heavy_modules = ['scipy', 'pandas', 'matplotlib', 'windrose', 'bs4', 'requests', 'lxml']
+package_root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+class _Inputs:
+    """Synthetic benchmark inputs, generated on first use for each scale and shared by all benchmarks."""
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self._cache = {}
+
+    def _scale_dir(self, scale):
+        scale_dir = os.path.join(self.work_dir, 'scale' + str(scale))
+        if not os.path.isdir(scale_dir):
+            os.makedirs(scale_dir)
+        return scale_dir
+
+    def case(self, scale):
+        """Returns the file root of a synthetic OpenFAST case scale times the length of a 10-minute simulation."""
+        if ('case', scale) not in self._cache:
+            case_root = os.path.join(self._scale_dir(scale), 'bench_case')
+            synthetic.generate_output(case_root, tmax=case_length * scale, dt=case_dt, md_dt=case_dt,
+                                      num_channels=case_channels)
+            self._cache[('case', scale)] = case_root
+        return self._cache[('case', scale)]
+
+    def ndbc_file(self, scale, data_type):
+        """Returns the path of a synthetic NDBC file of data_type covering scale years."""
+        if (data_type, scale) not in self._cache:
+            ndbc_file = os.path.join(self._scale_dir(scale), 'bench_' + data_type + '.txt')
+            num_rows, interval = ndbc_rows[data_type]
+            synthetic.generate_ndbc_file(ndbc_file, data_type, num_rows * scale, interval)
+            self._cache[(data_type, scale)] = ndbc_file
+        return self._cache[(data_type, scale)]
+
+    def campaign_dir(self, scale, name):
+        """Returns an empty directory for the files a filegen benchmark writes."""
+        campaign_dir = os.path.join(self._scale_dir(scale), name)
+        if os.path.isdir(campaign_dir):
+            shutil.rmtree(campaign_dir)
+        os.makedirs(campaign_dir)
+        return campaign_dir
+
+
+def _uncached(function, *args):
+    """Returns a function calling function(*args) with an empty parse.get_channels cache, so every call reads files."""
+    def run():
+        parse.clear_cache()
+        return function(*args)
+    return run
+
+
+# Each benchmark takes the inputs and a scale, and returns (function to time, amount of work done per call, unit of
+# that amount). Throughput is reported as amount per second.
+
+def _bench_load_binary_output(inputs, scale):
+    outb_file = inputs.case(scale) + '.outb'
+    return lambda: fast_io.load_binary_output(outb_file), os.path.getsize(outb_file) / 1e6, 'MB'
+
+
+def _bench_get_param_data(inputs, scale):
+    outb_file = inputs.case(scale) + '.outb'
+    params = ['PtfmSurge', 'PtfmSway', 'ANCHTEN1', 'ANCHTEN2', 'ANCHTEN3']
+    num_steps = fast_io.read_output_header(outb_file)['NT']
+    return _uncached(parse.get_param_data, outb_file, params), num_steps * len(params) / 1e6, 'Mvalues'
+
+
+def _bench_get_moordyn_data(inputs, scale):
+    md_file = inputs.case(scale) + '.MD.Line1.out'
+    return _uncached(parse.get_moordyn_data, md_file, moordyn_params), os.path.getsize(md_file) / 1e6, 'MB'
+
+
+def _bench_output_parse(inputs, scale):
+    case_root = inputs.case(scale)
+    num_bytes = sum(os.path.getsize(case_root + extension)
+                    for extension in ['.outb', '.MD.Line1.out', '.MD.Line2.out', '.MD.Line3.out'])
+    return _uncached(parse.output_parse, case_root), num_bytes / 1e6, 'MB'
+
+
+def _bench_output_parse_threaded(inputs, scale):
+    function, amount, unit = _bench_output_parse(inputs, scale)
+    return _uncached(parse.output_parse, inputs.case(scale), 6, None, 4), amount, unit
+
+
+def _bench_make_distributions(inputs, scale):
+    param_data = parse.get_param_data(inputs.case(scale) + '.outb', [name for name, _ in synthetic.core_channels])
+    parse.clear_cache()
+    return lambda: parse.make_distributions(param_data), param_data.size / 1e6, 'Mvalues'
+
+
+def _bench_output_statistics(inputs, scale):
+    outb_file = inputs.case(scale) + '.outb'
+    params = [name for name, _ in synthetic.core_channels]
+    num_steps = fast_io.read_output_header(outb_file)['NT']
+    return lambda: parse.output_statistics(outb_file, params), num_steps * len(params) / 1e6, 'Mvalues'
+
+
+def _bench_fatigue_damage_sums(inputs, scale):
+    case_root = inputs.case(scale)
+    param_data = [parse.get_moordyn_data(case_root + '.MD.Line' + str(num) + '.out', moordyn_params)
+                  for num in [1, 2, 3]]
+    parse.clear_cache()
+    return lambda: parse.fatigue_damage_sums(param_data), sum(data.size for data in param_data) / 1e6, 'Mvalues'
+
+
+def _bench_get_met_data(inputs, scale):
+    ndbc_file = inputs.ndbc_file(scale, 'stdmet')
+    return lambda: windbins.get_met_data(ndbc_file), ndbc_rows['stdmet'][0] * scale / 1e3, 'krows'
+
+
+def _bench_get_wind_data(inputs, scale):
+    ndbc_file = inputs.ndbc_file(scale, 'cwind')
+    return lambda: windbins.get_wind_data(ndbc_file), ndbc_rows['cwind'][0] * scale / 1e3, 'krows'
+
+
+def _bench_get_current_data(inputs, scale):
+    ndbc_file = inputs.ndbc_file(scale, 'adcp')
+    return lambda: windbins.get_current_data(ndbc_file), ndbc_rows['adcp'][0] * scale / 1e3, 'krows'
+
+
+def _bench_get_datetimes(inputs, scale):
+    ndbc_file = inputs.ndbc_file(scale, 'stdmet')
+    return lambda: windbins.get_datetimes(ndbc_file), ndbc_rows['stdmet'][0] * scale / 1e3, 'krows'
+
+
+def _bench_read_ndbc_file(inputs, scale):
+    ndbc_file = inputs.ndbc_file(scale, 'stdmet')
+    return lambda: windbins.read_ndbc_file(ndbc_file), ndbc_rows['stdmet'][0] * scale / 1e3, 'krows'
+
+
+def _bench_get_bin_probabilities(inputs, scale):
+    wind = windbins.Wind(windbins.get_wind_data(inputs.ndbc_file(scale, 'cwind')))
+    return wind.get_bin_probabilities, ndbc_rows['cwind'][0] * scale / 1e3, 'krows'
+
+
+def _bench_wave_partition(inputs, scale):
+    ndbc_data = windbins.read_ndbc_file(inputs.ndbc_file(scale, 'stdmet'))
+    waves = windbins.Wave(windbins.get_met_data(ndbc_data), ndbc_data.index)
+    return lambda: waves.partition(by='season'), ndbc_rows['stdmet'][0] * scale / 1e3, 'krows'
+
+
+def _bench_filegen_startup(inputs, scale):
+    def run():
+        for _ in range(scale):
+            _run_python(['-m', 'fowt_force_gen.filegen', '--help'])
+    return run, scale, 'runs'
+
+
+def _speeds(scale):
+    return [round(speed, 2) for speed in np.linspace(4., 24., campaign_speeds * scale)]
+
+
+def _bench_inp_bulk_filegen(inputs, scale):
+    def run():
+        inp_dir = inputs.campaign_dir(scale, 'inp')
+        filegen.inp_bulk_filegen(os.path.join(template_dir, 'IECKAI_template.inp'), inp_dir + '/bench', _speeds(scale))
+    return run, campaign_speeds * scale, 'files'
+
+
+def _bench_inflowwind_bulk_filegen(inputs, scale):
+    inp_dir = inputs.campaign_dir(scale, 'inp_ifw')
+    filegen.inp_bulk_filegen(os.path.join(template_dir, 'IECKAI_template.inp'), inp_dir + '/bench', _speeds(scale))
+
+    def run():
+        ifw_dir = inputs.campaign_dir(scale, 'ifw')
+        filegen.inflowwind_bulk_filegen(os.path.join(template_dir, 'InflowWind_template.dat'),
+                                        ifw_dir + '/bench_InflowWind', inp_dir, campaign_directions, no_turbsim=True)
+    return run, campaign_speeds * scale * len(campaign_directions), 'files'
+
+
+def _bench_hydrodyn_bulk_filegen(inputs, scale):
+    num_climates = campaign_climates * scale
+    wave_climates = pd.DataFrame(data={'Significant Wave Height': np.linspace(1., 8., num_climates),
+                                       'Wave Direction': np.linspace(-180., 180., num_climates),
+                                       'Wave Period': np.linspace(6., 16., num_climates)})
+
+    def run():
+        hd_dir = inputs.campaign_dir(scale, 'hd')
+        filegen.hydrodyn_bulk_filegen(os.path.join(template_dir, 'OC4Semi_HydroDyn_template.dat'),
+                                      hd_dir + '/bench_HydroDyn', '200', wave_climates, [5., .5, 0.])
+    return run, num_climates, 'files'
+
+
+def _bench_fst_bulk_filegen(inputs, scale):
+    inp_dir = inputs.campaign_dir(scale, 'inp_fst')
+    ifw_dir = inputs.campaign_dir(scale, 'ifw_fst')
+    hd_dir = inputs.campaign_dir(scale, 'hd_fst')
+    filegen.inp_bulk_filegen(os.path.join(template_dir, 'IECKAI_template.inp'), inp_dir + '/bench', _speeds(scale))
+    filegen.inflowwind_bulk_filegen(os.path.join(template_dir, 'InflowWind_template.dat'),
+                                    ifw_dir + '/bench_InflowWind', inp_dir, campaign_directions, no_turbsim=True)
+    wave_climates = pd.DataFrame(data={'Significant Wave Height': np.linspace(1., 8., campaign_climates),
+                                       'Wave Direction': np.linspace(-180., 180., campaign_climates),
+                                       'Wave Period': np.linspace(6., 16., campaign_climates)})
+    filegen.hydrodyn_bulk_filegen(os.path.join(template_dir, 'OC4Semi_HydroDyn_template.dat'),
+                                  hd_dir + '/bench_HydroDyn', '200', wave_climates)
+
+    def run():
+        fst_dir = inputs.campaign_dir(scale, 'fst')
+        filegen.fst_bulk_filegen(os.path.join(template_dir, 'OC4Semi_OpenFAST_template.fst'), fst_dir + '/bench',
+                                 os.path.join(template_dir, 'OC4Semi_MoorDyn_fine_template.dat'), ifw_dir, hd_dir)
+    return run, campaign_speeds * scale * len(campaign_directions) * campaign_climates, 'files'
+
+
+benchmarks = {'load_binary_output': _bench_load_binary_output,
+              'get_param_data': _bench_get_param_data,
+              'get_moordyn_data': _bench_get_moordyn_data,
+              'output_parse': _bench_output_parse,
+              'output_parse_threaded': _bench_output_parse_threaded,
+              'make_distributions': _bench_make_distributions,
+              'output_statistics': _bench_output_statistics,
+              'fatigue_damage_sums': _bench_fatigue_damage_sums,
+              'get_met_data': _bench_get_met_data,
+              'get_wind_data': _bench_get_wind_data,
+              'get_current_data': _bench_get_current_data,
+              'get_datetimes': _bench_get_datetimes,
+              'read_ndbc_file': _bench_read_ndbc_file,
+              'get_bin_probabilities': _bench_get_bin_probabilities,
+              'wave_partition': _bench_wave_partition,
+              'filegen_startup': _bench_filegen_startup,
+              'inp_bulk_filegen': _bench_inp_bulk_filegen,
+              'inflowwind_bulk_filegen': _bench_inflowwind_bulk_filegen,
+              'hydrodyn_bulk_filegen': _bench_hydrodyn_bulk_filegen,
+              'fst_bulk_filegen': _bench_fst_bulk_filegen}
+
+
+def _run_python(args):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+    return subprocess.run([sys.executable] + args, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True).stdout
+
+
+def cli_startup_time(module='filegen', repeats=3):
+    """Returns the best wall time in seconds of `python -m fowt_force_gen.<module> --help` in a fresh interpreter."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _run_python(['-m', 'fowt_force_gen.' + module, '--help'])
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def imported_heavy_modules(module='filegen'):
+    """Returns which of heavy_modules importing fowt_force_gen.<module> loads, in a fresh interpreter."""
+    output = _run_python(['-c', 'import sys, fowt_force_gen.' + module + '; print(" ".join(sorted(sys.modules)))'])
+    loaded_modules = set(output.split())
+    return [name for name in heavy_modules if name in loaded_modules]
+
+
+def measure(function, repeats=3):
+    """
+    Times repeats calls of function and returns (best wall time in seconds, peak memory allocated during one call in
+    bytes). Memory is traced with tracemalloc in a separate call, so tracing overhead doesn't affect the timings.
+    Memory-mapped file pages aren't allocations and so aren't counted.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return min(times), peak_memory
+
+
+def run_benchmarks(names=None, scales=(1, 10, 100), repeats=3, work_dir=None, verbose=False):
+    """
+    Runs the named benchmarks (all of them by default) on synthetic inputs at each scale, where scale 1 is a realistic
+    input size (see the module constants) and inputs at scale n are n times larger. Inputs are written to work_dir,
+    or to a temporary directory that is removed afterwards.
+
+    Returns a list of result dicts with the keys 'benchmark', 'scale', 'seconds', 'amount', 'unit', 'throughput'
+    (amount per second), and 'peak_memory_mb'.
+    """
+    names = list(benchmarks) if names is None else names
+    for name in names:
+        if name not in benchmarks:
+            raise ValueError('Unknown benchmark ' + name + '. Choose from: ' + ', '.join(benchmarks))
+
+    temp_dir = None
+    if work_dir is None:
+        temp_dir = work_dir = tempfile.mkdtemp(prefix='fowt_benchmark_')
+    inputs = _Inputs(work_dir)
+
+    results = []
+    try:
+        for scale in scales:
+            for name in names:
+                function, amount, unit = benchmarks[name](inputs, scale)
+                seconds, peak_memory = measure(function, repeats)
+                result = {'benchmark': name, 'scale': scale, 'seconds': seconds, 'amount': amount, 'unit': unit,
+                          'throughput': amount / seconds if seconds > 0 else float('inf'),
+                          'peak_memory_mb': peak_memory / 1e6}
+                results.append(result)
+                if verbose:
+                    print(format_result(result))
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return results
+
+
+def format_result(result):
+    return '%-24s %5sx %10.4f s %12.2f %s/s %10.1f MB peak' % (result['benchmark'], result['scale'],
+                                                               result['seconds'], result['throughput'],
+                                                               result['unit'], result['peak_memory_mb'])
+
+
+def scaling_curves(results):
+    """
+    Returns a dict of {benchmark name: {'scales': [...], 'seconds': [...], 'exponent': e}} from run_benchmarks
+    results, where e is the slope of log(time) against log(scale), i.e. time grows as scale**e. An exponent near 1
+    means linear scaling; larger exponents mean throughput drops as inputs grow. The exponent is None for benchmarks
+    run at fewer than two scales.
+    """
+    curves = {}
+    for result in results:
+        curve = curves.setdefault(result['benchmark'], {'scales': [], 'seconds': []})
+        curve['scales'].append(result['scale'])
+        curve['seconds'].append(result['seconds'])
+
+    for curve in curves.values():
+        if len(set(curve['scales'])) > 1 and min(curve['seconds']) > 0:
+            curve['exponent'] = float(np.polyfit(np.log(curve['scales']), np.log(curve['seconds']), 1)[0])
+        else:
+            curve['exponent'] = None
+    return curves
+
+
+def compare_results(results, baseline_results, tolerance=.2):
+    """
+    Compares results against baseline_results (e.g. loaded from a previous run's JSON output) benchmark by benchmark
+    and scale by scale. Returns a list of (benchmark, scale, time ratio, memory ratio) for every benchmark that became
+    more than tolerance (a fraction) slower or more memory-hungry than the baseline.
+    """
+    baseline = {(result['benchmark'], result['scale']): result for result in baseline_results}
+    regressions = []
+    for result in results:
+        old_result = baseline.get((result['benchmark'], result['scale']))
+        if old_result is None:
+            continue
+        time_ratio = result['seconds'] / old_result['seconds'] if old_result['seconds'] > 0 else 1.
+        memory_ratio = result['peak_memory_mb'] / old_result['peak_memory_mb'] if old_result['peak_memory_mb'] > 0 \
+            else 1.
+        if time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance:
+            regressions.append((result['benchmark'], result['scale'], time_ratio, memory_ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the I/O and statistics hot paths of fowt_force_gen on '
+                                                 'synthetic inputs, reporting throughput, peak memory, and scaling')
+    parser.add_argument('-b', '--benchmarks', nargs='+', choices=list(benchmarks),
+                        help='Benchmarks to run (default: all)')
+    parser.add_argument('-s', '--scales', nargs='+', type=int, default=[1, 10, 100],
+                        help='Input sizes to run at, as multiples of a realistic input (default: 1 10 100)')
+    parser.add_argument('-r', '--repeats', type=int, default=3,
+                        help='Number of timed runs per benchmark; the best time is reported (default 3)')
+    parser.add_argument('-w', '--workdir', type=str,
+                        help='Directory to keep generated inputs in (default: a temporary directory)')
+    parser.add_argument('-o', '--output', type=str, help='JSON file to save the results to')
+    parser.add_argument('-bl', '--baseline', type=str,
+                        help='JSON results of a previous run to check for regressions against')
+    parser.add_argument('-t', '--tolerance', type=float, default=.2,
+                        help='Fractional slowdown or memory growth against the baseline counted as a regression '
+                             '(default 0.2)')
+    parser.add_argument('-sb', '--startupbudget', type=float, default=startup_budget,
+                        help='Start-up time budget in seconds of the filegen command line tool (default %.1f)'
+                             % startup_budget)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.benchmarks, args.scales, args.repeats, args.workdir, verbose=True)
+
+    print('\nScaling (time ~ scale^exponent):')
+    for name, curve in scaling_curves(results).items():
+        exponent = 'n/a' if curve['exponent'] is None else '%.2f' % curve['exponent']
+        print('%-24s %s' % (name, exponent))
+
+    startup_time = cli_startup_time('filegen')
+    print('\nfilegen start-up: %.3f s (budget %.3f s)' % (startup_time, args.startupbudget))
+    over_budget = startup_time > args.startupbudget
+    if over_budget:
+        print('filegen start-up is over budget; heavy modules imported: ' +
+              (', '.join(imported_heavy_modules('filegen')) or 'none'))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_results(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print('\nRegressions against ' + args.baseline + ':')
+            for name, scale, time_ratio, memory_ratio in regressions:
+                print('%-24s %5sx  time x%.2f  memory x%.2f' % (name, scale, time_ratio, memory_ratio))
+            raise SystemExit(1)
+        print('\nNo regressions against ' + args.baseline)
+    if over_budget:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
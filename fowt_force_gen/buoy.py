@@ -1,8 +1,17 @@
-from bs4 import BeautifulSoup
-import requests
 import argparse
 
 
+def get_soup(url):
+    """
+    Downloads a web page and returns it parsed by BeautifulSoup. requests and bs4 are imported here rather than with the
+    module, so scripts that import buoy only pay their import time when they actually go online.
+    """
+    from bs4 import BeautifulSoup
+    import requests
+
+    return BeautifulSoup(requests.get(url).content, 'lxml')
+
+
 def geo_match(latitude, longitude, search_radius='1000'):
     """
     Takes in a certain latitude and longitude coordinate and returns the nearest stationary NOAA buoy available on
@@ -16,8 +25,7 @@ def geo_match(latitude, longitude, search_radius='1000'):
     # Go to the URL reflecting the necessary search results
     search_url = 'https://www.ndbc.noaa.gov/radial_search.php?lat1='+\
                latitude.replace(' ', '')+'&lon1='+longitude.replace(' ', '')+'&uom=E&dist='+search_radius+'&ot=B&time=-8'
-    search_rss = requests.get(search_url)
-    soup = BeautifulSoup(search_rss.content, 'lxml')
+    soup = get_soup(search_url)
 
     try:
         nearest_buoy = soup.select_one("a[href*=station_page]").string
@@ -32,8 +40,7 @@ def get_water_depth(buoy_number):
     """Finds the water depth of a specified stationary NOAA buoy."""
 
     buoy_info_url = 'https://www.ndbc.noaa.gov/station_page.php?station=' + str(buoy_number)
-    buoy_info_rss = requests.get(buoy_info_url)
-    soup = BeautifulSoup(buoy_info_rss.content, 'lxml')
+    soup = get_soup(buoy_info_url)
     try:
         water_depth = float(soup.find('b', string='Water depth:').next_sibling[1:-2])
     except:
@@ -43,49 +50,51 @@ def get_water_depth(buoy_number):
     return water_depth
 
 
-def data_scraper(buoy_number):
+def data_scraper(buoy_number, all_years=False):
     """
     With a specific stationary NOAA buoy, identifies the most recent year of archived meteorological, wind, and current
     data and saves them as text files in the root directory. For example, if NOAA Station 45000 has meteorological data
     from 2011, 2012, 2015, and 2018, this function will return 'met_data_45000_2018.txt.'
+    If all_years is True, every archived year is saved instead (e.g. 'met_data_45000_2011.txt' to
+    'met_data_45000_2018.txt'), for climatology.Climatology.add_directory.
     """
     buoy_history_url = 'https://www.ndbc.noaa.gov/station_history.php?station=' + str(buoy_number)
-    buoy_history_rss = requests.get(buoy_history_url)
-    soup = BeautifulSoup(buoy_history_rss.content, 'lxml')
+    soup = get_soup(buoy_history_url)
 
     met_data_present = soup.find_all('b', string='Standard meteorological data: ')
     wind_data_present = soup.find('b', string='Continuous winds data: ')
     current_data_present = soup.find('b', string='Ocean current data: ')
 
+    def archived_years(data_dir):
+        years = [link.string for link in soup.select("a[href*=" + data_dir + "]")]
+        return years if all_years else years[-1:]
+
     if met_data_present:
-        most_recent_met_year = soup.select("a[href*=stdmet]")[-1].string
-        met_data_url = 'https://www.ndbc.noaa.gov/view_text_file.php?filename=' + str(buoy_number) +\
-        'h' + most_recent_met_year + '.txt.gz&dir=data/historical/stdmet/'
-        met_data_css = requests.get(met_data_url)
-        met_soup = BeautifulSoup(met_data_css.content, 'lxml')
-        met_data = met_soup.find_all(text=True)[0]
-        met_data_filename = 'met_data_'+buoy_number+'_'+most_recent_met_year+'.txt'
-        save_scraped_data(met_data_filename, met_data)
+        for met_year in archived_years('stdmet'):
+            met_data_url = 'https://www.ndbc.noaa.gov/view_text_file.php?filename=' + str(buoy_number) +\
+            'h' + met_year + '.txt.gz&dir=data/historical/stdmet/'
+            met_soup = get_soup(met_data_url)
+            met_data = met_soup.find_all(text=True)[0]
+            met_data_filename = 'met_data_'+buoy_number+'_'+met_year+'.txt'
+            save_scraped_data(met_data_filename, met_data)
 
     if wind_data_present:
-        most_recent_wind_year = soup.select("a[href*=cwind]")[-1].string
-        wind_data_url = 'https://www.ndbc.noaa.gov/view_text_file.php?filename=' + str(buoy_number) +\
-        'c' + most_recent_wind_year + '.txt.gz&dir=data/historical/cwind/'
-        wind_data_css = requests.get(wind_data_url)
-        wind_soup = BeautifulSoup(wind_data_css.content, 'lxml')
-        wind_data = wind_soup.find_all(text=True)[0]
-        wind_data_filename = 'wind_data_'+buoy_number+'_'+most_recent_wind_year+'.txt'
-        save_scraped_data(wind_data_filename, wind_data)
+        for wind_year in archived_years('cwind'):
+            wind_data_url = 'https://www.ndbc.noaa.gov/view_text_file.php?filename=' + str(buoy_number) +\
+            'c' + wind_year + '.txt.gz&dir=data/historical/cwind/'
+            wind_soup = get_soup(wind_data_url)
+            wind_data = wind_soup.find_all(text=True)[0]
+            wind_data_filename = 'wind_data_'+buoy_number+'_'+wind_year+'.txt'
+            save_scraped_data(wind_data_filename, wind_data)
 
     if current_data_present:
-        most_recent_curr_year = soup.select("a[href*=adcp]")[-1].string
-        curr_data_url = 'https://www.ndbc.noaa.gov/view_text_file.php?filename=' + str(buoy_number) +\
-        'a' + most_recent_curr_year + '.txt.gz&dir=data/historical/adcp/'
-        curr_data_css = requests.get(curr_data_url)
-        curr_soup = BeautifulSoup(curr_data_css.content, 'lxml')
-        curr_data = curr_soup.find_all(text=True)[0]
-        curr_data_filename = 'curr_data_'+buoy_number+'_'+most_recent_curr_year+'.txt'
-        save_scraped_data(curr_data_filename, curr_data)
+        for curr_year in archived_years('adcp'):
+            curr_data_url = 'https://www.ndbc.noaa.gov/view_text_file.php?filename=' + str(buoy_number) +\
+            'a' + curr_year + '.txt.gz&dir=data/historical/adcp/'
+            curr_soup = get_soup(curr_data_url)
+            curr_data = curr_soup.find_all(text=True)[0]
+            curr_data_filename = 'curr_data_'+buoy_number+'_'+curr_year+'.txt'
+            save_scraped_data(curr_data_filename, curr_data)
 
 
 def save_scraped_data(data_filename, scraped_data):
@@ -102,6 +111,8 @@ def main():
                         help='String input of longitude. Use decimal degrees and either E/W or +/- to notate direction.')
     parser.add_argument('-r', '--radius', help='Search radius surrounding the specified latitude and longitude')
     parser.add_argument('-w', '--writefiles', action='store_true', help='Writes data from found buoy to .txt files')
+    parser.add_argument('-a', '--allyears', action='store_true',
+                        help='With -w, writes every archived year of data instead of only the most recent year')
 
     args = parser.parse_args()
     if args.radius is None:
@@ -114,7 +125,7 @@ def main():
         raise argparse.ArgumentTypeError('radius must be a positive integer')
 
     if args.writefiles:
-        data_scraper(buoy)
+        data_scraper(buoy, args.allyears)
 
 
 if __name__ == "__main__":
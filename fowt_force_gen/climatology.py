@@ -0,0 +1,347 @@
+from fowt_force_gen import parse
+from fowt_force_gen import windbins
+import argparse
+import json
+import os
+import re
+import pandas as pd
+import numpy as np
+
+ClimatologyVersion = 1
+data_file_prefixes = {'met': 'met_data_', 'wind': 'wind_data_', 'current': 'curr_data_'}
+
+
+class ValueCounts:
+    """
+    Exact counts of the distinct values of a measurement (e.g. wind speeds at a resolution of .1 m/s) in each of
+    num_categories categories (e.g. direction sectors or wave divisions). NDBC values have a fixed resolution, so years
+    of measurements reduce to a few hundred distinct values, and medians and bin counts taken from the counts are the
+    same as those of the measurements themselves. Counts of the same categories can be merged.
+    """
+
+    def __init__(self, num_categories=1):
+        self.num_categories = num_categories
+        self.values = np.zeros(0)
+        self.counts = np.zeros([num_categories, 0], dtype=np.int64)
+
+    def update(self, values, categories=0):
+        """Adds measurements, each in the category of the same position in categories. NaN values aren't counted."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        categories = np.broadcast_to(np.asarray(categories, dtype=np.int64), values.shape)
+        keep = ~np.isnan(values)
+        values, categories = values[keep], categories[keep]
+        if len(values) and (categories.min() < 0 or categories.max() >= self.num_categories):
+            raise ValueError('Categories must be from 0 to %d.' % (self.num_categories - 1))
+
+        all_values = np.union1d(self.values, values)
+        counts = np.zeros([self.num_categories, len(all_values)], dtype=np.int64)
+        counts[:, np.searchsorted(all_values, self.values)] = self.counts
+        flat_idx = categories * len(all_values) + np.searchsorted(all_values, values)
+        counts += np.bincount(flat_idx, minlength=counts.size).reshape(counts.shape)
+        self.values, self.counts = all_values, counts
+        return self
+
+    def merge(self, other):
+        """Adds the counts of another ValueCounts of the same number of categories. Returns this ValueCounts."""
+        if other.num_categories != self.num_categories:
+            raise ValueError('Only ValueCounts of the same number of categories can be merged.')
+        all_values = np.union1d(self.values, other.values)
+        counts = np.zeros([self.num_categories, len(all_values)], dtype=np.int64)
+        counts[:, np.searchsorted(all_values, self.values)] += self.counts
+        counts[:, np.searchsorted(all_values, other.values)] += other.counts
+        self.values, self.counts = all_values, counts
+        return self
+
+    def value_counts(self, categories=None):
+        """Returns the counts of each value summed over categories (a list of category numbers, or all if None)."""
+        if categories is None:
+            return self.counts.sum(axis=0)
+        return self.counts[list(categories)].sum(axis=0)
+
+    def total(self, categories=None):
+        return int(self.value_counts(categories).sum())
+
+    def min(self, categories=None):
+        present = self.values[self.value_counts(categories) > 0]
+        return present[0] if len(present) else np.nan
+
+    def max(self, categories=None):
+        present = self.values[self.value_counts(categories) > 0]
+        return present[-1] if len(present) else np.nan
+
+    def median(self, categories=None):
+        """Returns the median of the values in categories, as numpy.nanmedian of the measurements gives it."""
+        cumulative = np.cumsum(self.value_counts(categories))
+        num_values = cumulative[-1] if len(cumulative) else 0
+        if num_values == 0:
+            return np.nan
+        upper = self.values[np.searchsorted(cumulative, num_values // 2, side='right')]
+        if num_values % 2:
+            return upper
+        lower = self.values[np.searchsorted(cumulative, num_values // 2 - 1, side='right')]
+        return (lower + upper) / 2
+
+    def to_dict(self):
+        present = self.counts.sum(axis=0) > 0
+        return {'num_categories': self.num_categories, 'values': self.values[present].tolist(),
+                'counts': self.counts[:, present].tolist()}
+
+    @classmethod
+    def from_dict(cls, value_counts_dict):
+        value_counts = cls(value_counts_dict['num_categories'])
+        value_counts.values = np.array(value_counts_dict['values'], dtype=np.float64)
+        value_counts.counts = np.array(value_counts_dict['counts'], dtype=np.int64).reshape(
+            value_counts.num_categories, len(value_counts.values))
+        return value_counts
+
+
+def year_fractions(datetimes):
+    """Returns the fraction of its calendar year elapsed at each of an array of numpy datetime64 values."""
+    datetimes = np.asarray(datetimes, dtype='datetime64[m]')
+    year_starts = datetimes.astype('datetime64[Y]')
+    year_length = ((year_starts + 1).astype('datetime64[m]') - year_starts.astype('datetime64[m]')).astype(np.float64)
+    return (datetimes - year_starts.astype('datetime64[m]')).astype(np.float64) / year_length
+
+
+class Climatology:
+    """
+    Multi-year wind, wave, and current climatology of a buoy, built one archived year at a time. Each year of NDBC
+    data is read once and reduced to exact counts of its distinct measurement values (see ValueCounts): wind and current
+    speeds by direction sector, and wave heights, periods, and directions by division of the year. Only these counts
+    are kept, so decades of data never have to be held in memory at once, and since the counts are kept per year, adding
+    or replacing a year (e.g. when a new year is archived) doesn't touch the others. The climatology can be saved to
+    and loaded from a JSON file.
+
+    The products are those of windbins for the measurements of the selected years taken together: get_bin_probabilities
+    gives the same probabilities as windbins.Wind.get_bin_probabilities of the concatenated wind data, and partition
+    gives the median wave climate of each division of the year over all the years. A division is a fraction of the
+    calendar year (e.g. about a month for 12 divisions), so for a single complete, evenly sampled year, partition gives
+    the same climates as windbins.Wave.partition.
+    """
+
+    def __init__(self, num_sectors=16, num_divisions=12):
+        self.num_sectors = num_sectors
+        self.num_divisions = num_divisions
+        self.year_data = {}
+
+    @property
+    def years(self):
+        return sorted(self.year_data)
+
+    def _directional_counts(self, speeds, directions):
+        """
+        Counts speeds by direction sector: categories 0 to num_sectors - 1 are the sectors, num_sectors is a direction
+        outside every sector, and num_sectors + 1 a missing direction.
+        """
+        sectors = windbins.sector_indices(directions, self.num_sectors)
+        sectors[sectors < 0] = self.num_sectors
+        sectors[np.isnan(np.asarray(directions, dtype=np.float64))] = self.num_sectors + 1
+        return ValueCounts(self.num_sectors + 2).update(speeds, sectors)
+
+    def add_year(self, met_file, wind_file=None, current_file=None, year=None):
+        """
+        Adds a year of NDBC data, replacing that year if it was already added. met_file is the standard meteorological
+        (stdmet) file of the year; wind_file (optional) is its continuous winds (cwind) file, used for the wind instead
+        of the winds of met_file as in pre_fast; current_file (optional) is its ocean current (adcp) file. Each may also
+        be the DataFrame windbins.read_ndbc_file returns for the file. year defaults to the year of the first
+        measurement of met_file. Returns the year.
+        """
+        met_frame = met_file if not isinstance(met_file, str) else windbins.read_ndbc_file(met_file)
+        met_data = windbins.get_met_data(met_frame)
+        if year is None:
+            year = int(met_frame.index[0].year)
+
+        wind_data = met_data if wind_file is None else windbins.get_wind_data(wind_file)
+        year_data = {'wind': self._directional_counts(wind_data['Wind Speed'], wind_data['Wind Direction'])}
+
+        divisions = np.minimum((year_fractions(met_frame.index.to_numpy()) * self.num_divisions).astype(np.int64),
+                               self.num_divisions - 1)
+        year_data['waves'] = {param: ValueCounts(self.num_divisions).update(met_data[param], divisions)
+                              for param in windbins.wave_params}
+
+        if current_file is not None:
+            current_data, current_depth = windbins.get_current_data(current_file)
+            year_data['current'] = self._directional_counts(current_data['Current Speed'],
+                                                            current_data['Current Direction'])
+            year_data['current_direction'] = ValueCounts().update(current_data['Current Direction'])
+            year_data['current_depth'] = current_depth
+
+        self.year_data[year] = year_data
+        return year
+
+    def add_directory(self, directory, buoy_number, replace=False):
+        """
+        Adds every year of a buoy's data files in a directory, named as buoy.data_scraper saves them (e.g.
+        'met_data_45000_2018.txt', with the matching 'wind_data_' and 'curr_data_' files if there are any). Years that
+        were already added are skipped unless replace is True. Returns the list of added years.
+        """
+        index = parse.get_directory_index(directory)
+        year_files = {}
+        for data_type, prefix in data_file_prefixes.items():
+            for filename in index.files('.txt', pattern=prefix + str(buoy_number) + '_*.txt'):
+                match = re.fullmatch(re.escape(prefix + str(buoy_number)) + r'_([0-9]{4})\.txt', filename)
+                if match:
+                    year_files.setdefault(int(match.group(1)), {})[data_type] = os.path.join(directory, filename)
+
+        added_years = []
+        for year, files in sorted(year_files.items()):
+            if 'met' not in files or (year in self.year_data and not replace):
+                continue
+            self.add_year(files['met'], files.get('wind'), files.get('current'), year)
+            added_years.append(year)
+        return added_years
+
+    def remove_year(self, year):
+        del self.year_data[year]
+
+    def merge(self, other):
+        """Adds the years of another climatology of the same sectors and divisions, replacing years in both."""
+        if (other.num_sectors, other.num_divisions) != (self.num_sectors, self.num_divisions):
+            raise ValueError('Only climatologies of the same sectors and divisions can be merged.')
+        self.year_data.update(other.year_data)
+        return self
+
+    def _merged(self, key, years=None):
+        """Returns the ValueCounts of key merged over years (all by default), or None if none of them have any."""
+        years = self.years if years is None else years
+        merged = None
+        for year in years:
+            year_counts = self.year_data[year].get(key)
+            if year_counts is not None:
+                merged = ValueCounts(year_counts.num_categories).merge(year_counts) if merged is None else \
+                    merged.merge(year_counts)
+        return merged
+
+    def _bin_counts(self, directional_counts, speed_edges):
+        """Returns (counts, num_valid) of directional counts as windbins.joint_bin_counts gives them."""
+        speed_idx = windbins.speed_bin_indices(directional_counts.values, speed_edges)
+        counts = np.zeros([len(speed_edges), self.num_sectors])
+        valid = speed_idx >= 0
+        for sector in range(self.num_sectors):
+            counts[:, sector] = np.bincount(speed_idx[valid], directional_counts.counts[sector][valid],
+                                            minlength=len(speed_edges))
+        num_valid = directional_counts.total(range(self.num_sectors + 1))
+        return counts, num_valid
+
+    def _speed_edges(self, directional_counts, speed_edges=None):
+        if speed_edges is None:
+            speed_edges = np.linspace(directional_counts.min(), directional_counts.max(), 6)
+        return np.asarray(speed_edges, dtype=np.float64)
+
+    def _bin_probabilities(self, key, years=None, speed_edges=None):
+        directional_counts = self._merged(key, years)
+        if directional_counts is None:
+            raise ValueError('None of the selected years have %s data.' % key)
+        speed_edges = self._speed_edges(directional_counts, speed_edges)
+        counts, num_valid = self._bin_counts(directional_counts, speed_edges)
+        return windbins.probability_frame(windbins.count_probabilities(counts, num_valid), speed_edges,
+                                          self.num_sectors)
+
+    def get_bin_probabilities(self, years=None, speed_edges=None):
+        """
+        Returns the wind speed and direction bin probabilities of the selected years (all by default) as
+        windbins.Wind.get_bin_probabilities returns them: five equally-spaced speed bins over the range of the selected
+        years (or the bins between speed_edges, if given) in rows, and direction sectors in columns.
+        """
+        return self._bin_probabilities('wind', years, speed_edges)
+
+    def get_current_bin_probabilities(self, years=None, speed_edges=None):
+        """Returns the current speed and direction bin probabilities of the selected years, as get_bin_probabilities."""
+        return self._bin_probabilities('current', years, speed_edges)
+
+    def year_bin_counts(self, speed_edges=None):
+        """
+        Returns the contribution of each year to the wind bins: a dict by year of (counts, num_valid) as
+        windbins.joint_bin_counts returns them, over the same speed_edges for every year (by default, the edges of
+        get_bin_probabilities over all the years). Summing the counts and num_valid of some of the years and passing
+        them to windbins.count_probabilities gives the probabilities of those years together.
+        """
+        if not self.years:
+            raise ValueError('No years have been added to the climatology.')
+        speed_edges = self._speed_edges(self._merged('wind'), speed_edges)
+        return {year: self._bin_counts(self.year_data[year]['wind'], speed_edges) for year in self.years}
+
+    def partition(self, years=None):
+        """
+        Returns the median significant wave height, wave direction, and wave period of each division of the year over
+        the selected years (all by default), as a DataFrame of the format of windbins.Wave.partition.
+        """
+        wave_partitions = {}
+        for param in windbins.wave_params:
+            merged = self._merged_wave_param(param, years)
+            wave_partitions[param] = [merged.median([division]) for division in range(self.num_divisions)]
+        return pd.DataFrame(data=wave_partitions)
+
+    def _merged_wave_param(self, param, years=None):
+        years = self.years if years is None else years
+        merged = ValueCounts(self.num_divisions)
+        for year in years:
+            merged.merge(self.year_data[year]['waves'][param])
+        return merged
+
+    def current_climate(self, years=None):
+        """
+        Returns [current depth, median current speed, median current direction] over the selected years, in the order
+        of the current_climate argument of filegen.hydrodyn_bulk_filegen. The depth is that of the latest year with
+        current data. Returns None if none of the years have current data.
+        """
+        years = [year for year in (self.years if years is None else years) if 'current' in self.year_data[year]]
+        if not years:
+            return None
+        current_depth = self.year_data[years[-1]]['current_depth']
+        return [current_depth, self._merged('current', years).median(),
+                self._merged('current_direction', years).median()]
+
+    def save(self, filename):
+        """Writes the climatology to a JSON file, replacing the file once it is complete."""
+        years = {}
+        for year, year_data in self.year_data.items():
+            years[str(year)] = {key: value.to_dict() if isinstance(value, ValueCounts) else value
+                                for key, value in year_data.items() if key != 'waves'}
+            years[str(year)]['waves'] = {param: counts.to_dict() for param, counts in year_data['waves'].items()}
+        temp_file = filename + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump({'version': ClimatologyVersion, 'num_sectors': self.num_sectors,
+                       'num_divisions': self.num_divisions, 'years': years}, f)
+        os.replace(temp_file, filename)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            saved = json.load(f)
+        if saved.get('version') != ClimatologyVersion:
+            raise ValueError('%s is not a climatology file of a supported version.' % filename)
+        climatology = cls(saved['num_sectors'], saved['num_divisions'])
+        for year, saved_year in saved['years'].items():
+            year_data = {key: ValueCounts.from_dict(value) if isinstance(value, dict) else value
+                         for key, value in saved_year.items() if key != 'waves'}
+            year_data['waves'] = {param: ValueCounts.from_dict(counts) for param, counts in saved_year['waves'].items()}
+            climatology.year_data[int(year)] = year_data
+        return climatology
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds or updates the multi-year wind, wave, and current climatology '
+                                                 'of a NOAA buoy from its archived data files')
+    parser.add_argument('-dir', '--datadir', type=str, default='.',
+                        help='Directory of the met_data_, wind_data_, and curr_data_ files saved by buoy')
+    parser.add_argument('-b', '--buoy', type=str, required=True, help='NOAA station number of the buoy')
+    parser.add_argument('-c', '--climatology', type=str, required=True,
+                        help='JSON climatology file to update with the years not already in it (created if missing)')
+    parser.add_argument('-fr', '--fileroot', type=str,
+                        help='Writes the wind bin probabilities and wave climates to CSV files named with this root')
+    args = parser.parse_args()
+
+    climatology = Climatology.load(args.climatology) if os.path.isfile(args.climatology) else Climatology()
+    added_years = climatology.add_directory(args.datadir, args.buoy)
+    climatology.save(args.climatology)
+    print('Added ' + str(len(added_years)) + ' years to ' + args.climatology + ' (' + str(len(climatology.years)) +
+          ' years in total)')
+
+    if args.fileroot:
+        climatology.get_bin_probabilities().to_csv(args.fileroot + '_bin_probabilities.csv')
+        climatology.partition().to_csv(args.fileroot + '_wave_climates.csv')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+from fowt_force_gen import fast_io
+from fowt_force_gen import result_store
+import os
+import numpy as np
+
+# Channels of case_extremes: platform offsets and anchor tensions from the .outb file, and the segment tensions of each
+# MoorDyn line, named as in parse.fatigue_channel_names
+outb_channels = ['PtfmSurge', 'PtfmSway', 'ANCHTEN1', 'ANCHTEN2', 'ANCHTEN3']
+
+
+class PeakAccumulator:
+    """
+    Streaming extremes of a set of channels: the maximum and minimum of each channel over every time series fed to it,
+    the maximum of each series (case), and the peaks over threshold. A peak is the largest value of an excursion above
+    the channel's threshold, so each excursion gives one peak however long it lasts. Data is fed one block of time
+    steps at a time with update, so a case is read in a single pass with only one block in memory; excursions that
+    span two blocks are joined. Call close at the end of each case. Accumulators of the same channels can be merged
+    (e.g. across seeds or across the cases of a wind bin) without rereading any outputs.
+    """
+
+    def __init__(self, channel_names, thresholds=None):
+        self.channel_names = list(channel_names)
+        num_channels = len(self.channel_names)
+        if thresholds is None:
+            thresholds = np.full(num_channels, np.inf)
+        self.thresholds = np.asarray(thresholds, dtype=np.float64).reshape(num_channels)
+        self.maxima = np.full(num_channels, -np.inf)
+        self.minima = np.full(num_channels, np.inf)
+        self.case_maxima = np.zeros([0, num_channels])
+        self.duration = 0.
+        self.num_steps = 0
+        self._peaks = [[] for _ in range(num_channels)]
+        self._case_max = np.full(num_channels, -np.inf)
+        self._excursion_max = np.full(num_channels, -np.inf)
+        self._in_excursion = np.zeros(num_channels, dtype=bool)
+        self._case_times = None
+
+    def update(self, time, chunk):
+        """Adds a block of time steps: time is a 1-D array and chunk a (time steps, channels) array."""
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(len(chunk), len(self.channel_names))
+        if len(chunk) == 0:
+            return
+        self._case_max = np.maximum(self._case_max, chunk.max(axis=0))
+        self.minima = np.minimum(self.minima, chunk.min(axis=0))
+        self._case_times = (time[0] if self._case_times is None else self._case_times[0], time[-1])
+        self.num_steps += len(chunk)
+
+        for col, threshold in enumerate(self.thresholds):
+            values = chunk[:, col]
+            above = values > threshold
+            # The maximum from the start of each run above the threshold up to the start of the next run is the
+            # maximum of the run, since the values in between are below the threshold
+            run_starts = np.flatnonzero(above & ~np.concatenate([[False], above[:-1]]))
+            run_maxima = np.maximum.reduceat(values, run_starts) if len(run_starts) else np.zeros(0)
+
+            if self._in_excursion[col]:
+                if above[0]:
+                    run_maxima[0] = max(run_maxima[0], self._excursion_max[col])
+                else:
+                    self._peaks[col].append(np.array([self._excursion_max[col]]))
+            self._in_excursion[col] = above[-1]
+            if above[-1]:
+                self._excursion_max[col] = run_maxima[-1]
+                run_maxima = run_maxima[:-1]
+            self._peaks[col].append(run_maxima)
+
+    def close(self):
+        """
+        Ends the current case: an excursion still open at its end counts as a peak, and the case maxima are recorded.
+        Returns this accumulator.
+        """
+        for col in np.flatnonzero(self._in_excursion):
+            self._peaks[col].append(np.array([self._excursion_max[col]]))
+        self._in_excursion[:] = False
+        if self._case_times is not None:
+            self.case_maxima = np.vstack([self.case_maxima, self._case_max])
+            self.maxima = np.maximum(self.maxima, self._case_max)
+            self.duration += self._case_times[1] - self._case_times[0]
+        self._case_max = np.full(len(self.channel_names), -np.inf)
+        self._case_times = None
+        return self
+
+    def merge(self, other):
+        """
+        Adds the closed cases of another accumulator of the same channels and thresholds. Returns this accumulator.
+        """
+        if other.channel_names != self.channel_names or not np.array_equal(other.thresholds, self.thresholds):
+            raise ValueError('Only accumulators of the same channels and thresholds can be merged.')
+        if other._case_times is not None or self._case_times is not None:
+            raise ValueError('Close both accumulators before merging them.')
+        self.maxima = np.maximum(self.maxima, other.maxima)
+        self.minima = np.minimum(self.minima, other.minima)
+        self.case_maxima = np.vstack([self.case_maxima, other.case_maxima])
+        self.duration += other.duration
+        self.num_steps += other.num_steps
+        for col in range(len(self.channel_names)):
+            self._peaks[col] += other._peaks[col]
+        return self
+
+    def peaks(self, channel):
+        """
+        Returns the array of peaks over threshold of a channel, given by name or index, in the order they occurred.
+        """
+        col = self.channel_names.index(channel) if isinstance(channel, str) else channel
+        return np.concatenate(self._peaks[col]) if self._peaks[col] else np.zeros(0)
+
+    def short_term_extremes(self, duration=3600., probability=np.exp(-1)):
+        """
+        Returns an array of the short-term extreme of each channel over duration seconds from a Weibull fit of its
+        peaks over threshold (see fit_weibull and weibull_extreme). The default probability gives the characteristic
+        largest value, which is close to the most probable maximum. Channels with fewer than 3 peaks give NaN.
+        """
+        extremes = np.full(len(self.channel_names), np.nan)
+        for col, threshold in enumerate(self.thresholds):
+            channel_peaks = self.peaks(col)
+            if len(channel_peaks) >= 3 and self.duration > 0:
+                shape, scale = fit_weibull(channel_peaks, threshold)
+                num_peaks = len(channel_peaks) * duration / self.duration
+                extremes[col] = weibull_extreme(shape, scale, threshold, num_peaks, probability)
+        return extremes
+
+
+def fit_weibull(peaks, threshold):
+    """
+    Fits a two-parameter Weibull distribution to the excesses of peaks over threshold by maximum likelihood. Returns
+    (shape, scale).
+    """
+    from scipy import stats  # scipy is imported where it is used, to keep imports of this module quick
+
+    shape, _, scale = stats.weibull_min.fit(np.asarray(peaks) - threshold, floc=0)
+    return shape, scale
+
+
+def weibull_extreme(shape, scale, threshold, num_peaks, probability=np.exp(-1)):
+    """
+    Returns the value not exceeded with the given probability by the largest of num_peaks independent peaks following
+    the fitted Weibull peak distribution (see fit_weibull). The default probability of exp(-1) gives the characteristic
+    largest value, which tends to the most probable maximum as num_peaks grows.
+    """
+    peak_probability = probability ** (1. / num_peaks)
+    return threshold + scale * (-np.log(1. - peak_probability)) ** (1. / shape)
+
+
+def fit_gumbel(maxima):
+    """
+    Fits a Gumbel distribution to maxima (e.g. PeakAccumulator.case_maxima of one channel over the seeds of a wind bin)
+    by maximum likelihood. Returns (location, scale).
+    """
+    from scipy import stats
+
+    location, scale = stats.gumbel_r.fit(np.asarray(maxima))
+    return location, scale
+
+
+def gumbel_extreme(location, scale, probability=np.exp(-1)):
+    """Returns the value not exceeded with the given probability by a fitted Gumbel distribution (see fit_gumbel)."""
+    from scipy import stats
+
+    return stats.gumbel_r.ppf(probability, location, scale)
+
+
+def case_extremes(output_file_root, thresholds=None, num_line_segments=6, chunk_size=100000):
+    """
+    Finds the extremes of the platform offsets and anchor tensions of a case's .outb file and the segment tensions of
+    each of its MoorDyn line files, reading each file once in blocks of chunk_size time steps.
+
+    Arguments:
+        output_file_root is the filename of the output files minus the extension, as in parse.output_parse.
+        thresholds (optional) is a dict of peak-over-threshold thresholds by channel name. Channels are named as in
+            outb_channels and parse.fatigue_channel_names (e.g. 'ANCHTEN1', 'Line2Seg6Ten'). Channels without a
+            threshold only track maxima.
+    Returns a dict of closed PeakAccumulators by file: 'outb', 'Line1', 'Line2', and 'Line3'.
+    """
+    thresholds = {} if thresholds is None else thresholds
+    moordyn_params = ['Seg' + str(num) + 'Ten' for num in range(1, num_line_segments + 1)]
+
+    def accumulator(channel_names):
+        return PeakAccumulator(channel_names, [thresholds.get(name, np.inf) for name in channel_names])
+
+    extremes = {'outb': accumulator(outb_channels)}
+    for time, chunk in fast_io.iter_binary_output(output_file_root + '.outb', outb_channels, chunk_size):
+        extremes['outb'].update(time, chunk)
+    extremes['outb'].close()
+
+    for line_num in [1, 2, 3]:
+        group = 'Line' + str(line_num)
+        extremes[group] = accumulator([group + param for param in moordyn_params])
+        md_line_file = output_file_root + '.MD.' + group + '.out'
+        for chunk in fast_io.iter_ascii_output(md_line_file, ['Time'] + moordyn_params, chunk_size):
+            extremes[group].update(chunk[:, 0], chunk[:, 1:])
+        extremes[group].close()
+
+    return extremes
+
+
+def bin_extremes(output_file_roots, thresholds=None, num_line_segments=6, chunk_size=100000):
+    """
+    Finds the case_extremes of every case of a campaign and merges the cases of each environmental bin (e.g. the seeds
+    of a wind speed, wind direction, and wave climate). Returns a dict keyed by (wind speed, wind direction, climate) as
+    parsed by result_store.parse_case_name, of dicts of merged PeakAccumulators as returned by case_extremes.
+    """
+    binned_extremes = {}
+    for output_file_root in output_file_roots:
+        case_info = result_store.parse_case_name(os.path.basename(output_file_root))
+        bin_key = (case_info['wind_speed'], case_info['wind_direction'], case_info['climate'])
+        extremes = case_extremes(output_file_root, thresholds, num_line_segments, chunk_size)
+        if bin_key in binned_extremes:
+            for group, accumulator in extremes.items():
+                binned_extremes[bin_key][group].merge(accumulator)
+        else:
+            binned_extremes[bin_key] = extremes
+    return binned_extremes
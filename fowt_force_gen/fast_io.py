@@ -19,9 +19,11 @@ Created on 03/09/2015
 @author: MMPE
 Copied from https://github.com/WISDEM/AeroelasticSE/tree/openmdao1/src/AeroelasticSE/old_files on 15 Aug 2016 by Ganesh Vijayakumar
 '''
+import collections
 import os
+import json
+from multiprocessing import shared_memory
 import numpy as np
-import struct
 
 
 def load_output(filename):
@@ -55,112 +57,802 @@ def load_output(filename):
     return load_ascii_output(filename) + (np.ones(1),)
 
 
-def load_ascii_output(filename):
+def read_text_header(filename, max_header_lines=50):
+    """
+    Reads the header of a FAST or MoorDyn text output file. The channel name line is the first line starting with
+    'Time', optionally followed by a line of units in parentheses; any lines before it are FAST's banner, of which
+    the last non-empty line is the description. Returns the description, channel names, channel units, and the
+    number of header lines to skip before the data.
+    """
     with open(filename) as f:
-        info = {}
-        info['name'] = os.path.splitext(os.path.basename(filename))[0]
+        header = []
+        for _ in range(max_header_lines):
+            line = f.readline()
+            if not line:
+                break
+            header.append(line)
+            if line.split()[:1] == ['Time']:
+                break
+        else:
+            raise ValueError('Could not find the channel name line in the header of %s' % filename)
+        if not header or header[-1].split()[:1] != ['Time']:
+            raise ValueError('Could not find the channel name line in the header of %s' % filename)
+
+        names = header[-1].split()
+        banner = [line.strip() for line in header[:-1] if line.strip()]
+        description = banner[-1] if banner else ''
+        num_header_lines = len(header)
+
+        units_line = f.readline().split()
+        if units_line and all(unit.startswith('(') for unit in units_line):
+            units = [unit[1:-1] for unit in units_line]  # removing "()"
+            num_header_lines += 1
+        else:
+            units = [''] * len(names)
+
+    return description, names, units, num_header_lines
+
+
+def load_ascii_output(filename, param_names=None, dtype=np.float64):
+    """
+    Reads a FAST (.out) or MoorDyn (.MD.out, .MD.Line#.out) text output file. The header is parsed once, then only
+    the requested channels are converted in a single pass of pandas' C parser.
+
+    Arguments:
+        filename is the path to the text output file.
+        param_names is a list of the channel names to return, in the order they should be returned. If None, all
+            channels are returned in file order.
+        dtype is the numpy dtype of the returned data, e.g. np.float32 to halve the memory of large files.
+    Returns the data as a numpy array with one column per channel, and an info dict of the same format as
+    load_binary_output (with attribute_names and attribute_units restricted to the returned channels). Raises
+    ValueError if a requested channel is not in the file.
+    """
+    description, names, units, num_header_lines = read_text_header(filename)
+    if param_names is None:
+        param_names = names
+    param_cols = [names.index(param) for param in param_names]
+
+    import pandas as pd  # imported here, as pandas is slow to import and only needed for text files
+
+    data = pd.read_csv(filename, sep=r'\s+', header=None, skiprows=num_header_lines,
+                       usecols=sorted(set(param_cols)), dtype=dtype, engine='c')
+    data = data[param_cols].to_numpy(dtype=dtype)
+
+    info = {'name': os.path.splitext(os.path.basename(filename))[0],
+            'description': description,
+            'attribute_names': list(param_names),
+            'attribute_units': [units[col] for col in param_cols]}
+    return data, info
+
+
+FileFmtID_WithTime = 1  # File identifiers used in FAST
+FileFmtID_WithoutTime = 2
+FileFmtID_NoCompressWithoutTime = 3
+LenName = 10  # number of characters per channel name
+LenUnit = 10  # number of characters per unit name
+
+
+def iter_ascii_output(filename, param_names=None, chunk_size=100000, dtype=np.float64):
+    """
+    Generator yielding blocks of at most chunk_size rows of the specified channels of a FAST or MoorDyn text output
+    file (see load_ascii_output), so files larger than memory can be streamed.
+    """
+    description, names, units, num_header_lines = read_text_header(filename)
+    if param_names is None:
+        param_names = names
+    param_cols = [names.index(param) for param in param_names]
+
+    import pandas as pd  # imported here, as pandas is slow to import and only needed for text files
+
+    reader = pd.read_csv(filename, sep=r'\s+', header=None, skiprows=num_header_lines,
+                         usecols=sorted(set(param_cols)), dtype=dtype, engine='c', chunksize=chunk_size)
+    with reader:
+        for chunk in reader:
+            yield chunk[param_cols].to_numpy(dtype=dtype)
+
+
+def _read_binary_header(fid):
+    """
+    Reads the header of a FAST binary output file from an open file object, leaving the file positioned at the start
+    of the packed time series. Returns a dict of the header values, including the byte offsets of the packed time and
+    channel blocks.
+    """
+
+    def fread(n, dtype):
+        values = np.fromfile(fid, dtype=dtype, count=n)
+        if len(values) < n:
+            raise Exception('Could not read header of %s' % fid.name)
+        return values
+
+    header = {}
+    header['FileID'] = int(fread(1, '<i2')[0])  # FAST output file format, INT(2)
+    header['NumOutChans'] = int(fread(1, '<i4')[0])  # The number of output channels, INT(4)
+    header['NT'] = int(fread(1, '<i4')[0])  # The number of time steps, INT(4)
+
+    if header['FileID'] == FileFmtID_WithTime:
+        header['TimeScl'] = float(fread(1, '<f8')[0])  # The time slopes for scaling, REAL(8)
+        header['TimeOff'] = float(fread(1, '<f8')[0])  # The time offsets for scaling, REAL(8)
+    else:
+        header['TimeOut1'] = float(fread(1, '<f8')[0])  # The first time in the time series, REAL(8)
+        header['TimeIncr'] = float(fread(1, '<f8')[0])  # The time increment, REAL(8)
+
+    if header['FileID'] != FileFmtID_NoCompressWithoutTime:
+        # The channel slopes and offsets for scaling, REAL(4)
+        header['ColScl'] = fread(header['NumOutChans'], '<f4').astype(np.float64)
+        header['ColOff'] = fread(header['NumOutChans'], '<f4').astype(np.float64)
+
+    LenDesc = int(fread(1, '<i4')[0])  # The number of characters in the description string, INT(4)
+    header['DescStr'] = fread(LenDesc, 'u1').tobytes().decode('latin-1').strip()
+
+    # Channel names and units are fixed-width ASCII fields, including the 'Time' channel
+    names = fread(LenName * (header['NumOutChans'] + 1), 'u1').reshape(-1, LenName)
+    units = fread(LenUnit * (header['NumOutChans'] + 1), 'u1').reshape(-1, LenUnit)
+    header['ChanName'] = [name.tobytes().decode('latin-1').strip() for name in names]
+    header['ChanUnit'] = [unit.tobytes().decode('latin-1').strip()[1:-1] for unit in units]
+
+    header['TimeStart'] = fid.tell()  # byte offset of the packed time block
+    if header['FileID'] == FileFmtID_WithTime:
+        header['DataStart'] = header['TimeStart'] + 4 * header['NT']
+    else:
+        header['DataStart'] = header['TimeStart']  # byte offset of the packed channel block
+
+    return header
+
+
+IndexSuffix = '.fidx'  # sidecar header index written next to a binary output file by write_output_index
+IndexVersion = 1
+header_cache_size = 4096  # number of headers memoized by read_output_header
+_header_cache = collections.OrderedDict()
+
+
+def _file_signature(filename):
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _copy_header(header):
+    """Returns a copy of a header dict whose channel lists and scaling arrays can be changed without side effects."""
+    return {key: value.copy() if isinstance(value, (list, np.ndarray)) else value for key, value in header.items()}
+
+
+def read_output_header(filename, use_index=True, write_index=False):
+    """
+    Returns the header dict of a FAST binary output file (see _read_binary_header). When use_index is True, the header
+    is taken from a sidecar index file (filename + IndexSuffix) if one exists and its recorded file size and
+    modification time still match the output file; otherwise the header is parsed, and a new sidecar is written if
+    write_index is True. The last header_cache_size headers are also memoized within the process, so repeated opens of
+    an unchanged file never touch the file itself beyond a stat call. The returned dict is the caller's own copy.
+    """
+    signature = _file_signature(filename)
+    key = os.path.abspath(filename)
+    index_file = filename + IndexSuffix
+    if use_index and key in _header_cache and _header_cache[key][0] == signature:
+        _header_cache.move_to_end(key)
+        if write_index and not os.path.isfile(index_file):
+            write_output_index(filename, _header_cache[key][1], signature)
+        return _copy_header(_header_cache[key][1])
+
+    header = None
+    if use_index and os.path.isfile(index_file):
         try:
-            header = [f.readline() for _ in range(8)]
-            info['description'] = header[4].strip()
-            info['attribute_names'] = header[6].split()
-            info['attribute_units'] = [unit[1:-1] for unit in header[7].split()]  # removing "()"
-            data = np.array([line.split() for line in f.readlines()]).astype(np.float)
-            return data, info
-
-        except (ValueError, AssertionError):
-            raise
+            with open(index_file) as f:
+                index = json.load(f)
+            if index['version'] == IndexVersion and tuple(index['signature']) == signature:
+                header = index['header']
+                for key_name in ['ColScl', 'ColOff']:
+                    if key_name in header:
+                        header[key_name] = np.array(header[key_name], dtype=np.float64)
+        except (ValueError, KeyError, OSError):
+            header = None
+
+    if header is None:
+        with open(filename, 'rb') as fid:
+            header = _read_binary_header(fid)
+        if use_index and write_index:
+            write_output_index(filename, header, signature)
+
+    if use_index and header_cache_size > 0:
+        _header_cache[key] = (signature, header)
+        _header_cache.move_to_end(key)
+        while len(_header_cache) > header_cache_size:
+            _header_cache.popitem(last=False)
+    return _copy_header(header)
 
 
-def load_binary_output(filename):
+def write_output_index(filename, header=None, signature=None):
     """
-    Ported from ReadFASTbinary.m by Mads M Pedersen, DTU Wind
-    Info about ReadFASTbinary.m:
-    Author: Bonnie Jonkman, National Renewable Energy Laboratory
-    (c) 2012, National Renewable Energy Laboratory
-    Edited for FAST v7.02.00b-bjj  22-Oct-2012
+    Writes the sidecar header index for a FAST binary output file. The index is written to a temporary file and moved
+    into place so concurrent readers never see a partial index. Unwritable directories are silently skipped, as the
+    index is only an accelerator.
     """
+    if header is None:
+        with open(filename, 'rb') as fid:
+            header = _read_binary_header(fid)
+    if signature is None:
+        signature = _file_signature(filename)
 
-    def fread(fid, n, type):
-        fmt, nbytes = \
-        {'uint8': ('B', 1), 'int16': ('h', 2), 'int32': ('i', 4), 'float32': ('f', 4), 'float64': ('d', 8)}[type]
-        return struct.unpack(fmt * n, fid.read(nbytes * n))
+    index_header = dict(header)
+    for key_name in ['ColScl', 'ColOff']:
+        if key_name in index_header:
+            index_header[key_name] = [float(val) for val in index_header[key_name]]
+    index = {'version': IndexVersion, 'signature': list(signature), 'header': index_header}
 
-    FileFmtID_WithTime = 1  # File identifiers used in FAST
-    FileFmtID_WithoutTime = 2
-    FileFmtID_NoCompressWithoutTime = 3
-    LenName = 10  # number of characters per channel name
-    LenUnit = 10  # number of characters per unit name
+    index_file = filename + IndexSuffix
+    temp_file = index_file + '.' + str(os.getpid()) + '.tmp'
+    try:
+        with open(temp_file, 'w') as f:
+            json.dump(index, f)
+        os.replace(temp_file, index_file)
+    except OSError:
+        if os.path.isfile(temp_file):
+            os.remove(temp_file)
 
-    with open(filename, 'rb') as fid:
-        FileID = fread(fid, 1, 'int16')[0]  # FAST output file format, INT(2)
-        NumOutChans = fread(fid, 1, 'int32')[0]  # The number of output channels, INT(4)
-        NT = fread(fid, 1, 'int32')[0]  # The number of time steps, INT(4)
 
-        if FileID == FileFmtID_WithTime:
-            TimeScl = fread(fid, 1, 'float64')  # The time slopes for scaling, REAL(8)
-            TimeOff = fread(fid, 1, 'float64')  # The time offsets for scaling, REAL(8)
-        else:
-            TimeOut1 = fread(fid, 1, 'float64')  # The first time in the time series, REAL(8)
-            TimeIncr = fread(fid, 1, 'float64')  # The time increment, REAL(8)
+def find_files_with_channel(channel, file_directory, file_extension='.outb', write_index=False):
+    """
+    Returns a sorted list of the filenames in file_directory with extension file_extension whose binary output header
+    contains the specified channel. Only the sidecar indexes are read for files that have already been indexed; with
+    write_index=True, files that haven't are indexed so later searches are faster.
+    """
+    matching_files = []
+    for filename in sorted(os.listdir(file_directory)):
+        if filename.endswith(file_extension):
+            header = read_output_header(os.path.join(file_directory, filename), write_index=write_index)
+            if channel in header['ChanName']:
+                matching_files.append(filename)
+    return matching_files
 
-        if FileID != FileFmtID_NoCompressWithoutTime:
-            ColScl = fread(fid, NumOutChans, 'float32')  # The channel slopes for scaling, REAL(4)
-            ColOff = fread(fid, NumOutChans, 'float32')  # The channel offsets for scaling, REAL(4)
 
-        LenDesc = fread(fid, 1, 'int32')[0]  # The number of characters in the description string, INT(4)
-        DescStrASCII = fread(fid, LenDesc, 'uint8')  # DescStr converted to ASCII
-        DescStr = "".join(map(chr, DescStrASCII)).strip()
+def load_binary_output(filename, dtype=np.float64, return_pack=True):
+    """
+    Ported from ReadFASTbinary.m by Mads M Pedersen, DTU Wind
+    Info about ReadFASTbinary.m:
+    Author: Bonnie Jonkman, National Renewable Energy Laboratory
+    (c) 2012, National Renewable Energy Laboratory
+    Edited for FAST v7.02.00b-bjj  22-Oct-2012
 
-        ChanName = []  # initialize the ChanName cell array
-        for iChan in range(NumOutChans + 1):
-            ChanNameASCII = fread(fid, LenName, 'uint8')  # ChanName converted to numeric ASCII
-            ChanName.append("".join(map(chr, ChanNameASCII)).strip())
+    The packed time and channel blocks are read directly into typed numpy arrays, and the returned data and pack
+    arrays are allocated once with the time column in place. Use dtype=np.float32 to halve the memory of the scaled
+    data, and return_pack=False to skip the unscaled pack array (None is returned in its place). To keep the data in
+    its packed int16 form instead, use load_packed_output.
+    """
 
-        ChanUnit = []  # initialize the ChanUnit cell array
-        for iChan in range(NumOutChans + 1):
-            ChanUnitASCII = fread(fid, LenUnit, 'uint8')  # ChanUnit converted to numeric ASCII
-            ChanUnit.append("".join(map(chr, ChanUnitASCII)).strip()[1:-1])
+    header = read_output_header(filename)
+    with open(filename, 'rb') as fid:
+        fid.seek(header['TimeStart'])
+        FileID = header['FileID']
+        NumOutChans = header['NumOutChans']
+        NT = header['NT']
 
         # get the channel time series
         nPts = NT * NumOutChans  # number of data points in the file
         if FileID == FileFmtID_WithTime:
-            PackedTime = fread(fid, NT, 'int32')  # read the time data
+            PackedTime = np.fromfile(fid, dtype='<i4', count=NT)  # read the time data
             cnt = len(PackedTime)
             if cnt < NT:
                 raise Exception('Could not read entire %s file: read %d of %d time values' % (filename, cnt, NT))
 
         if FileID == FileFmtID_NoCompressWithoutTime:
-            PackedData = fread(fid, nPts, 'float64')  # read the channel data
+            PackedData = np.fromfile(fid, dtype='<f8', count=nPts)  # read the channel data
         else:
-            PackedData = fread(fid, nPts, 'int16')  # read the channel data
+            PackedData = np.fromfile(fid, dtype='<i2', count=nPts)  # read the channel data
 
         cnt = len(PackedData)
         if cnt < nPts:
             raise Exception('Could not read entire %s file: read %d of %d values' % (filename, cnt, nPts))
 
+    PackedData = PackedData.reshape(NT, NumOutChans)
+    if FileID == FileFmtID_WithTime:
+        time = (PackedTime - header['TimeOff']) / header['TimeScl']
+    else:
+        time = header['TimeOut1'] + header['TimeIncr'] * np.arange(NT)
+
+    data = np.empty((NT, NumOutChans + 1), dtype=dtype)
+    data[:, 0] = time
     if FileID == FileFmtID_NoCompressWithoutTime:
-        pack = np.array(PackedData).reshape(NT, NumOutChans)
-        data = pack
+        data[:, 1:] = PackedData
     else:
         # Scale the packed binary to real data
-        pack = np.array(PackedData).reshape(NT, NumOutChans)
-        data = (pack - ColOff) / ColScl
+        np.subtract(PackedData, header['ColOff'], out=data[:, 1:])
+        np.divide(data[:, 1:], header['ColScl'], out=data[:, 1:])
 
-    if FileID == FileFmtID_WithTime:
-        time = (np.array(PackedTime) - TimeOff) / TimeScl;
+    if not return_pack:
+        pack = None
+    elif FileID == FileFmtID_NoCompressWithoutTime and data.dtype == np.float64:
+        pack = data.copy()
     else:
-        time = TimeOut1 + TimeIncr * np.arange(NT)
-
-    data = np.concatenate([time.reshape(NT, 1), data], 1)
-    pack = np.concatenate([time.reshape(NT, 1), pack], 1)
+        pack = np.empty((NT, NumOutChans + 1))
+        pack[:, 0] = time
+        pack[:, 1:] = PackedData
 
     info = {'name': os.path.splitext(os.path.basename(filename))[0],
-            'description': DescStr,
-            'attribute_names': ChanName,
-            'attribute_units': ChanUnit}
+            'description': header['DescStr'],
+            'attribute_names': header['ChanName'],
+            'attribute_units': header['ChanUnit']}
     return data, info, pack
 
 
+class PackedData:
+    """
+    Channel data kept in FAST's packed form: an (NT, channels) array of int16 values alongside the per-channel scale
+    and offset vectors, so that real data = (pack - offset) / scale. This takes a quarter of the memory of float64
+    data. Uncompressed files are held as float64 with unit scale and zero offset. Statistics are computed on the packed
+    values directly and rescaled per channel.
+    """
+
+    def __init__(self, pack, scale, offset, attribute_names=None, time=None):
+        self.pack = pack
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.attribute_names = attribute_names
+        self.time = time
+
+    @property
+    def shape(self):
+        return self.pack.shape
+
+    def __len__(self):
+        return len(self.pack)
+
+    def decode(self, dtype=np.float64):
+        """Returns the real (scaled) data as an array of the specified dtype."""
+        data = np.empty(self.pack.shape, dtype=dtype)
+        np.subtract(self.pack, self.offset, out=data)
+        np.divide(data, self.scale, out=data)
+        return data
+
+    def mean(self):
+        return (self.pack.mean(axis=0) - self.offset) / self.scale
+
+    def std(self):
+        return self.pack.std(axis=0) / np.abs(self.scale)
+
+    def min(self):
+        packed_extreme = np.where(self.scale > 0, self.pack.min(axis=0), self.pack.max(axis=0))
+        return (packed_extreme - self.offset) / self.scale
+
+    def max(self):
+        packed_extreme = np.where(self.scale > 0, self.pack.max(axis=0), self.pack.min(axis=0))
+        return (packed_extreme - self.offset) / self.scale
+
+
+def load_packed_output(filename, param_names=None):
+    """
+    Loads the specified channels (all channels except time if param_names is None) of a FAST binary output file
+    without scaling them to real data. Returns a PackedData object, with the time values in its time attribute, and an
+    info dict of the same format as load_binary_output.
+    """
+    with BinaryOutput(filename) as outb:
+        if param_names is None:
+            param_names = outb.attribute_names[1:]
+        packed = outb.get_packed(param_names)
+        packed.time = outb.get_time()
+        info = outb.info()
+    info['attribute_names'] = list(param_names)
+    info['attribute_units'] = [outb.attribute_units[outb.attribute_names.index(param)] for param in param_names]
+    return packed, info
+
+
+class BinaryOutput:
+    """
+    Lazy reader over a FAST binary output file. Only the header is parsed on creation; the packed time and channel
+    blocks are memory-mapped, and only the requested channel columns (and time steps) are scaled into real data when
+    asked for. Use as a context manager, or call close() when done, to release the memory map.
+    """
+
+    def __init__(self, filename):
+        assert os.path.isfile(filename), "File, %s, does not exists" % filename
+        self.filename = filename
+        self.header = read_output_header(filename)
+
+        self.name = os.path.splitext(os.path.basename(filename))[0]
+        self.description = self.header['DescStr']
+        self.attribute_names = self.header['ChanName']
+        self.attribute_units = self.header['ChanUnit']
+        self.num_steps = self.header['NT']
+        self.num_channels = self.header['NumOutChans']
+
+        if self.header['FileID'] == FileFmtID_NoCompressWithoutTime:
+            self._data_dtype = np.dtype('<f8')
+        else:
+            self._data_dtype = np.dtype('<i2')
+        data_end = self.header['DataStart'] + self._data_dtype.itemsize * self.num_steps * self.num_channels
+        if os.path.getsize(filename) < data_end:
+            raise Exception('Could not read entire %s file: file is shorter than its header specifies' % filename)
+
+        self._time_map = None
+        self._data_map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Releases the memory maps over the file."""
+        self._time_map = None
+        self._data_map = None
+
+    @property
+    def packed_data(self):
+        """Memory-mapped (NT, NumOutChans) view of the packed channel block, excluding time."""
+        if self._data_map is None:
+            self._data_map = np.memmap(self.filename, dtype=self._data_dtype, mode='r',
+                                       offset=self.header['DataStart'], shape=(self.num_steps, self.num_channels))
+        return self._data_map
+
+    def info(self):
+        """Returns the same info dict as load_binary_output."""
+        return {'name': self.name,
+                'description': self.description,
+                'attribute_names': self.attribute_names,
+                'attribute_units': self.attribute_units}
+
+    def get_time(self, start=0, stop=None):
+        """Returns the time values of time steps start to stop (exclusive, defaulting to the last time step)."""
+        start, stop, _ = slice(start, stop).indices(self.num_steps)
+        if self.header['FileID'] == FileFmtID_WithTime:
+            if self._time_map is None:
+                self._time_map = np.memmap(self.filename, dtype='<i4', mode='r', offset=self.header['TimeStart'],
+                                           shape=(self.num_steps,))
+            return (self._time_map[start:stop] - self.header['TimeOff']) / self.header['TimeScl']
+        return self.header['TimeOut1'] + self.header['TimeIncr'] * np.arange(start, stop)
+
+    def get_step_range(self, start_time=None, end_time=None):
+        """Returns the (start, stop) time step indices covering start_time <= time <= end_time."""
+        time = self.get_time()
+        start = 0 if start_time is None else int(np.searchsorted(time, start_time, side='left'))
+        stop = self.num_steps if end_time is None else int(np.searchsorted(time, end_time, side='right'))
+        return start, stop
+
+    def get_channels(self, param_names, start=0, stop=None, out=None):
+        """
+        Returns a Fortran-ordered numpy array of the real (scaled) data for the specified channels over time steps
+        start to stop, with one column per entry of param_names. 'Time' may be requested like any other channel.
+        Raises ValueError if a channel is not in the file. The data is written into out instead of a new array if
+        given, which must be a float array of shape (stop - start, len(param_names)).
+        """
+        start, stop, _ = slice(start, stop).indices(self.num_steps)
+        if out is None:
+            param_data = np.zeros([stop - start, len(param_names)], dtype=float, order='F')
+        elif out.shape != (stop - start, len(param_names)):
+            raise ValueError('out has shape %s, not (%d, %d)' % (out.shape, stop - start, len(param_names)))
+        else:
+            param_data = out
+
+        for idx, param in enumerate(param_names):
+            param_col = self.attribute_names.index(param)
+            if param_col == 0:  # 'Time' parameter is always the first output column in FAST
+                param_data[:, idx] = self.get_time(start, stop)
+            elif self.header['FileID'] == FileFmtID_NoCompressWithoutTime:
+                param_data[:, idx] = self.packed_data[start:stop, param_col - 1]
+            else:
+                param_data[:, idx] = self.packed_data[start:stop, param_col - 1]
+                param_data[:, idx] -= self.header['ColOff'][param_col - 1]
+                param_data[:, idx] /= self.header['ColScl'][param_col - 1]
+
+        return param_data
+
+    def get_packed(self, param_names, start=0, stop=None):
+        """
+        Returns a PackedData object holding the specified channels over time steps start to stop, without scaling
+        them to real data. 'Time' cannot be requested, as it is not stored with the channels; use get_time instead.
+        """
+        if 'Time' in param_names:
+            raise ValueError("'Time' is not a packed channel. Use get_time for time values.")
+        start, stop, _ = slice(start, stop).indices(self.num_steps)
+        chan_cols = [self.attribute_names.index(param) - 1 for param in param_names]
+
+        pack = np.array(self.packed_data[start:stop, chan_cols])
+        if self.header['FileID'] == FileFmtID_NoCompressWithoutTime:
+            scale = np.ones(len(chan_cols))
+            offset = np.zeros(len(chan_cols))
+        else:
+            scale = self.header['ColScl'][chan_cols]
+            offset = self.header['ColOff'][chan_cols]
+
+        return PackedData(pack, scale, offset, list(param_names))
+
+    def iter_chunks(self, param_names=None, chunk_size=100000, start=0, stop=None):
+        """
+        Generator yielding (time, data) blocks of at most chunk_size time steps over time steps start to stop. data
+        holds the specified channels in the order of param_names, or every channel except time if param_names is
+        None. Only one block is held in memory at a time.
+        """
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer.')
+        start, stop, _ = slice(start, stop).indices(self.num_steps)
+
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            time = self.get_time(chunk_start, chunk_stop)
+            if param_names is None:
+                data = np.array(self.packed_data[chunk_start:chunk_stop], dtype=float)
+                if self.header['FileID'] != FileFmtID_NoCompressWithoutTime:
+                    data -= self.header['ColOff']
+                    data /= self.header['ColScl']
+            else:
+                data = self.get_channels(param_names, chunk_start, chunk_stop)
+            yield time, data
+
+
+def iter_binary_output(filename, param_names=None, chunk_size=100000, start=0, stop=None):
+    """
+    Streams a FAST binary output file in blocks of chunk_size time steps. See BinaryOutput.iter_chunks.
+    """
+    with BinaryOutput(filename) as outb:
+        for time, data in outb.iter_chunks(param_names, chunk_size, start, stop):
+            yield time, data
+
+
+class SharedOutput:
+    """
+    Decoded output channels held in a shared memory segment, so worker processes can read a case without decoding it
+    again or receiving a pickled copy. The process that creates a SharedOutput (see publish_binary_output and
+    SharedOutput.from_array) owns the segment and frees it on close; other processes pass its handle() to
+    attach_shared_output to get a zero-copy view of the same data. Use as a context manager, or call close() when done.
+    Arrays taken from data must not be used after close.
+    """
+
+    def __init__(self, shape, attribute_names, dtype=np.float64, name=None):
+        self.attribute_names = list(attribute_names)
+        self.owner = name is None
+        dtype = np.dtype(dtype)
+        if self.owner:
+            num_bytes = max(int(np.prod(shape)) * dtype.itemsize, 1)
+            self._shm = shared_memory.SharedMemory(create=True, size=num_bytes)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.data = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, order='F')
+
+    @classmethod
+    def from_array(cls, data, attribute_names):
+        """Publishes a copy of a (time steps, channels) array."""
+        shared = cls(np.shape(data), attribute_names, np.asarray(data).dtype)
+        shared.data[...] = data
+        return shared
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def handle(self):
+        """Returns a small picklable handle for attach_shared_output."""
+        return {'name': self._shm.name, 'shape': self.data.shape, 'dtype': self.data.dtype.str,
+                'attribute_names': self.attribute_names}
+
+    def close(self):
+        """Releases this process's view of the segment, and frees the segment if this process created it."""
+        if self._shm is None:
+            return
+        self.data = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+        self._shm = None
+
+
+def publish_binary_output(filename, param_names=None, start=0, stop=None):
+    """
+    Decodes the specified channels of a FAST binary output file (every channel, including time, if param_names is None)
+    over time steps start to stop straight into a new SharedOutput, without an intermediate copy.
+    """
+    with BinaryOutput(filename) as outb:
+        if param_names is None:
+            param_names = outb.attribute_names
+        start, stop, _ = slice(start, stop).indices(outb.num_steps)
+        shared = SharedOutput((stop - start, len(param_names)), param_names)
+        try:
+            outb.get_channels(param_names, start, stop, out=shared.data)
+        except Exception:
+            shared.close()
+            raise
+    return shared
+
+
+def attach_shared_output(handle):
+    """Attaches to the SharedOutput of another process from its handle(). Closing it leaves the segment in place."""
+    return SharedOutput(handle['shape'], handle['attribute_names'], handle['dtype'], handle['name'])
+
+
+IntMin16, IntMax16 = -32768, 32767  # packed channel range of compressed files
+IntMin32, IntMax32 = -2147483648, 2147483647  # packed time range of FileFmtID_WithTime files
+
+
+def packing_coefficients(col_min, col_max):
+    """
+    Returns the float32 scale and offset vectors FAST uses to pack channels with the specified minimum and maximum
+    values into int16, so that packed = round(scale * data + offset).
+    """
+    col_min = np.asarray(col_min, dtype=np.float64)
+    col_max = np.asarray(col_max, dtype=np.float64)
+    col_range = col_max - col_min
+    scale = np.where(col_range > 0, (IntMax16 - IntMin16) / np.where(col_range > 0, col_range, 1.), 1.)
+    offset = IntMin16 - scale * col_min
+    return scale.astype(np.float32), offset.astype(np.float32)
+
+
+class BinaryOutputWriter:
+    """
+    Writes a FAST binary output file of any of the three FileID formats in blocks of time steps, so files larger than
+    memory can be written. The number of time steps must be known in advance, as it is part of the header.
+
+    Arguments:
+        filename is the path of the file to write.
+        attribute_names and attribute_units are lists of the channel names and units, including 'Time' first, in the
+            same format as the info dict returned by load_binary_output.
+        num_steps is the total number of time steps that will be written.
+        file_id is FileFmtID_WithTime, FileFmtID_WithoutTime, or FileFmtID_NoCompressWithoutTime.
+        description is the description string stored in the file.
+        col_scale and col_offset are the packing vectors of the channels (see packing_coefficients), required for
+            compressed file_ids.
+        time_range is the (first, last) time value, required for FileFmtID_WithTime.
+        time_start and time_increment are the first time and time step, required for the other file_ids.
+    """
+
+    def __init__(self, filename, attribute_names, attribute_units, num_steps, file_id=FileFmtID_WithoutTime,
+                 description='', col_scale=None, col_offset=None, time_range=None, time_start=None,
+                 time_increment=None):
+        if file_id not in [FileFmtID_WithTime, FileFmtID_WithoutTime, FileFmtID_NoCompressWithoutTime]:
+            raise ValueError('file_id must be 1, 2, or 3.')
+        self.filename = filename
+        self.file_id = file_id
+        self.num_steps = num_steps
+        self.num_channels = len(attribute_names) - 1
+        self.steps_written = 0
+
+        self.fid = open(filename, 'wb')
+        self.fid.write(np.array(file_id, dtype='<i2').tobytes())
+        self.fid.write(np.array([self.num_channels, num_steps], dtype='<i4').tobytes())
+
+        if file_id == FileFmtID_WithTime:
+            time_min, time_max = time_range
+            self.time_scale = (IntMax32 - IntMin32) / (time_max - time_min) if time_max > time_min else 1.
+            self.time_offset = IntMin32 - self.time_scale * time_min
+            self.fid.write(np.array([self.time_scale, self.time_offset], dtype='<f8').tobytes())
+        else:
+            self.fid.write(np.array([time_start, time_increment], dtype='<f8').tobytes())
+
+        if file_id != FileFmtID_NoCompressWithoutTime:
+            self.col_scale = np.asarray(col_scale, dtype=np.float32)
+            self.col_offset = np.asarray(col_offset, dtype=np.float32)
+            self.fid.write(self.col_scale.astype('<f4').tobytes())
+            self.fid.write(self.col_offset.astype('<f4').tobytes())
+
+        desc = description.encode('latin-1')
+        self.fid.write(np.array(len(desc), dtype='<i4').tobytes())
+        self.fid.write(desc)
+        self.fid.write(''.join(name[:LenName].ljust(LenName) for name in attribute_names).encode('latin-1'))
+        self.fid.write(''.join(('(' + unit + ')')[:LenUnit].ljust(LenUnit)
+                               for unit in attribute_units).encode('latin-1'))
+
+        self.time_start = self.fid.tell()
+        if file_id == FileFmtID_WithTime:
+            self.data_start = self.time_start + 4 * num_steps
+        else:
+            self.data_start = self.time_start
+        if file_id == FileFmtID_NoCompressWithoutTime:
+            self.data_dtype = np.dtype('<f8')
+        else:
+            self.data_dtype = np.dtype('<i2')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.fid.close()
+
+    def close(self):
+        """
+        Closes the file. Raises a ValueError if fewer time steps were written than the header specifies, as readers
+        would otherwise misread the file.
+        """
+        self.fid.close()
+        if self.steps_written != self.num_steps:
+            raise ValueError('%d time steps written of the %d specified.' % (self.steps_written, self.num_steps))
+
+    def pack(self, data):
+        """Packs real (scaled) channel data into the int16 values stored in compressed files."""
+        packed = np.rint(data * self.col_scale.astype(np.float64) + self.col_offset.astype(np.float64))
+        return np.clip(packed, IntMin16, IntMax16).astype('<i2')
+
+    def write(self, time, data):
+        """Writes the next block of time values and real (scaled) channel data of shape (len(time), channels)."""
+        if self.file_id == FileFmtID_NoCompressWithoutTime:
+            self.write_packed(time, data)
+        else:
+            self.write_packed(time, self.pack(data))
+
+    def write_packed(self, time, packed):
+        """Writes the next block of time values and channel data that is already in the stored (packed) format."""
+        packed = np.asarray(packed)
+        num_block_steps = len(packed)
+        if self.steps_written + num_block_steps > self.num_steps:
+            raise ValueError('More time steps written than the %d specified.' % self.num_steps)
+        if packed.shape[1:] != (self.num_channels,):
+            raise ValueError('Data must have %d channels.' % self.num_channels)
+
+        if self.file_id == FileFmtID_WithTime:
+            packed_time = np.rint(np.asarray(time) * self.time_scale + self.time_offset)
+            self.fid.seek(self.time_start + 4 * self.steps_written)
+            self.fid.write(np.clip(packed_time, IntMin32, IntMax32).astype('<i4').tobytes())
+
+        self.fid.seek(self.data_start + self.data_dtype.itemsize * self.num_channels * self.steps_written)
+        self.fid.write(np.ascontiguousarray(packed, dtype=self.data_dtype).tobytes())
+        self.steps_written += num_block_steps
+
+
+def write_binary_output(filename, data, info, file_id=FileFmtID_WithoutTime):
+    """
+    Writes a FAST binary output file from data and info in the format returned by load_binary_output (data includes
+    time as its first column). Compressed file_ids pack each channel over its full range, as FAST does. Files without
+    time values assume a constant time step. data must have at least one time step.
+    """
+    if len(data) == 0:
+        raise ValueError('data has no time steps to write.')
+    time = data[:, 0]
+    channel_data = data[:, 1:]
+    if file_id == FileFmtID_NoCompressWithoutTime:
+        col_scale, col_offset = None, None
+    else:
+        col_scale, col_offset = packing_coefficients(channel_data.min(axis=0), channel_data.max(axis=0))
+    time_increment = time[1] - time[0] if len(time) > 1 else 0.
+
+    with BinaryOutputWriter(filename, info['attribute_names'], info['attribute_units'], len(time), file_id,
+                            info.get('description', ''), col_scale, col_offset, (time.min(), time.max()),
+                            time[0], time_increment) as writer:
+        writer.write(time, channel_data)
+
+
+def compact_binary_output(filename, new_filename, param_names, file_id=None, chunk_size=100000):
+    """
+    Rewrites a FAST binary output file keeping only the specified channels (excluding 'Time', which is always kept).
+    The file is streamed in blocks of chunk_size time steps. file_id defaults to that of the original file; when both
+    files are compressed, the packed values are copied without rescaling, so no precision is lost.
+    """
+    with BinaryOutput(filename) as outb:
+        header = outb.header
+        if file_id is None:
+            file_id = header['FileID']
+        chan_cols = [outb.attribute_names.index(param) for param in param_names]
+        attribute_names = ['Time'] + list(param_names)
+        attribute_units = [outb.attribute_units[0]] + [outb.attribute_units[col] for col in chan_cols]
+        time = outb.get_time()
+        time_increment = header.get('TimeIncr', time[1] - time[0] if len(time) > 1 else 0.)
+        copy_packed = file_id != FileFmtID_NoCompressWithoutTime and \
+            header['FileID'] != FileFmtID_NoCompressWithoutTime
+
+        if file_id == FileFmtID_NoCompressWithoutTime:
+            col_scale, col_offset = None, None
+        elif copy_packed:
+            col_scale = header['ColScl'][[col - 1 for col in chan_cols]]
+            col_offset = header['ColOff'][[col - 1 for col in chan_cols]]
+        else:
+            col_min = np.full(len(chan_cols), np.inf)
+            col_max = np.full(len(chan_cols), -np.inf)
+            for _, data in outb.iter_chunks(param_names, chunk_size):
+                col_min = np.minimum(col_min, data.min(axis=0))
+                col_max = np.maximum(col_max, data.max(axis=0))
+            col_scale, col_offset = packing_coefficients(col_min, col_max)
+
+        with BinaryOutputWriter(new_filename, attribute_names, attribute_units, outb.num_steps, file_id,
+                                outb.description, col_scale, col_offset, (time.min(), time.max()), time[0],
+                                time_increment) as writer:
+            for chunk_start in range(0, outb.num_steps, chunk_size):
+                chunk_stop = min(chunk_start + chunk_size, outb.num_steps)
+                if copy_packed:
+                    writer.write_packed(time[chunk_start:chunk_stop],
+                                        outb.get_packed(param_names, chunk_start, chunk_stop).pack)
+                else:
+                    writer.write(time[chunk_start:chunk_stop], outb.get_channels(param_names, chunk_start, chunk_stop))
+
+
 if __name__ == "__main__":
     d, i = load_binary_output('Test18.T1.outb')
     types = []
@@ -2,7 +2,6 @@ from fowt_force_gen import parse
 import warnings
 import numpy as np
 import argparse
-from scipy import io
 
 
 def filegen(template_file, new_filename, **kwargs):
@@ -230,16 +229,16 @@ def hydrodyn_bulk_filegen(template_file, new_filename_root, water_depth, wave_cl
         new_hd_filename = new_filename_root+'_'+'Climate'+str(climate_num)+'.dat'
         if current_climate:
             filegen(template_file, new_hd_filename, WtrDpth=str(water_depth),
-                    WaveHs=str(wave_climates['Significant Wave Height'][climate_num]),
-                    WaveTp=str(wave_climates['Wave Period'][climate_num]),
-                    WaveDir=str(wave_climates['Wave Direction'][climate_num]),
+                    WaveHs=str(wave_climates['Significant Wave Height'].iloc[climate_num]),
+                    WaveTp=str(wave_climates['Wave Period'].iloc[climate_num]),
+                    WaveDir=str(wave_climates['Wave Direction'].iloc[climate_num]),
                     CurrMod='1', CurrNSRef=str(current_climate[0]), CurrNSV0=str(current_climate[1]),
                     CurrNSDir=str(current_climate[2]))
         else:
             filegen(template_file, new_hd_filename, WtrDpth=str(water_depth),
-                    WaveHs=str(wave_climates['Significant Wave Height'][climate_num]),
-                    WaveTp=str(wave_climates['Wave Period'][climate_num]),
-                    WaveDir=str(wave_climates['Wave Direction'][climate_num]))
+                    WaveHs=str(wave_climates['Significant Wave Height'].iloc[climate_num]),
+                    WaveTp=str(wave_climates['Wave Period'].iloc[climate_num]),
+                    WaveDir=str(wave_climates['Wave Direction'].iloc[climate_num]))
 
 
 def fst_bulk_filegen(template_file, new_filename_root, moordyn_file, ifw_file_dir, hd_file_dir):
@@ -335,6 +334,8 @@ def create_mat_files(reliability_results_filename, surge_results_filename, line1
                                      empty_surge_field(2, 2), empty_surge_field(3, 1), empty_surge_field(3, 2)]],
                                    dtype=[('fs', 'O'), ('lf', 'O'), ('Surge', 'O'), ('Sway', 'O')])}
 
+    from scipy import io  # scipy is imported where it is used, to keep the command line tools quick to start
+
     io.savemat(reliability_results_filename, reliability_results_dict)
     io.savemat(surge_results_filename, surge_results_dict)
 
@@ -5,6 +5,7 @@ from fowt_force_gen import run_fast
 from fowt_force_gen import moortune
 from fowt_force_gen import parse
 import argparse
+import json
 import os
 
 
@@ -20,6 +21,15 @@ def main():
                         help='Platform type. Either OC3 or OC4 (i.e. Hywind or DeepCwind)')
     parser.add_argument('-fr', '--fileroot', type=str, required=True,
                         help='Root of filenames that all output files will start with.')
+    parser.add_argument('-wc', '--waveclimates', type=str, default='index',
+                        choices=['index', 'month', 'season', 'cluster', 'prompt'],
+                        help='How to divide wave data into climates: 12 equal blocks of measurements (index), '
+                             'calendar months, seasons, 12 clusters of similar sea states, or as entered at prompts '
+                             'after the monthly wave data is displayed (prompt). Defaults to index; the prompts are no '
+                             'longer shown unless -wc prompt is given.')
+    parser.add_argument('-wm', '--wavemerge', type=str,
+                        help='JSON file of the divisions to combine into each wave climate (optional), e.g. '
+                             '{"Winter": ["Dec", "Jan", "Feb"], "Summer": ["Jun", "Jul", "Aug"]}')
     args = parser.parse_args()
 
     # Step 1.5: Define template OpenFAST files to be used later in custom file creation (Step 5)
@@ -55,10 +65,12 @@ def main():
     buoy.data_scraper(buoy_num)
 
     # Step 3: Read the text files and partition critical parameters into bins. If wind or current data does
-    #         not exist, specify as such so it isn't accounted for in OpenFAST file creation. Prompt user for input
-    #         to determine how to split wave climates, as separate HydroDyn files are created for each climate later.
+    #         not exist, specify as such so it isn't accounted for in OpenFAST file creation. Split the wave data into
+    #         climates as set by -wc/-wm (or user input at prompts), as separate HydroDyn files are created for each
+    #         climate later.
     met_file = parse.get_most_recent_file_containing('met_data_'+str(buoy_num), '.txt')
-    met_data = windbins.get_met_data(met_file)
+    met_frame = windbins.read_ndbc_file(met_file)
+    met_data = windbins.get_met_data(met_frame)
     os.remove(met_file)
 
     try:
@@ -83,8 +95,15 @@ def main():
 
     bin_probabilities = wind.get_bin_probabilities()
 
-    waves = windbins.Wave(met_data)
-    wave_climates = waves.partition(custom_partitioning=True)
+    waves = windbins.Wave(met_data, met_frame.index)
+    if args.waveclimates == 'prompt':
+        wave_climates = waves.partition(custom_partitioning=True)
+    else:
+        wave_merge = None
+        if args.wavemerge:
+            with open(args.wavemerge) as merge_file:
+                wave_merge = json.load(merge_file)
+        wave_climates = waves.partition(by=args.waveclimates, merge=wave_merge)
 
     # Step 4: Tune the floating wind platform mooring system for the depth and platform used at the site, and generate
     #         the resulting MoorDyn input file
@@ -126,25 +145,19 @@ def main():
     # Do post-processing for all tests
     all_output_roots = [filenames.replace('.outb', '') for filenames in outb_files]
 
-    for test in all_output_roots:
-        # Step 6: Parse the OpenFAST outputs into mooring/anchor tension and platform surge/sway into numpy arrays
-        #         containing the relevant statistical occurrences
-        ptfm_surge, ptfm_sway, anchor_tension, line1_tension, line2_tension, line3_tension = \
-            parse.output_parse(output_file_dir+'/'+test)
-
-        surge_stats = parse.make_distributions(ptfm_surge, calculate_stdev=False)
-        sway_stats = parse.make_distributions(ptfm_sway, calculate_stdev=False)
-        anchor_stats = parse.make_distributions(anchor_tension)
-        line1_stats = parse.make_distributions(line1_tension)
-        line2_stats = parse.make_distributions(line2_tension)
-        line3_stats = parse.make_distributions(line3_tension)
+    # Step 6: Parse the OpenFAST outputs into mooring/anchor tension and platform surge/sway, and find the relevant
+    #         statistical occurrences of all cases at once
+    distributions = parse.campaign_distributions([output_file_dir+'/'+test for test in all_output_roots])
 
+    for case_num, test in enumerate(all_output_roots):
         # Step 7: Create MAT files matching the format of the external reliability code
         reliability_results_filename = mat_file_dir + '/' + 'ReliabilityResults_' + test + '.mat'
         surge_results_filename = mat_file_dir + '/' + 'Surge_' + test+ '.mat'
         filegen.create_mat_files(reliability_results_filename, surge_results_filename,
-                                 line1_stats, line2_stats, line3_stats, anchor_stats[0, :], anchor_stats[1, :],
-                                 anchor_stats[2, :], surge_stats, sway_stats)
+                                 distributions['line1'][case_num], distributions['line2'][case_num],
+                                 distributions['line3'][case_num], distributions['anchor'][case_num, 0],
+                                 distributions['anchor'][case_num, 1], distributions['anchor'][case_num, 2],
+                                 distributions['surge'][case_num], distributions['sway'][case_num])
 
 
 if __name__ == '__main__':
@@ -221,7 +221,7 @@ class Mooring:
 
     def check_rough_tuning(self, outb_file):
         line_data = parse.get_param_data(outb_file, ['L1N1PZ', 'L2N1PZ', 'L3N1PZ'])
-        tuned = ((line_data[:, 1:3] <= -self.water_depth).sum() == line_data[:, 1:3].size).astype(np.float)
+        tuned = ((line_data[:, 1:3] <= -self.water_depth).sum() == line_data[:, 1:3].size).astype(float)
         if tuned:
             return True
         else:
@@ -1,15 +1,30 @@
 from fowt_force_gen import fast_io
+from fowt_force_gen import result_store
+import collections
+import concurrent.futures
+import fnmatch
+import functools
 import os
 import shutil
+import threading
+import time
 import numpy as np
-import pandas as pd
+
+# LRU cache of channels decoded from output files, shared by everything that reads outputs through get_channels. Each
+# entry is one file, keyed by absolute path, holding the channels decoded from it so far and the file size and
+# modification time they were decoded at. Only reads that are likely to be repeated (e.g. output_parse of a case, or
+# moortune's iterations) fill it; campaign functions read each file once and bypass it.
+_output_cache = collections.OrderedDict()
+_cache_settings = {'max_bytes': 2**30, 'num_bytes': 0}
+_cache_lock = threading.Lock()
 
 
 def make_distributions(param_data, calculate_stdev=True):
     """
     Creates the needed output distribution of the format used in the output MAT files. This is basically just finding
     the mean value and standard deviation of each parameter dataset, and returning that value in a list of format
-    [mean, std_dev]. Lists or numpy arrays are expected as inputs.
+    [mean, std_dev]. Lists, numpy arrays, or fast_io.PackedData objects (see get_param_data) are expected as inputs.
+    To find the distributions of many cases at once, use batch_distributions or campaign_distributions.
     """
 
     # if param_data is a list, just read it and give mean and stdev
@@ -21,76 +36,711 @@ def make_distributions(param_data, calculate_stdev=True):
             data_std = round(np.std(param_data), 3)
             data_stats = np.array([data_mean, data_std])
 
-    # if param_data is a numpy array, read each column and give mean and stdev as an array of lists like in the MAT file
+    # if param_data is a numpy array, give the mean and stdev of each column as an array of lists like in the MAT file,
+    # or just the array of column means if calculate_stdev is False
 
     elif isinstance(param_data, np.ndarray):
-        data_stats = []
-        for param in param_data.T:
-            data_mean = round(np.mean(param), 3)
-            if not calculate_stdev:
-                data_stats = np.array([data_mean])
-            else:
-                data_std = round(np.std(param), 3)
-                data_stats.append([data_mean, data_std])
-        data_stats = np.array(data_stats)
+        if param_data.ndim == 1:
+            param_data = param_data[:, np.newaxis]
+        data_stats = batch_distributions(param_data[np.newaxis], calculate_stdev)[0]
+
+    # if param_data is packed FAST output, find the statistics of the packed values and rescale them for each column
+    elif isinstance(param_data, fast_io.PackedData):
+        data_mean = np.round(param_data.mean(), 3)
+        if not calculate_stdev:
+            data_stats = data_mean
+        else:
+            data_std = np.round(param_data.std(), 3)
+            data_stats = np.column_stack([data_mean, data_std])
     else:
-        raise TypeError('param_data needs to be either a list or a numpy array.')
+        raise TypeError('param_data needs to be either a list, a numpy array, or a fast_io.PackedData object.')
 
     return data_stats
 
 
-def output_parse(output_file_root, num_line_segments=6):
+def batch_statistics(param_data, percentiles=None, statistics=('mean', 'std', 'min', 'max')):
+    """
+    Computes the statistics of every channel of a batch of cases in one vectorized pass.
+
+    Arguments:
+        param_data is either a numpy array of shape (cases, time steps, channels), or a list of (time steps, channels)
+            arrays, one per case, which may have different numbers of time steps.
+        percentiles (optional) is a list of percentiles (0-100) to compute as well.
+        statistics (optional) is the list of the statistics to compute, of 'mean', 'std', 'min', and 'max'.
+    Returns a dict of arrays of shape (cases, channels) with the keys in statistics, plus 'percentiles' of shape
+    (cases, channels, len(percentiles)) if percentiles are requested. NaN values in the data give NaN statistics, as
+    numpy's reductions do, whether or not the cases have the same length.
+    """
+    if not isinstance(param_data, np.ndarray):
+        if len(set(len(case_data) for case_data in param_data)) > 1:
+            # Cases of different lengths are reduced one at a time over their own time steps
+            case_stats = [batch_statistics(np.asarray(case_data)[np.newaxis], percentiles, statistics)
+                          for case_data in param_data]
+            return {key: np.concatenate([stats[key] for stats in case_stats]) for key in case_stats[0]}
+        param_data = np.stack(param_data)
+
+    if param_data.ndim != 3:
+        raise ValueError('param_data needs to be of shape (cases, time steps, channels).')
+
+    reductions = {'mean': np.mean, 'std': np.std, 'min': np.min, 'max': np.max}
+    stats = {statistic: reductions[statistic](param_data, axis=1) for statistic in statistics}
+    if percentiles is not None:
+        stats['percentiles'] = np.moveaxis(np.percentile(param_data, percentiles, axis=1), 0, -1)
+
+    return stats
+
+
+def batch_distributions(param_data, calculate_stdev=True):
+    """
+    Batched make_distributions: returns the rounded [mean, std_dev] of every channel of every case of param_data (see
+    batch_statistics) as an array of shape (cases, channels, 2), or the rounded means of shape (cases, channels) if
+    calculate_stdev is False. Entry [case] has the format make_distributions gives for that case.
+    """
+    if not calculate_stdev:
+        return np.round(batch_statistics(param_data, statistics=['mean'])['mean'], 3)
+    stats = batch_statistics(param_data, statistics=['mean', 'std'])
+    return np.round(np.stack([stats['mean'], stats['std']], axis=-1), 3)
+
+
+def campaign_distributions(output_file_roots, num_line_segments=6, store=None, max_workers=4, batch_size=16):
+    """
+    Finds the output distributions of every case of a campaign with one call, in the layout filegen.create_mat_files
+    takes. Cases are read with iter_output_parse and reduced with batch_distributions batch_size cases at a time, so
+    only one batch of time series is held in memory.
+
+    Returns a dict of arrays indexed by case (in the order of output_file_roots): 'surge' and 'sway' of shape
+    (cases, 1) holding the mean platform offsets, 'anchor' of shape (cases, 3, 2) holding [mean, std_dev] of each
+    anchor tension, and 'line1', 'line2', and 'line3' of shape (cases, num_line_segments, 2) holding [mean, std_dev]
+    of each segment tension. E.g. the MAT files of case i use distributions['line1'][i] and
+    distributions['anchor'][i, 0].
+    """
+    groups = ['surge', 'sway', 'anchor', 'line1', 'line2', 'line3']
+    batches = {group: [] for group in groups}
+    batch = []
+
+    def reduce_batch():
+        for group_idx, group in enumerate(groups):
+            group_data = [case_data[group_idx] for case_data in batch]
+            batches[group].append(batch_distributions(group_data, calculate_stdev=group not in ['surge', 'sway']))
+        batch.clear()
+
+    for _, case_data in iter_output_parse(output_file_roots, num_line_segments, store, max_workers):
+        batch.append(case_data)
+        if len(batch) == batch_size:
+            reduce_batch()
+    if batch:
+        reduce_batch()
+
+    distributions = {}
+    for group in groups:
+        if batches[group]:
+            distributions[group] = np.concatenate(batches[group])
+        else:
+            num_channels = {'surge': 1, 'sway': 1, 'anchor': 3}.get(group, num_line_segments)
+            distributions[group] = np.zeros([0, num_channels] + ([] if group in ['surge', 'sway'] else [2]))
+    return distributions
+
+
+class QuantileSketch:
+    """
+    Mergeable approximate quantiles of a set of channels, with bounded relative error. Values are counted in
+    logarithmically spaced buckets (separately for positive and negative values), so any quantile is estimated to within
+    relative_accuracy of a value of the data near that quantile, however many values are added, while memory only
+    grows with the logarithm of the data's range. Values of magnitude below min_value are counted as zero.
+    """
+
+    def __init__(self, num_channels, relative_accuracy=.01, min_value=1e-9):
+        self.num_channels = num_channels
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._log_gamma = np.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.count = 0
+        self._positive = [collections.Counter() for _ in range(num_channels)]
+        self._negative = [collections.Counter() for _ in range(num_channels)]
+        self._zero = np.zeros(num_channels, dtype=np.int64)
+
+    def update(self, chunk):
+        """Adds a (time steps, channels) block of values. NaN values are ignored."""
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(len(chunk), self.num_channels)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            keys = np.ceil(np.log(np.abs(chunk)) / self._log_gamma)
+        for col in range(self.num_channels):
+            values = chunk[:, col]
+            for counter, mask in [(self._positive[col], values >= self.min_value),
+                                  (self._negative[col], values <= -self.min_value)]:
+                bucket_keys, bucket_counts = np.unique(keys[mask, col].astype(np.int64), return_counts=True)
+                counter.update(dict(zip(bucket_keys.tolist(), bucket_counts.tolist())))
+            self._zero[col] += np.count_nonzero(np.abs(values) < self.min_value)
+        self.count += len(chunk)
+
+    def merge(self, other):
+        """Adds the counts of another sketch of the same channels and accuracy. Returns this sketch."""
+        if other.num_channels != self.num_channels or other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Only sketches of the same number of channels and accuracy can be merged.')
+        for col in range(self.num_channels):
+            self._positive[col].update(other._positive[col])
+            self._negative[col].update(other._negative[col])
+        self._zero += other._zero
+        self.count += other.count
+        return self
+
+    def quantile(self, quantiles):
+        """
+        Returns an array of shape (len(quantiles), channels) of the approximate quantiles (0-1) of each channel, using
+        the same rank convention as np.quantile. Channels without any values give NaN.
+        """
+        quantiles = np.atleast_1d(quantiles)
+        estimates = np.full([len(quantiles), self.num_channels], np.nan)
+        for col in range(self.num_channels):
+            negative_keys = sorted(self._negative[col], reverse=True)
+            positive_keys = sorted(self._positive[col])
+            counts = np.array([self._negative[col][key] for key in negative_keys] + [self._zero[col]] +
+                              [self._positive[col][key] for key in positive_keys])
+            total = counts.sum()
+            if total == 0:
+                continue
+            # Each bucket is represented by the value with equal relative error to both of its edges
+            gamma = np.exp(self._log_gamma)
+            bucket_values = np.concatenate([-2 * gamma ** np.array(negative_keys, dtype=float) / (gamma + 1), [0.],
+                                            2 * gamma ** np.array(positive_keys, dtype=float) / (gamma + 1)])
+            ranks = quantiles * (total - 1)
+            estimates[:, col] = bucket_values[np.searchsorted(np.cumsum(counts), ranks, side='right')]
+        return estimates
+
+
+class OnlineStatistics:
+    """
+    Running mean, standard deviation, minimum, maximum, and (optionally) approximate quantiles of a set of channels,
+    fed one block of time steps at a time, so the statistics of time series longer than memory can be found. Means and
+    variances are accumulated with Welford's algorithm, combined block-wise so each block is reduced with vectorized
+    numpy operations. Accumulators of the same channels can be merged, e.g. across the chunks of a file, the seeds of
+    an ensemble, or the results of worker processes, giving the same statistics as one accumulator fed all of the data.
+    """
+
+    def __init__(self, num_channels, quantiles=False, relative_accuracy=.01):
+        self.num_channels = num_channels
+        self.count = 0
+        self.mean = np.zeros(num_channels)
+        self._m2 = np.zeros(num_channels)
+        self.min = np.full(num_channels, np.inf)
+        self.max = np.full(num_channels, -np.inf)
+        self.sketch = QuantileSketch(num_channels, relative_accuracy) if quantiles else None
+
+    def update(self, chunk):
+        """Adds a (time steps, channels) block of values."""
+        chunk = np.asarray(chunk, dtype=np.float64).reshape(len(chunk), self.num_channels)
+        if len(chunk) == 0:
+            return
+        chunk_mean = chunk.mean(axis=0)
+        self._combine(len(chunk), chunk_mean, ((chunk - chunk_mean) ** 2).sum(axis=0))
+        self.min = np.minimum(self.min, chunk.min(axis=0))
+        self.max = np.maximum(self.max, chunk.max(axis=0))
+        if self.sketch is not None:
+            self.sketch.update(chunk)
+
+    def merge(self, other):
+        """Adds the statistics of another accumulator of the same channels. Returns this accumulator."""
+        if other.num_channels != self.num_channels:
+            raise ValueError('Only statistics of the same number of channels can be merged.')
+        if other.count:
+            self._combine(other.count, other.mean, other._m2)
+            self.min = np.minimum(self.min, other.min)
+            self.max = np.maximum(self.max, other.max)
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+        elif self.sketch is not None or other.sketch is not None:
+            raise ValueError('Statistics with and without quantiles cannot be merged.')
+        return self
+
+    def _combine(self, count, mean, m2):
+        """Pairwise update of the count, mean, and sum of squared deviations (Chan et al.)."""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self._m2 = self._m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    @property
+    def variance(self):
+        """Population variance, matching np.var."""
+        return self._m2 / self.count if self.count else np.full(self.num_channels, np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def quantile(self, quantiles):
+        """Approximate quantiles (0-1) of each channel; see QuantileSketch.quantile."""
+        if self.sketch is None:
+            raise ValueError('Quantiles were not tracked. Create the statistics with quantiles=True.')
+        return self.sketch.quantile(quantiles)
+
+    def distributions(self, calculate_stdev=True):
+        """Returns the statistics in the format of make_distributions for a numpy array of the same channels."""
+        if not calculate_stdev:
+            return np.round(self.mean, 3)
+        return np.round(np.column_stack([self.mean, self.std]), 3)
+
+
+def output_statistics(output_file, param_names, chunk_size=100000, quantiles=False):
+    """
+    Returns an OnlineStatistics of the specified channels of a FAST binary (.outb) or text (.out, including MoorDyn
+    .MD.Line#.out) output file, streamed chunk_size time steps at a time so only one chunk is ever in memory.
+    """
+    stats = OnlineStatistics(len(param_names), quantiles)
+    if output_file.endswith('.outb'):
+        for _, chunk in fast_io.iter_binary_output(output_file, param_names, chunk_size):
+            stats.update(chunk)
+    else:
+        for chunk in fast_io.iter_ascii_output(output_file, param_names, chunk_size):
+            stats.update(chunk)
+    return stats
+
+
+def rainflow_cycles(param_data):
+    """
+    Rainflow counts every channel of every case of param_data at once, without looping over cycles in Python.
+
+    Cycles are extracted with the four-point method: for consecutive turning points A, B, C, D, the range B-C is a full
+    cycle if it is no larger than both A-B and C-D, and B and C are then removed. All such cycles of all channels are
+    extracted in one vectorized pass, and passes repeat until none are left. The remaining turning points (the residue)
+    are counted as half cycles, as in ASTM E1049.
+
+    Arguments:
+        param_data is a (time steps, channels) array, a (cases, time steps, channels) array, or a list of
+            (time steps, channels) arrays, one per case, which may have different numbers of time steps.
+    Returns (ranges, means, counts, series), flat arrays with one entry per cycle: the cycle range, the cycle mean, the
+    cycle count (1 for full cycles, 0.5 for half cycles), and the index of the series the cycle is from, numbered
+    case by case and then channel by channel (series = case * channels + channel).
+    """
+    if isinstance(param_data, np.ndarray) and param_data.ndim == 2:
+        param_data = [param_data]
+    if isinstance(param_data, np.ndarray) and param_data.ndim == 1:
+        param_data = [param_data[:, np.newaxis]]
+
+    # Flatten every channel of every case into one array, labelling each point with the series it belongs to
+    values = np.concatenate([np.asarray(case_data, dtype=np.float64).T.ravel() for case_data in param_data])
+    series = np.concatenate([np.repeat(np.arange(np.shape(case_data)[1]), len(case_data))
+                             for case_data in param_data])
+    series_offsets = np.cumsum([0] + [np.shape(case_data)[1] for case_data in param_data])[:-1]
+    series += np.repeat(series_offsets, [np.size(case_data) for case_data in param_data])
+
+    values, series = _turning_points(values, series)
+
+    cycle_ranges = []
+    cycle_means = []
+    cycle_series = []
+    while len(values) > 3:
+        point_ranges = np.abs(np.diff(values))
+        same_series = series[1:] == series[:-1]
+        # Pair (i, i+1) is a full cycle if it and both neighbouring ranges are within one series, and its range is no
+        # larger than either neighbouring range
+        inner = point_ranges[1:-1]
+        is_cycle = same_series[:-2] & same_series[1:-1] & same_series[2:] & \
+            (inner <= point_ranges[:-2]) & (inner <= point_ranges[2:])
+        cycle_starts = np.flatnonzero(is_cycle) + 1
+        if len(cycle_starts) == 0:
+            break
+        # Overlapping pairs only happen between equal ranges; the later one is extracted on the next pass
+        cycle_starts = cycle_starts[np.concatenate([[True], np.diff(cycle_starts) > 1])]
+
+        cycle_ranges.append(point_ranges[cycle_starts])
+        cycle_means.append((values[cycle_starts] + values[cycle_starts + 1]) / 2)
+        cycle_series.append(series[cycle_starts])
+
+        keep = np.ones(len(values), dtype=bool)
+        keep[cycle_starts] = False
+        keep[cycle_starts + 1] = False
+        values = values[keep]
+        series = series[keep]
+
+    num_full_cycles = sum(len(ranges) for ranges in cycle_ranges)
+    same_series = series[1:] == series[:-1]
+    cycle_ranges.append(np.abs(np.diff(values))[same_series])
+    cycle_means.append(((values[1:] + values[:-1]) / 2)[same_series])
+    cycle_series.append(series[:-1][same_series])
+
+    ranges = np.concatenate(cycle_ranges)
+    counts = np.full(len(ranges), .5)
+    counts[:num_full_cycles] = 1.
+    return ranges, np.concatenate(cycle_means), counts, np.concatenate(cycle_series)
+
+
+def _turning_points(values, series):
+    """
+    Reduces flat labelled series (see rainflow_cycles) to their turning points: the first and last point of each series
+    and every local peak and valley in between, with plateaus reduced to one point.
+    """
+    new_series = np.concatenate([[True], series[1:] != series[:-1]])
+    not_repeated = new_series | np.concatenate([[True], values[1:] != values[:-1]])
+    values = values[not_repeated]
+    series = series[not_repeated]
+
+    first = np.concatenate([[True], series[1:] != series[:-1]])
+    last = np.concatenate([series[1:] != series[:-1], [True]])
+    slopes = np.diff(values)
+    is_turn = np.zeros(len(values), dtype=bool)
+    is_turn[1:-1] = slopes[:-1] * slopes[1:] < 0
+    keep = first | last | is_turn
+    return values[keep], series[keep]
+
+
+def fatigue_damage_sums(param_data, sn_slope=3.):
+    """
+    Returns the rainflow damage sum, sum(count * range ** sn_slope) over all cycles, of every channel of every case of
+    param_data (see rainflow_cycles) as an array of shape (cases, channels). Dividing by the intercept K of an S-N curve
+    N = K * S ** -sn_slope gives the Miner's rule damage of each series.
+    """
+    if isinstance(param_data, np.ndarray) and param_data.ndim == 2:
+        param_data = param_data[np.newaxis]
+    num_cases = len(param_data)
+    num_channels = np.shape(param_data[0])[1]
+    ranges, means, counts, series = rainflow_cycles(param_data)
+    damage_sums = np.bincount(series, weights=counts * ranges ** sn_slope, minlength=num_cases * num_channels)
+    return damage_sums.reshape(num_cases, num_channels)
+
+
+def damage_equivalent_loads(param_data, sn_slope=3., num_equivalent_cycles=3600.):
+    """
+    Returns the damage-equivalent load of every channel of every case of param_data (see rainflow_cycles) as an array
+    of shape (cases, channels): the range that, applied num_equivalent_cycles times, does the same damage as all of
+    the rainflow cycles of the series for an S-N curve of slope sn_slope. The default of 3600 cycles gives the 1 Hz
+    equivalent load of a 1-hour case.
+    """
+    return (fatigue_damage_sums(param_data, sn_slope) / num_equivalent_cycles) ** (1. / sn_slope)
+
+
+def fatigue_channel_names(num_line_segments=6):
+    """Names of the channels of campaign_fatigue, in order."""
+    names = ['ANCHTEN1', 'ANCHTEN2', 'ANCHTEN3']
+    for line_num in [1, 2, 3]:
+        names += ['Line' + str(line_num) + 'Seg' + str(num) + 'Ten' for num in range(1, num_line_segments + 1)]
+    return names
+
+
+def campaign_fatigue(output_file_roots, num_line_segments=6, store=None, sn_slope=3., case_duration=3600.,
+                     max_workers=4, batch_size=16):
+    """
+    Rainflow counts the anchor tensions (ANCHTEN1-3) and every segment tension of the three MoorDyn lines of every
+    case of a campaign. Cases are read with iter_output_parse and counted batch_size cases at a time.
+
+    Returns a dict with 'channels' (the channel names, see fatigue_channel_names), 'damage_sums' (array of shape
+    (cases, channels) of rainflow damage sums, see fatigue_damage_sums), and 'del' (array of the same shape of the
+    1 Hz damage-equivalent loads over case_duration seconds). Pass 'damage_sums' to lifetime_damage to weight the
+    cases by the site's wind probabilities.
+    """
+    batches = []
+    batch = []
+    for _, case_data in iter_output_parse(output_file_roots, num_line_segments, store, max_workers):
+        ptfm_surge, ptfm_sway, anchor_tension, line1_tension, line2_tension, line3_tension = case_data
+        batch.append([anchor_tension, line1_tension, line2_tension, line3_tension])
+        if len(batch) == batch_size:
+            batches.append(_batch_damage_sums(batch, sn_slope))
+            batch = []
+    if batch:
+        batches.append(_batch_damage_sums(batch, sn_slope))
+
+    channels = fatigue_channel_names(num_line_segments)
+    damage_sums = np.concatenate(batches) if batches else np.zeros([0, len(channels)])
+    return {'channels': channels, 'damage_sums': damage_sums,
+            'del': (damage_sums / case_duration) ** (1. / sn_slope)}
+
+
+def _batch_damage_sums(batch, sn_slope):
+    """Damage sums of a batch of cases, each a list of (anchor tensions, line 1, line 2, line 3 tensions)."""
+    # The anchor and line files of a case may have different time steps, so each is a separate set of series
+    group_sums = [fatigue_damage_sums([case_data[group] for case_data in batch], sn_slope) for group in range(4)]
+    return np.concatenate(group_sums, axis=1)
+
+
+def lifetime_damage(damage_sums, case_names, bin_probabilities, sn_intercept=1., case_duration=3600.,
+                    lifetime=20 * 365.25 * 24 * 3600.):
+    """
+    Combines the damage sums of the cases of a campaign (see campaign_fatigue) into the Miner's rule damage over the
+    design lifetime (seconds, 20 years by default), weighting each case by the probability of its wind speed and
+    direction in bin_probabilities (the output of windbins.Wind.get_bin_probabilities). Case names must follow the
+    format of filegen.fst_bulk_filegen, e.g. 'Site1_11.62mps_0deg_Climate0'. The probability of a wind bin is split
+    evenly between the cases (e.g. wave climates) of that bin. Returns an array with the damage of each channel.
+    With the default sn_intercept of 1, the result is the lifetime damage sum, to be divided by the S-N curve intercept.
+    """
+    speeds = np.round(np.asarray(bin_probabilities.index, dtype=float), 3)
+    directions = np.round(np.asarray(bin_probabilities.columns, dtype=float), 3)
+
+    bins = []
+    for case_name in case_names:
+        case_info = result_store.parse_case_name(os.path.basename(case_name))
+        if case_info['wind_speed'] is None or case_info['wind_direction'] is None:
+            raise ValueError('The wind speed and direction of case %s are not in its name.' % case_name)
+        speed_idx = np.flatnonzero(speeds == round(case_info['wind_speed'], 3))
+        direction_idx = np.flatnonzero(directions == round(case_info['wind_direction'] % 360, 3))
+        if len(speed_idx) == 0 or len(direction_idx) == 0:
+            raise ValueError('The wind speed and direction of case %s are not bins of bin_probabilities.' % case_name)
+        bins.append((speed_idx[0], direction_idx[0]))
+
+    bin_case_counts = collections.Counter(bins)
+    weights = np.array([bin_probabilities.values[speed_idx, direction_idx] / bin_case_counts[(speed_idx,
+                                                                                              direction_idx)]
+                        for speed_idx, direction_idx in bins])
+    return weights @ np.asarray(damage_sums) * (lifetime / case_duration) / sn_intercept
+
+
+@functools.lru_cache(maxsize=16)
+def _spectral_window(window, nperseg):
+    """Window array of a Welch PSD, cached so batches of the same segment length share it. Read-only."""
+    from scipy import signal  # scipy is imported where it is used, to keep the command line tools quick to start
+
+    window_array = signal.get_window(window, nperseg)
+    window_array.flags.writeable = False
+    return window_array
+
+
+def welch_psd(param_data, dt, nperseg=4096, overlap=.5, window='hann'):
+    """
+    Computes the one-sided Welch power spectral density of every channel of every case of param_data in one vectorized
+    pass: each series is split into segments of nperseg time steps overlapping by the fraction overlap, and the
+    periodograms of the mean-removed, windowed segments are averaged. Gives the same result as scipy.signal.welch with
+    the default 'constant' detrending and 'density' scaling. Window arrays are cached between calls, and FFTs are
+    computed with scipy.fft, which reuses its FFT plans between calls of the same length.
+
+    Arguments:
+        param_data is a (time steps, channels) array, a (cases, time steps, channels) array, or a list of
+            (time steps, channels) arrays, one per case, which may have different numbers of time steps.
+        dt is the time step (s).
+        nperseg is the segment length in time steps. It is reduced to the length of the shortest case if that is
+            shorter.
+        window is any window name accepted by scipy.signal.get_window.
+    Returns (frequencies, psd), where psd has shape (cases, channels, frequencies).
+    """
+    from scipy import fft as sp_fft
+
+    if isinstance(param_data, np.ndarray) and param_data.ndim == 2:
+        param_data = param_data[np.newaxis]
+    num_steps = [len(case_data) for case_data in param_data]
+    nperseg = min(nperseg, min(num_steps))
+    step = nperseg - int(nperseg * overlap)
+    window_array = _spectral_window(window, nperseg)
+    frequencies = sp_fft.rfftfreq(nperseg, dt)
+
+    psd = np.zeros([len(param_data), np.shape(param_data[0])[1], len(frequencies)])
+    # Cases of the same length are transformed together
+    for length in sorted(set(num_steps)):
+        case_idx = [idx for idx, case_length in enumerate(num_steps) if case_length == length]
+        data = np.stack([np.asarray(param_data[idx], dtype=np.float64) for idx in case_idx])
+        segments = np.lib.stride_tricks.sliding_window_view(data, nperseg, axis=1)[:, ::step]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        segments *= window_array
+        spectra = sp_fft.rfft(segments, axis=-1)
+        psd[case_idx] = (spectra.real ** 2 + spectra.imag ** 2).mean(axis=1)
+
+    psd *= 2. * dt / (window_array ** 2).sum()
+    psd[..., 0] /= 2.
+    if nperseg % 2 == 0:
+        psd[..., -1] /= 2.
+    return frequencies, psd
+
+
+def spectral_moments(frequencies, psd, orders=(0, 1, 2, 4)):
+    """
+    Returns the spectral moments m_n = integral of f^n * S(f) df of the specified orders for every spectrum of psd (see
+    welch_psd), as an array of shape psd.shape[:-1] + (len(orders),). m_0 is the variance of the series, and e.g.
+    sqrt(m_0 / m_2) is the mean zero-upcrossing period.
+    """
+    df = frequencies[1] - frequencies[0]
+    return np.stack([(psd * frequencies ** order).sum(axis=-1) * df for order in orders], axis=-1)
+
+
+def peak_frequencies(frequencies, psd):
+    """Returns the frequency of the highest nonzero-frequency peak of every spectrum of psd (see welch_psd)."""
+    return frequencies[1:][np.argmax(psd[..., 1:], axis=-1)]
+
+
+def campaign_spectra(output_file_roots, param_names, nperseg=4096, overlap=.5, window='hann', store=None,
+                     max_workers=4, batch_size=16, spectra_file=None):
+    """
+    Computes the Welch PSDs, spectral moments, and peak frequencies of the specified .outb channels of every case of a
+    campaign. Channels are read with get_param_data, bypassing the get_channels cache as each case is only read once,
+    batch_size cases at a time on max_workers threads, and each batch is transformed in one call of welch_psd. The
+    time step is taken from the Time channel of each case; all cases must have the same time step.
+
+    Returns a dict with 'channels' (param_names), 'frequencies', 'psd' (float32 array of shape (cases, channels,
+    frequencies)), 'moments' (array of shape (cases, channels, 4) of the spectral moments of orders 0, 1, 2, and 4),
+    and 'peak_frequency' (array of shape (cases, channels)). If spectra_file is given, the dict is also saved there
+    with np.savez.
+    """
+    output_file_roots = list(output_file_roots)
+    spectra = {'channels': list(param_names), 'frequencies': None,
+               'psd': None, 'moments': np.zeros([len(output_file_roots), len(param_names), 4]),
+               'peak_frequency': np.zeros([len(output_file_roots), len(param_names)])}
+
+    def read_case(output_file_root):
+        return get_param_data(output_file_root + '.outb', ['Time'] + list(param_names), store=store, use_cache=False)
+
+    with concurrent.futures.ThreadPoolExecutor(max(max_workers, 1)) as executor:
+        for batch_start in range(0, len(output_file_roots), batch_size):
+            batch_roots = output_file_roots[batch_start:batch_start + batch_size]
+            batch_data = list(executor.map(read_case, batch_roots))
+            time_steps = np.array([case_data[1, 0] - case_data[0, 0] for case_data in batch_data])
+            if not np.allclose(time_steps, time_steps[0]):
+                raise ValueError('All cases of campaign_spectra need the same time step.')
+
+            frequencies, psd = welch_psd([case_data[:, 1:] for case_data in batch_data], time_steps[0], nperseg,
+                                         overlap, window)
+            if spectra['psd'] is None:
+                spectra['frequencies'] = frequencies
+                spectra['psd'] = np.zeros([len(output_file_roots), len(param_names), len(frequencies)],
+                                          dtype=np.float32)
+            elif len(frequencies) != len(spectra['frequencies']) or \
+                    not np.allclose(frequencies, spectra['frequencies']):
+                raise ValueError('All cases of campaign_spectra need the same time step and segment length.')
+
+            batch_slice = slice(batch_start, batch_start + len(batch_roots))
+            spectra['psd'][batch_slice] = psd
+            spectra['moments'][batch_slice] = spectral_moments(frequencies, psd)
+            spectra['peak_frequency'][batch_slice] = peak_frequencies(frequencies, psd)
+
+    if spectra_file is not None:
+        np.savez(spectra_file, **spectra)
+    return spectra
+
+
+def output_parse(output_file_root, num_line_segments=6, store=None, max_workers=None, use_cache=True):
     """
     Parses platform surge/sway and mooring/anchor tensions from OUTB and MD.out files.
     Parameters:
         output_file_root: the filename of the output files (and FST file used to generate those outputs)
     minus the extension. E.g. if "Test01.outb" and "Test01.MD.Line1.out" are two output files of interest,
     output_file_root = 'Test01'
+        store (optional): a result_store.ResultStore to read the case from instead of the output files.
+        max_workers (optional): number of threads to read the .outb and MD.out files of the case with concurrently.
+    By default the files are read one after another.
+        use_cache (optional): whether to keep the decoded channels in the get_channels cache for later reads.
     """
 
-    outb_file = output_file_root + '.outb'
-    md_out_file1= output_file_root + '.MD.Line1.out'
-    md_out_file2 = output_file_root + '.MD.Line2.out'
-    md_out_file3 = output_file_root + '.MD.Line3.out'
+    reads = _case_reads(output_file_root, num_line_segments, store, use_cache)
+    if max_workers is None or max_workers <= 1:
+        file_data = [function(*args) for function, args in reads]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            file_data = [future.result() for future in [executor.submit(function, *args) for function, args in reads]]
+
+    return _split_case_data(file_data)
+
 
+def iter_output_parse(output_file_roots, num_line_segments=6, store=None, max_workers=4, prefetch=1,
+                      use_cache=False):
+    """
+    Generator version of output_parse for a sequence of cases. Yields (output_file_root, output_parse result) for each
+    case in order. The files of each case are read concurrently on a pool of max_workers threads, and the files of the
+    next prefetch cases are read while the caller is still processing the current case, so file reading latency
+    overlaps with the caller's work. Each case is usually read once, so by default the get_channels cache is bypassed
+    (see get_channels).
+    """
+    output_file_roots = iter(output_file_roots)
+    pending = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(max(max_workers, 1)) as executor:
+        try:
+            while True:
+                while len(pending) <= prefetch:
+                    output_file_root = next(output_file_roots, None)
+                    if output_file_root is None:
+                        break
+                    reads = _case_reads(output_file_root, num_line_segments, store, use_cache)
+                    pending.append((output_file_root, [executor.submit(function, *args) for function, args in reads]))
+                if not pending:
+                    break
+                output_file_root, futures = pending.popleft()
+                yield output_file_root, _split_case_data([future.result() for future in futures])
+        finally:
+            for _, futures in pending:
+                for future in futures:
+                    future.cancel()
+
+
+def _case_reads(output_file_root, num_line_segments, store, use_cache=True):
+    """
+    Returns the list of (function, arguments) reads of a case for output_parse: the platform and anchor channels of
+    the .outb file in a single pass, then the segment tensions of each MoorDyn line.
+    """
     moordyn_params = []
     for num in np.arange(1, num_line_segments+1):
         moordyn_params.append('Seg'+str(num)+'Ten')
 
-    ptfm_surge = get_param_data(outb_file, ['PtfmSurge'])
-    ptfm_sway = get_param_data(outb_file, ['PtfmSway'])
-    anchor_tension = get_param_data(outb_file, ['ANCHTEN1', 'ANCHTEN2', 'ANCHTEN3'])
-    line1_tension = get_moordyn_data(md_out_file1, moordyn_params)
-    line2_tension = get_moordyn_data(md_out_file2, moordyn_params)
-    line3_tension = get_moordyn_data(md_out_file3, moordyn_params)
+    reads = [(get_param_data, (output_file_root + '.outb', ['PtfmSurge', 'PtfmSway', 'ANCHTEN1', 'ANCHTEN2',
+                                                            'ANCHTEN3'], False, store, use_cache))]
+    for line_num in [1, 2, 3]:
+        reads.append((get_moordyn_data, (output_file_root + '.MD.Line' + str(line_num) + '.out', moordyn_params,
+                                         store, use_cache)))
+    return reads
+
+
+def _split_case_data(file_data):
+    outb_data, line1_tension, line2_tension, line3_tension = file_data
+    ptfm_surge = outb_data[:, 0:1]
+    ptfm_sway = outb_data[:, 1:2]
+    anchor_tension = outb_data[:, 2:5]
 
     return ptfm_surge, ptfm_sway, anchor_tension, line1_tension, line2_tension, line3_tension
 
 
+def shared_reductions(output_file, param_names, reductions, max_workers=4):
+    """
+    Runs several analyses of the same channels of one output file in parallel worker processes. The channels are
+    decoded once into shared memory (see fast_io.SharedOutput), and each worker reads them through a zero-copy view
+    instead of decoding the file again or receiving a pickled copy. The shared memory is freed when all analyses are
+    done, even if one of them fails.
+
+    Arguments:
+        output_file is a FAST binary (.outb) or text (.out, including MoorDyn .MD.Line#.out) output file. .outb
+            channels are decoded straight into shared memory; text files are read through get_channels first.
+        param_names is the list of channels to analyze.
+        reductions is a dict of analyses by name. Each takes the (time steps, channels) array of the channels, and must
+            be picklable, e.g. fatigue_damage_sums or functools.partial(welch_psd, dt=.05).
+        max_workers is the number of worker processes.
+    Returns a dict of the result of each analysis by name.
+    """
+    if output_file.endswith('.outb'):
+        shared = fast_io.publish_binary_output(output_file, param_names)
+    else:
+        shared = fast_io.SharedOutput.from_array(get_channels(output_file, param_names), param_names)
+
+    with shared:
+        with concurrent.futures.ProcessPoolExecutor(max(min(max_workers, len(reductions)), 1)) as executor:
+            futures = {name: executor.submit(_shared_reduction, shared.handle(), reduction)
+                       for name, reduction in reductions.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+
+def _shared_reduction(handle, reduction):
+    with fast_io.attach_shared_output(handle) as shared:
+        result = reduction(shared.data)
+        # A result that is a view of the shared data would be invalid once the segment is closed
+        if isinstance(result, np.ndarray) and np.shares_memory(result, shared.data):
+            result = result.copy()
+    return result
+
+
 def get_most_recent_file_containing(string, file_extension=None, file_directory=None):
     """
     Finds the most recently modified file in a directory containing a certain string. Note this operates most
-    efficiently if a file extension is also provided.
+    efficiently if a file extension is also provided. Files are found through the directory's DirectoryIndex, so only
+    regular files are returned, and only the matching files are stat'ed. The matching files are stat'ed again on every
+    call, since a file overwritten in place doesn't change the directory's modification time.
     """
     if file_directory is None:
         file_directory = os.path.dirname(os.path.realpath(__file__))
 
-    if file_extension:
-        files_with_extension = get_filenames(file_extension, file_directory)
-        files_with_string = [filenames for filenames in files_with_extension if string in filenames]
-    else:
-        all_dir_files = os.listdir(file_directory)
-        files_with_string = [filenames for filenames in all_dir_files if string in filenames]
-
-    most_recent_file = max(files_with_string, key=os.path.getctime)
+    index = get_directory_index(file_directory)
+    files_with_string = index.files(extension=file_extension, contains=string)
+    most_recent_file = max(files_with_string, key=lambda filename: index.stat(filename, refresh=True).st_ctime)
 
     return most_recent_file
 
 
 def get_filenames(file_extension, file_directory=None):
     """
-     Generates a list of files contained within a specified
-     file directory with a particular file extension.
+     Generates a sorted list of files contained within a specified
+     file directory with a particular file extension. The directory is listed through its DirectoryIndex, so repeated
+     calls on an unchanged directory don't list it again.
 
      Arguments:
          file_extension is a string specifying the desired file extension to be returned
@@ -102,13 +752,99 @@ def get_filenames(file_extension, file_directory=None):
     if file_directory is None:
         file_directory = os.path.dirname(os.path.realpath(__file__))
 
-    all_dir_files = os.listdir(file_directory)
-    returned_files = []
-    for files in all_dir_files:
-        if files.endswith(file_extension):
-            returned_files.append(files)
+    return get_directory_index(file_directory).files(extension=file_extension)
+
+
+class DirectoryIndex:
+    """
+    Cached listing of the files in a directory, built with os.scandir, with the stat results of the files that have
+    been asked about. The listing is refreshed whenever the directory's modification time changes (i.e. files have
+    been added, removed, or renamed); a refresh keeps the stat results of files that are still the same file. Because
+    file system timestamps are coarse, a listing made within timestamp_resolution seconds of the directory's last
+    change isn't trusted, and the directory is scanned again on the next query. Stat results of files that are modified
+    in place (without changing the directory) are only updated by stat(filename, refresh=True).
+    """
 
-    return returned_files
+    timestamp_resolution = 2.
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._entries = {}
+        self._directory_mtime = None
+        self._scan_time = None
+
+    def refresh(self):
+        """Rescans the directory if it may have changed since the last scan."""
+        directory_mtime = os.stat(self.directory).st_mtime_ns
+        if directory_mtime == self._directory_mtime and \
+                directory_mtime < self._scan_time - self.timestamp_resolution * 1e9:
+            return
+
+        scan_time = time.time_ns()
+        entries = {}
+        with os.scandir(self.directory) as scanned_entries:
+            for entry in scanned_entries:
+                if not entry.is_file():
+                    continue
+                old_entry = self._entries.get(entry.name)
+                if old_entry is not None and old_entry['inode'] == entry.inode():
+                    entries[entry.name] = old_entry
+                else:
+                    entries[entry.name] = {'inode': entry.inode(), 'stat': None}
+        self._entries = entries
+        self._directory_mtime = directory_mtime
+        self._scan_time = scan_time
+
+    def files(self, extension=None, contains=None, pattern=None):
+        """
+        Returns the sorted names of the files in the directory that end with extension, contain the substring contains,
+        and match the glob pattern (e.g. '*_Climate0.dat'), for whichever of these are given.
+        """
+        self.refresh()
+        filenames = self._entries
+        if extension:
+            filenames = [filename for filename in filenames if filename.endswith(extension)]
+        if contains:
+            filenames = [filename for filename in filenames if contains in filename]
+        if pattern:
+            filenames = fnmatch.filter(filenames, pattern)
+        return sorted(filenames)
+
+    def stat(self, filename, refresh=False):
+        """Returns the os.stat result of a file in the directory, cached after the first call."""
+        self.refresh()
+        entry = self._entries.get(filename)
+        if entry is None:
+            raise FileNotFoundError(os.path.join(self.directory, filename))
+        if entry['stat'] is None or refresh:
+            entry['stat'] = os.stat(os.path.join(self.directory, filename))
+        return entry['stat']
+
+
+# LRU cache of the shared DirectoryIndex of each directory listed through get_directory_index, keyed by absolute path
+# and bounded to max_directory_indexes directories. Guarded by its own lock, as it is used from threaded readers.
+_directory_indexes = collections.OrderedDict()
+_directory_index_lock = threading.Lock()
+max_directory_indexes = 256
+
+
+def get_directory_index(directory):
+    """Returns the shared DirectoryIndex of a directory, creating it on first use."""
+    key = os.path.abspath(directory)
+    with _directory_index_lock:
+        index = _directory_indexes.get(key)
+        if index is None:
+            index = _directory_indexes[key] = DirectoryIndex(directory)
+        _directory_indexes.move_to_end(key)
+        while len(_directory_indexes) > max_directory_indexes:
+            _directory_indexes.popitem(last=False)
+        return index
+
+
+def clear_directory_indexes():
+    """Forgets every shared DirectoryIndex, so directories are listed and files stat'ed again on next use."""
+    with _directory_index_lock:
+        _directory_indexes.clear()
 
 
 def move_files(files, destination_directory, source_directory=None):
@@ -122,10 +858,11 @@ def move_files(files, destination_directory, source_directory=None):
         shutil.move(source_directory+'/'+file, destination_directory)
 
 
-def get_param_data(outb_file, param_names):
+def get_param_data(outb_file, param_names, packed=False, store=None, use_cache=True):
     """
     Returns a numpy array of the data for the specified parameters from the specified .outb
-    FAST binary output file
+    FAST binary output file. Data is read through get_channels, so channels already read from the same file are taken
+    from the cache instead of being decoded again. With use_cache=False, newly decoded channels aren't cached.
 
     Arguments:
         outb_file is a string specifying the relative or complete path to the target
@@ -134,21 +871,27 @@ def get_param_data(outb_file, param_names):
             to have data returned for from outb_file. These strings should exactly
             match the parameter names given in the FAST input files, with the exception of MoorDyn-specific outputs,
             which should be in all caps.
+        packed specifies whether to return the data unscaled as a fast_io.PackedData object (int16 values plus
+            per-channel scale and offset), which can be passed directly to make_distributions. 'Time' cannot be
+            requested when packed is True.
+        store (optional) is a result_store.ResultStore to read the data from instead of outb_file, in which case
+            outb_file only identifies the case. Packed data isn't available from a store.
     """
-    outb_data = fast_io.load_binary_output(outb_file)[0]
-    outb_params = fast_io.load_binary_output(outb_file)[1]['attribute_names']
-
-    time = outb_data[:, 0]  # 'Time' parameter is always the first output column in FAST
-    param_data = np.zeros([len(time), len(param_names)], dtype=float, order='F')
-
-    for idx, param in enumerate(param_names):
-        param_col = outb_params.index(param)
-        param_data[:, idx] = outb_data[:, param_col]
+    if store is not None:
+        if packed:
+            raise ValueError('Packed data is not available from a result store.')
+        return store.get_channels(outb_file, param_names)
+
+    if packed:
+        with fast_io.BinaryOutput(outb_file) as outb:
+            param_data = outb.get_packed(param_names)
+    else:
+        param_data = get_channels(outb_file, param_names, use_cache)
 
     return param_data
 
 
-def get_moordyn_data(md_line_out_file, param_names):
+def get_moordyn_data(md_line_out_file, param_names, store=None, use_cache=True):
     """
     Returns a numpy array of the data for the specified parameters from the specified MoorDyn output file of
     file extension 'MD.Line#.out'.
@@ -157,21 +900,116 @@ def get_moordyn_data(md_line_out_file, param_names):
         md_line_out_file is a string specifying the relative or complete path to the target md.line#.out file
         param_names is a list of strings of the desired parameter names to have data returned for from outb_file.
         These strings should exactly match the parameter names given in the MoorDyn output files.
+        store (optional) is a result_store.ResultStore to read the data from instead of md_line_out_file, in which
+        case md_line_out_file only identifies the case and line.
+        use_cache (optional) is whether to keep newly decoded channels in the get_channels cache.
     """
 
     if 'MD.Line' not in md_line_out_file:
         raise Exception('md_line_out_file is not the correct file type. Specify a .MD.Line#.out file.')
 
-    output_data = pd.read_csv(md_line_out_file, skiprows=[1], sep='\s+', dtype=float)
-
-    time = output_data['Time']
+    if store is not None:
+        return store.get_moordyn_channels(md_line_out_file, param_names)
 
-    #  Data imported as pandas dataframe, returned as numpy array to match format of get_param_data
-    moordyn_data = output_data[param_names].to_numpy()
+    #  Only the requested columns are parsed, and returned as a numpy array to match format of get_param_data
+    moordyn_data = get_channels(md_line_out_file, param_names, use_cache)
 
     return moordyn_data
 
 
+def get_channels(output_file, param_names, use_cache=True):
+    """
+    Returns a Fortran-ordered numpy array of the specified channels of a FAST binary (.outb) or text (.out, including
+    MoorDyn .MD.Line#.out) output file, with one column per entry of param_names. All channels that aren't already
+    cached are decoded from the file in a single pass and added to the cache, so asking for more channels of a file
+    that was read before only decodes the new ones. The cache is keyed by the file's path and is invalidated when the
+    file's size or modification time changes. When the cache grows past its size limit (see set_cache_size), the
+    least recently used files are evicted. With use_cache=False, channels that are already cached are still used, but
+    newly decoded ones aren't added, for reads that won't be repeated (e.g. a campaign reading each file once). Safe to
+    call from several threads at once. Raises ValueError if a channel isn't in the file.
+    """
+    stat = os.stat(output_file)
+    key = os.path.abspath(output_file)
+    signature = (stat.st_size, stat.st_mtime_ns)
+
+    with _cache_lock:
+        entry = _output_cache.get(key)
+        if use_cache:
+            entry = _cache_entry(key, signature)
+        channels = dict(entry['channels']) if entry is not None and entry['signature'] == signature else {}
+    missing_params = [param for param in dict.fromkeys(param_names) if param not in channels]
+
+    # Files are decoded outside of the lock, so several threads can read different files at once
+    if missing_params:
+        if output_file.endswith('.outb'):
+            with fast_io.BinaryOutput(output_file) as outb:
+                new_data = outb.get_channels(missing_params)
+        else:
+            new_data = np.asfortranarray(fast_io.load_ascii_output(output_file, missing_params)[0])
+        new_channels = {param: new_data[:, idx] for idx, param in enumerate(missing_params)}
+        channels.update(new_channels)
+
+    if missing_params and use_cache:
+        with _cache_lock:
+            entry = _cache_entry(key, signature)
+            for param, column in new_channels.items():
+                if param not in entry['channels']:
+                    entry['channels'][param] = column
+                    entry['num_bytes'] += column.nbytes
+                    _cache_settings['num_bytes'] += column.nbytes
+            _evict(_cache_settings['max_bytes'])
+
+    num_steps = len(next(iter(channels.values()))) if channels else 0
+    param_data = np.zeros([num_steps, len(param_names)], order='F')
+    for idx, param in enumerate(param_names):
+        param_data[:, idx] = channels[param]
+
+    return param_data
+
+
+def _cache_entry(key, signature):
+    """
+    Returns the output cache entry of a file, marked as most recently used. Creates a new empty entry if the file isn't
+    cached or has changed since it was. Must be called with _cache_lock held.
+    """
+    entry = _output_cache.get(key)
+    if entry is not None and entry['signature'] != signature:
+        del _output_cache[key]
+        _cache_settings['num_bytes'] -= entry['num_bytes']
+        entry = None
+    if entry is None:
+        entry = {'signature': signature, 'channels': {}, 'num_bytes': 0}
+        _output_cache[key] = entry
+    _output_cache.move_to_end(key)
+    return entry
+
+
+def _evict(max_bytes):
+    """
+    Removes least recently used files from the output cache until it holds at most max_bytes of data. Must be called
+    with _cache_lock held.
+    """
+    while _output_cache and _cache_settings['num_bytes'] > max_bytes:
+        entry = _output_cache.popitem(last=False)[1]
+        _cache_settings['num_bytes'] -= entry['num_bytes']
+
+
+def set_cache_size(max_bytes):
+    """
+    Sets the maximum amount of decoded data, in bytes, that get_channels keeps cached (1 GiB by default). Setting it to
+    0 disables caching.
+    """
+    with _cache_lock:
+        _cache_settings['max_bytes'] = max_bytes
+        _evict(max_bytes)
+
+
+def clear_cache():
+    """Empties the get_channels cache."""
+    with _cache_lock:
+        _evict(-1)
+
+
 if __name__ == "__main__":
     test_file = r'D:\FAST output files\Oregon_SparTest_Typical_2.25mps_0deg_PM_Summer'
     output_parse(test_file)
\ No newline at end of file
@@ -1,48 +1,202 @@
 from fowt_force_gen import parse
 from fowt_force_gen import filegen
+from fowt_force_gen import result_store
 import argparse
+import concurrent.futures
+import glob
+import json
 import os
+import sys
+import traceback
+
+
+FailureFile = 'failed_cases.json'
+
+
+def case_input_files(output_file_root, store_file=None):
+    """
+    Returns the files a case's MAT files are generated from: its .outb and .MD.Line#.out files, or the result store if
+    the case is read from one.
+    """
+    if store_file is not None:
+        return [store_file]
+    case_directory, case_name = os.path.split(output_file_root)
+    md_line_files = parse.get_directory_index(case_directory or '.').files(pattern=glob.escape(case_name) + '.MD.Line*.out')
+    return [output_file_root + '.outb'] + [os.path.join(case_directory, filename) for filename in md_line_files]
+
+
+def mat_filenames(case_name, mat_file_dir):
+    """Returns the filenames of the reliability results and surge MAT files of a case."""
+    return (mat_file_dir + '/' + 'ReliabilityResults_' + case_name + '.mat',
+            mat_file_dir + '/' + 'Surge_' + case_name + '.mat')
+
+
+def is_case_current(output_file_root, case_name, mat_file_dir, store_file=None):
+    """Returns True if both MAT files of a case exist and are newer than all of the case's input files."""
+    try:
+        mat_mtime = min(os.stat(filename).st_mtime_ns for filename in mat_filenames(case_name, mat_file_dir))
+        input_mtime = max(os.stat(filename).st_mtime_ns for filename in case_input_files(output_file_root, store_file))
+    except FileNotFoundError:
+        return False
+    return mat_mtime > input_mtime
+
+
+def _write_mat_files(distributions, case_num, case_name, mat_file_dir):
+    """
+    Writes the MAT files of one case of campaign_distributions output. Files are written under temporary names and
+    then renamed, so an interrupted run never leaves a partial MAT file that looks up to date.
+    """
+    reliability_results_filename, surge_results_filename = mat_filenames(case_name, mat_file_dir)
+    temp_filenames = [mat_file_dir + '/.tmp_' + os.path.basename(filename)
+                      for filename in (reliability_results_filename, surge_results_filename)]
+    filegen.create_mat_files(temp_filenames[0], temp_filenames[1],
+                             distributions['line1'][case_num], distributions['line2'][case_num],
+                             distributions['line3'][case_num], distributions['anchor'][case_num, 0],
+                             distributions['anchor'][case_num, 1], distributions['anchor'][case_num, 2],
+                             distributions['surge'][case_num], distributions['sway'][case_num])
+    os.replace(temp_filenames[0], reliability_results_filename)
+    os.replace(temp_filenames[1], surge_results_filename)
+
+
+def process_cases(output_file_roots, case_names, mat_file_dir, store_file=None, num_line_segments=6, threads=4):
+    """
+    Parses a batch of cases and writes their MAT files. Cases are reduced together with parse.campaign_distributions;
+    if the batch fails, each case whose MAT files weren't written before the failure (checked with is_case_current, as
+    on resume) is retried on its own so only the cases that actually fail are lost. Returns a dict of the traceback of
+    each failed case by case name.
+    """
+    store = result_store.ResultStore(store_file) if store_file is not None else None
+    failures = {}
+    try:
+        try:
+            distributions = parse.campaign_distributions(output_file_roots, num_line_segments, store, threads)
+            for case_num, case_name in enumerate(case_names):
+                _write_mat_files(distributions, case_num, case_name, mat_file_dir)
+        except Exception:
+            for output_file_root, case_name in zip(output_file_roots, case_names):
+                if is_case_current(output_file_root, case_name, mat_file_dir, store_file):
+                    continue
+                try:
+                    distributions = parse.campaign_distributions([output_file_root], num_line_segments, store, threads)
+                    _write_mat_files(distributions, 0, case_name, mat_file_dir)
+                except Exception:
+                    failures[case_name] = traceback.format_exc()
+    finally:
+        if store is not None:
+            store.close()
+    return failures
+
+
+def process_campaign(output_file_roots, case_names, mat_file_dir='force_gen', store_file=None, num_line_segments=6,
+                     processes=1, threads=4, batch_size=16, overwrite=False, verbose=False):
+    """
+    Generates the MAT files of every case of a campaign, batch_size cases at a time. With processes > 1, batches are
+    distributed across a pool of worker processes, each reading its batch's files on threads threads.
+
+    Cases whose MAT files are newer than their inputs are skipped unless overwrite is True, so an interrupted campaign
+    resumes where it stopped. A case that fails to parse doesn't stop the others: its traceback is recorded in
+    failed_cases.json in mat_file_dir, which is removed again once a run has no failures. Failed cases have no MAT
+    files, so they are retried on the next run.
+
+    Arguments:
+        output_file_roots are the filenames of each case's output files minus the extension, or its case name if the
+            cases are read from a result store.
+        case_names are the names the MAT files of each case are given.
+        store_file (optional) is the path of a result store to read the cases from.
+    Returns a dict of the 'processed' and 'skipped' case names, and the 'failed' case names with their tracebacks.
+    """
+    if not os.path.exists(mat_file_dir):
+        os.makedirs(mat_file_dir)
+
+    results = {'processed': [], 'skipped': [], 'failed': {}}
+    pending = []
+    for output_file_root, case_name in zip(output_file_roots, case_names):
+        if not overwrite and is_case_current(output_file_root, case_name, mat_file_dir, store_file):
+            results['skipped'].append(case_name)
+        else:
+            pending.append((output_file_root, case_name))
+    if verbose and results['skipped']:
+        print('Skipping ' + str(len(results['skipped'])) + ' cases with up-to-date MAT files')
+
+    batches = [pending[idx:idx + batch_size] for idx in range(0, len(pending), batch_size)]
+    batch_args = [([root for root, _ in batch], [name for _, name in batch], mat_file_dir, store_file,
+                   num_line_segments, threads) for batch in batches]
+
+    def record(batch, failures):
+        results['failed'].update(failures)
+        results['processed'] += [case_name for _, case_name in batch if case_name not in failures]
+        if verbose:
+            print('Processed ' + str(len(results['processed']) + len(results['failed'])) + '/' + str(len(pending)) +
+                  ' cases (' + str(len(results['failed'])) + ' failed)')
+
+    if processes > 1 and len(batches) > 1:
+        with concurrent.futures.ProcessPoolExecutor(min(processes, len(batches))) as executor:
+            futures = {executor.submit(process_cases, *args): batch for args, batch in zip(batch_args, batches)}
+            for future in concurrent.futures.as_completed(futures):
+                batch = futures[future]
+                try:
+                    failures = future.result()
+                except Exception:
+                    # The worker itself died (e.g. ran out of memory), so the whole batch is lost
+                    failures = {case_name: traceback.format_exc() for _, case_name in batch}
+                record(batch, failures)
+    else:
+        for args, batch in zip(batch_args, batches):
+            record(batch, process_cases(*args))
+
+    failure_file = os.path.join(mat_file_dir, FailureFile)
+    if results['failed']:
+        with open(failure_file, 'w') as f:
+            json.dump(results['failed'], f, indent=1, sort_keys=True)
+    elif os.path.exists(failure_file):
+        os.remove(failure_file)
+
+    return results
 
 
 def main():
     parser = argparse.ArgumentParser(description='Creates MAT files of proper format for reliability code '
                                                  'from OpenFAST .outb and .out files')
-    parser.add_argument('-dir', '--openfastfiledir', type=str, required=True,
+    parser.add_argument('-dir', '--openfastfiledir', type=str,
                         help='String of relative path to file directory consisting of .out and .outb OpenFAST files')
+    parser.add_argument('-st', '--store', type=str,
+                        help='Result store created by fowt_force_gen.result_store to read the cases from, instead of '
+                             'a file directory')
+    parser.add_argument('-th', '--threads', type=int, default=4,
+                        help='Number of threads to read output files with. The files of each case are read '
+                             'concurrently, and the next case is read while the current one is being processed '
+                             '(default 4)')
+    parser.add_argument('-p', '--processes', type=int, default=1,
+                        help='Number of worker processes to distribute the cases across (default 1)')
+    parser.add_argument('-ow', '--overwrite', action='store_true',
+                        help='Regenerate the MAT files of every case, including cases whose MAT files are already '
+                             'newer than their output files')
     args = parser.parse_args()
+    if not args.openfastfiledir and not args.store:
+        parser.error('one of the arguments -dir/--openfastfiledir or -st/--store is required')
 
     openfast_file_dir = args.openfastfiledir
     mat_file_dir = 'force_gen'
 
-    if not os.path.exists('force_gen'):
-        os.makedirs('force_gen')
-
-    outb_files = parse.get_filenames('.outb', file_directory=openfast_file_dir)
-
-    md_out_files = parse.get_filenames('.out', file_directory=openfast_file_dir)
-
-    # Do post-processing for all tests
-    all_output_roots = [filenames.replace('.outb', '') for filenames in outb_files]
-
-    for test in all_output_roots:
-        # Step 6: Parse the OpenFAST outputs into mooring/anchor tension and platform surge/sway into numpy arrays
-        #         containing the relevant statistical occurrences
-        ptfm_surge, ptfm_sway, anchor_tension, line1_tension, line2_tension, line3_tension = \
-            parse.output_parse(openfast_file_dir+'/'+test)
+    if args.store:
+        with result_store.ResultStore(args.store) as store:
+            all_output_roots = store.case_names()
+        output_file_roots = all_output_roots
+    else:
+        outb_files = parse.get_filenames('.outb', file_directory=openfast_file_dir)
 
-        surge_stats = parse.make_distributions(ptfm_surge, calculate_stdev=False)
-        sway_stats = parse.make_distributions(ptfm_sway, calculate_stdev=False)
-        anchor_stats = parse.make_distributions(anchor_tension)
-        line1_stats = parse.make_distributions(line1_tension)
-        line2_stats = parse.make_distributions(line2_tension)
-        line3_stats = parse.make_distributions(line3_tension)
+        # Do post-processing for all tests
+        all_output_roots = [filenames.replace('.outb', '') for filenames in outb_files]
+        output_file_roots = [openfast_file_dir + '/' + test for test in all_output_roots]
 
-        # Step 7: Create MAT files matching the format of the external reliability code
-        reliability_results_filename = mat_file_dir + '/' + 'ReliabilityResults_' + test + '.mat'
-        surge_results_filename = mat_file_dir + '/' + 'Surge_' + test+ '.mat'
-        filegen.create_mat_files(reliability_results_filename, surge_results_filename,
-                                 line1_stats, line2_stats, line3_stats, anchor_stats[0, :], anchor_stats[1, :],
-                                 anchor_stats[2, :], surge_stats, sway_stats)
+    # Step 6: Parse the OpenFAST outputs into mooring/anchor tension and platform surge/sway, and find the relevant
+    #         statistical occurrences of each case
+    # Step 7: Create MAT files matching the format of the external reliability code
+    results = process_campaign(output_file_roots, all_output_roots, mat_file_dir, args.store,
+                               processes=args.processes, threads=args.threads, overwrite=args.overwrite, verbose=True)
+    if results['failed']:
+        print(str(len(results['failed'])) + ' cases failed; see ' + os.path.join(mat_file_dir, FailureFile))
+        sys.exit(1)
 
 
 if __name__ == '__main__':
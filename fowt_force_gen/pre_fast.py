@@ -5,6 +5,7 @@ from fowt_force_gen import run_fast
 from fowt_force_gen import moortune
 from fowt_force_gen import parse
 import argparse
+import json
 import os
 
 
@@ -22,6 +23,15 @@ def main():
                         help='Root of filenames that all output files will start with.')
     parser.add_argument('-ex', '--example', type=int,
                         help='Example MoorDyn files to use (optional). Overwrites fileroot if used.')
+    parser.add_argument('-wc', '--waveclimates', type=str, default='index',
+                        choices=['index', 'month', 'season', 'cluster', 'prompt'],
+                        help='How to divide wave data into climates: 12 equal blocks of measurements (index), '
+                             'calendar months, seasons, 12 clusters of similar sea states, or as entered at prompts '
+                             'after the monthly wave data is displayed (prompt). Defaults to index; the prompts are no '
+                             'longer shown unless -wc prompt is given.')
+    parser.add_argument('-wm', '--wavemerge', type=str,
+                        help='JSON file of the divisions to combine into each wave climate (optional), e.g. '
+                             '{"Winter": ["Dec", "Jan", "Feb"], "Summer": ["Jun", "Jul", "Aug"]}')
     args = parser.parse_args()
 
     # Step 1.5: Define template OpenFAST files to be used later in custom file creation (Step 5)
@@ -58,10 +68,12 @@ def main():
     buoy.data_scraper(buoy_num)
 
     # Step 3: Read the text files and partition critical parameters into bins. If wind or current data does
-    #         not exist, specify as such so it isn't accounted for in OpenFAST file creation. Prompt user for input
-    #         to determine how to split wave climates, as separate HydroDyn files are created for each climate later.
+    #         not exist, specify as such so it isn't accounted for in OpenFAST file creation. Split the wave data into
+    #         climates as set by -wc/-wm (or user input at prompts), as separate HydroDyn files are created for each
+    #         climate later.
     met_file = parse.get_most_recent_file_containing('met_data_'+str(buoy_num), '.txt')
-    met_data = windbins.get_met_data(met_file)
+    met_frame = windbins.read_ndbc_file(met_file)
+    met_data = windbins.get_met_data(met_frame)
     os.remove(met_file)
 
     try:
@@ -85,8 +97,15 @@ def main():
         pass
 
     bin_probabilities = wind.get_bin_probabilities()
-    waves = windbins.Wave(met_data)
-    wave_climates = waves.partition(custom_partitioning=True)
+    waves = windbins.Wave(met_data, met_frame.index)
+    if args.waveclimates == 'prompt':
+        wave_climates = waves.partition(custom_partitioning=True)
+    else:
+        wave_merge = None
+        if args.wavemerge:
+            with open(args.wavemerge) as merge_file:
+                wave_merge = json.load(merge_file)
+        wave_climates = waves.partition(by=args.waveclimates, merge=wave_merge)
 
     # Step 4: Tune the floating wind platform mooring system for the depth and platform used at the site, and generate
     #         the resulting MoorDyn input file
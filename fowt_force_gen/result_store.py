@@ -0,0 +1,213 @@
+from fowt_force_gen import fast_io
+import argparse
+import io
+import json
+import os
+import re
+import zipfile
+import numpy as np
+
+StoreVersion = 1
+MetadataName = 'metadata.json'
+
+
+def parse_case_name(case_name):
+    """
+    Returns a dict of the wind speed (m/s), wind direction (deg), and wave climate number encoded in a case name of the
+    format generated by filegen.fst_bulk_filegen, e.g. 'Site1_11.62mps_0deg_Climate0'. Values that aren't in the case
+    name are None.
+    """
+    speed = re.search(r'_([0-9.]+)mps', case_name)
+    direction = re.search(r'_([0-9.]+)deg', case_name)
+    climate = re.search(r'_Climate([0-9]+)', case_name)
+
+    case_info = {'wind_speed': float(speed.group(1)) if speed else None,
+                 'wind_direction': float(direction.group(1)) if direction else None,
+                 'climate': int(climate.group(1)) if climate else None}
+    return case_info
+
+
+def _case_root(filename):
+    """Strips the directory and output file extension from an output filename, leaving the case name."""
+    case_name = os.path.basename(filename)
+    for extension in ['.outb', '.out']:
+        if case_name.endswith(extension):
+            case_name = case_name[:-len(extension)]
+    return case_name
+
+
+def _member_name(case_name, group, channel, chunk_num):
+    return case_name + '/' + group + '/' + channel + '/' + str(chunk_num) + '.npy'
+
+
+def _write_group(archive, case_name, group, names, chunks, dtype):
+    """Writes each column of each chunk to its own compressed member. Returns the number of time steps written."""
+    num_steps = 0
+    for chunk_num, chunk in enumerate(chunks):
+        for col, channel in enumerate(names):
+            buffer = io.BytesIO()
+            np.save(buffer, np.ascontiguousarray(chunk[:, col], dtype=dtype))
+            archive.writestr(_member_name(case_name, group, channel, chunk_num), buffer.getvalue())
+        num_steps += len(chunk)
+    return num_steps
+
+
+def convert(run_directory, store_file, chunk_size=100000, dtype=np.float64):
+    """
+    Converts every case in a directory of OpenFAST outputs into a single compressed, chunked, columnar result store.
+    A case is an .outb file plus any MoorDyn .MD.Line#.out files sharing its filename root.
+
+    Each case is stored as one group per output file ('outb', 'Line1', 'Line2', ...), and each group as one column per
+    channel split into chunks of chunk_size time steps, so reading a channel never touches the rest of the case. Case
+    metadata (wind speed, wind direction, and wave climate parsed from the case name; channel names and units; number
+    of time steps) is kept in a small index at the front of the store. Files are streamed chunk by chunk, so cases
+    larger than memory can be converted.
+
+    Arguments:
+        run_directory is the directory containing the .outb and .MD.Line#.out files.
+        store_file is the path of the store to create. An existing store at this path is replaced once the new
+            store is complete.
+        chunk_size is the number of time steps per stored chunk.
+        dtype is the numpy dtype the data is stored as, e.g. np.float32 to halve the size of the store.
+    Returns the list of converted case names.
+    """
+    filenames = sorted(os.listdir(run_directory))
+    outb_files = [filename for filename in filenames if filename.endswith('.outb')]
+    md_line_files = {}
+    for filename in filenames:
+        match = re.fullmatch(r'(.*)\.MD\.Line[0-9]+\.out', filename)
+        if match:
+            md_line_files.setdefault(match.group(1), []).append(filename)
+    metadata = {'version': StoreVersion, 'chunk_size': chunk_size, 'dtype': np.dtype(dtype).str, 'cases': {}}
+
+    temp_file = store_file + '.tmp'
+    try:
+        with zipfile.ZipFile(temp_file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for outb_file in outb_files:
+                case_name = _case_root(outb_file)
+                case_info = parse_case_name(case_name)
+                case_info['groups'] = {}
+
+                with fast_io.BinaryOutput(os.path.join(run_directory, outb_file)) as outb:
+                    chunks = (np.column_stack([time, data]) for time, data in outb.iter_chunks(chunk_size=chunk_size))
+                    num_steps = _write_group(archive, case_name, 'outb', outb.attribute_names, chunks, dtype)
+                    case_info['groups']['outb'] = {'channels': outb.attribute_names, 'units': outb.attribute_units,
+                                                   'num_steps': num_steps}
+
+                for md_line_file in md_line_files.get(case_name, []):
+                    group = md_line_file.split('.')[-2]
+                    md_line_path = os.path.join(run_directory, md_line_file)
+                    description, names, units, num_header_lines = fast_io.read_text_header(md_line_path)
+                    chunks = fast_io.iter_ascii_output(md_line_path, chunk_size=chunk_size, dtype=dtype)
+                    num_steps = _write_group(archive, case_name, group, names, chunks, dtype)
+                    case_info['groups'][group] = {'channels': names, 'units': units, 'num_steps': num_steps}
+
+                metadata['cases'][case_name] = case_info
+
+            archive.writestr(MetadataName, json.dumps(metadata))
+
+        os.replace(temp_file, store_file)
+    finally:
+        # A failed conversion leaves no partial store behind
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return list(metadata['cases'])
+
+
+class ResultStore:
+    """
+    Read access to a result store created by convert. Opening a store reads only its index; channel columns are
+    decompressed when requested. Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, store_file):
+        self.store_file = store_file
+        self._archive = zipfile.ZipFile(store_file, 'r')
+        metadata = json.loads(self._archive.read(MetadataName))
+        if metadata.get('version') != StoreVersion:
+            self._archive.close()
+            raise ValueError('%s is not a result store of a supported version.' % store_file)
+        self.chunk_size = metadata['chunk_size']
+        self.dtype = np.dtype(metadata['dtype'])
+        self.cases = metadata['cases']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._archive.close()
+
+    def case_names(self):
+        return sorted(self.cases)
+
+    def find_cases(self, wind_speed=None, wind_direction=None, climate=None):
+        """Returns the sorted names of the cases matching all of the specified wind speed, direction, and climate."""
+        matching_cases = []
+        for case_name, case_info in self.cases.items():
+            if (wind_speed is None or case_info['wind_speed'] == wind_speed) and \
+                    (wind_direction is None or case_info['wind_direction'] == wind_direction) and \
+                    (climate is None or case_info['climate'] == climate):
+                matching_cases.append(case_name)
+        return sorted(matching_cases)
+
+    def get_channels(self, case, param_names, group='outb', start=0, stop=None):
+        """
+        Returns a Fortran-ordered numpy array of the specified channels of a case over time steps start to stop, with
+        one column per entry of param_names. case may be the case name or the path of any of its output files
+        (e.g. 'output_files/Test01.outb'). group is 'outb' for the OpenFAST output channels or 'Line#' for MoorDyn line
+        channels. Raises ValueError if a channel isn't in the group.
+        """
+        case_name = _case_root(case)
+        if case_name not in self.cases:
+            raise KeyError('Case %s is not in %s' % (case_name, self.store_file))
+        group_info = self.cases[case_name]['groups'][group]
+        start, stop, _ = slice(start, stop).indices(group_info['num_steps'])
+
+        param_data = np.zeros([stop - start, len(param_names)], dtype=self.dtype, order='F')
+        first_chunk = start // self.chunk_size
+        last_chunk = (stop - 1) // self.chunk_size
+        for idx, param in enumerate(param_names):
+            if param not in group_info['channels']:
+                raise ValueError('%s is not a channel of %s in case %s' % (param, group, case_name))
+            for chunk_num in range(first_chunk, last_chunk + 1):
+                with self._archive.open(_member_name(case_name, group, param, chunk_num)) as member:
+                    chunk = np.load(io.BytesIO(member.read()))
+                chunk_start = chunk_num * self.chunk_size
+                lower = max(start, chunk_start)
+                upper = min(stop, chunk_start + len(chunk))
+                param_data[lower - start:upper - start, idx] = chunk[lower - chunk_start:upper - chunk_start]
+
+        return param_data
+
+    def get_moordyn_channels(self, md_line_out_file, param_names, start=0, stop=None):
+        """
+        Returns the specified MoorDyn channels of a case, identified by the name of its .MD.Line#.out file.
+        """
+        match = re.fullmatch(r'(.*)\.MD\.(Line[0-9]+)\.out', os.path.basename(md_line_out_file))
+        if match is None:
+            raise ValueError('md_line_out_file is not the correct file type. Specify a .MD.Line#.out file.')
+        return self.get_channels(match.group(1), param_names, match.group(2), start, stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Converts a directory of OpenFAST .outb and MoorDyn .MD.Line#.out '
+                                                 'files into a single compressed, columnar result store')
+    parser.add_argument('-dir', '--openfastfiledir', type=str, required=True,
+                        help='String of relative path to file directory consisting of .out and .outb OpenFAST files')
+    parser.add_argument('-o', '--output', type=str, required=True, help='name/path of the result store to create')
+    parser.add_argument('-c', '--chunksize', type=int, default=100000,
+                        help='Number of time steps per stored chunk (default 100000)')
+    parser.add_argument('-f32', '--float32', action='store_true',
+                        help='Store data as 32-bit floats instead of 64-bit floats')
+    args = parser.parse_args()
+
+    dtype = np.float32 if args.float32 else np.float64
+    case_names = convert(args.openfastfiledir, args.output, args.chunksize, dtype)
+    print('Converted ' + str(len(case_names)) + ' cases into ' + args.output)
+
+
+if __name__ == '__main__':
+    main()
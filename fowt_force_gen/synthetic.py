@@ -0,0 +1,214 @@
+from fowt_force_gen import fast_io
+import argparse
+import os
+import numpy as np
+
+# Core channels of a synthetic .outb file, with their units. These include every channel parse.output_parse reads.
+core_channels = [('PtfmSurge', 'm'), ('PtfmSway', 'm'), ('PtfmHeave', 'm'), ('PtfmRoll', 'deg'), ('PtfmPitch', 'deg'),
+                 ('PtfmYaw', 'deg'), ('FAIRTEN1', 'N'), ('FAIRTEN2', 'N'), ('FAIRTEN3', 'N'), ('ANCHTEN1', 'N'),
+                 ('ANCHTEN2', 'N'), ('ANCHTEN3', 'N')]
+line_angles = np.radians([60., 180., 300.])  # OC4-DeepCwind mooring line headings
+
+
+class _Signal:
+    """
+    Irregular signal made of a mean, a slow-drift component, and a band of wave-frequency components with random
+    phases. Since it is a deterministic function of time, any block of time steps can be generated independently.
+    """
+
+    def __init__(self, rng, mean, drift_amplitude, wave_amplitude, num_components=12):
+        self.mean = mean
+        self.drift_amplitude = drift_amplitude
+        self.drift_freq = rng.uniform(.008, .012)
+        self.drift_phase = rng.uniform(0, 2*np.pi)
+        self.wave_freqs = rng.uniform(.05, .2, num_components)
+        self.wave_amplitudes = wave_amplitude * rng.dirichlet(np.ones(num_components))
+        self.wave_phases = rng.uniform(0, 2*np.pi, num_components)
+
+    def bounds(self):
+        amplitude = abs(self.drift_amplitude) + np.abs(self.wave_amplitudes).sum()
+        return self.mean - amplitude, self.mean + amplitude
+
+    def __call__(self, time):
+        signal = self.mean + self.drift_amplitude * np.sin(2*np.pi*self.drift_freq*time + self.drift_phase)
+        signal = signal + np.sin(2*np.pi*np.outer(time, self.wave_freqs) + self.wave_phases) @ self.wave_amplitudes
+        return signal
+
+
+def generate_output(file_root, tmax=3600., dt=.05, md_dt=.0125, num_channels=53, file_id=fast_io.FileFmtID_WithoutTime,
+                    num_lines=3, num_line_segments=6, wind_speed=10., seed=0, chunk_size=100000):
+    """
+    Writes a synthetic OpenFAST case: a FAST binary output file file_root + '.outb' and MoorDyn line files
+    file_root + '.MD.Line#.out', with the channels parse.output_parse expects (PtfmSurge, PtfmSway, ANCHTEN1-3, and
+    Seg#Ten) plus filler channels up to num_channels. Signals are realistic in shape: a mean offset that grows with
+    wind_speed, slow drift, and wave-frequency motion, with line tensions following the platform offset along each
+    line heading. Files are written in blocks of chunk_size time steps, so multi-GB outputs can be generated with
+    bounded memory. Output is deterministic for a given seed.
+
+    Returns the list of filenames written.
+    """
+    rng = np.random.default_rng(seed)
+    num_steps = int(round(tmax / dt)) + 1
+    if num_channels < len(core_channels):
+        raise ValueError('num_channels must be at least ' + str(len(core_channels)))
+
+    surge = _Signal(rng, .4 * wind_speed, 2., 1.5)
+    sway = _Signal(rng, .05 * wind_speed, .8, .6)
+    signals = [surge, sway, _Signal(rng, 0., .1, .5), _Signal(rng, 0., .2, .4), _Signal(rng, .15 * wind_speed, .5, .6),
+               _Signal(rng, 0., .5, .3)]
+    tension_slope = 2.e4  # change in line tension (N) per meter of platform offset along the line heading
+    line_tensions = [_Signal(rng, 1.e6, 2.e4, 3.e4) for _ in range(num_lines)]
+
+    def line_tension(line_idx, time):
+        heading = line_angles[line_idx % len(line_angles)]
+        return line_tensions[line_idx](time) - tension_slope * (np.cos(heading) * surge(time) +
+                                                                np.sin(heading) * sway(time))
+
+    def tension_bounds(line_idx):
+        tension_min, tension_max = line_tensions[line_idx].bounds()
+        offset_max = tension_slope * (np.abs(surge.bounds()).max() + np.abs(sway.bounds()).max())
+        return tension_min - offset_max, tension_max + offset_max
+
+    filler = [_Signal(rng, rng.normal(0., 100.), rng.uniform(0., 10.), rng.uniform(1., 50.))
+              for _ in range(num_channels - len(core_channels))]
+
+    def channel_block(time):
+        block = [signal(time) for signal in signals]
+        fair = [line_tension(idx % num_lines, time) * 1.05 for idx in range(3)]
+        anch = [line_tension(idx % num_lines, time) for idx in range(3)]
+        return np.column_stack(block + fair + anch + [signal(time) for signal in filler])
+
+    bounds = [signal.bounds() for signal in signals]
+    bounds += [tuple(1.05 * np.array(tension_bounds(idx % num_lines))) for idx in range(3)]
+    bounds += [tension_bounds(idx % num_lines) for idx in range(3)]
+    bounds += [signal.bounds() for signal in filler]
+    col_scale, col_offset = fast_io.packing_coefficients([bound[0] for bound in bounds],
+                                                         [bound[1] for bound in bounds])
+
+    attribute_names = ['Time'] + [name for name, _ in core_channels] + \
+        ['Chan' + str(idx + 1).zfill(3) for idx in range(len(filler))]
+    attribute_units = ['s'] + [unit for _, unit in core_channels] + ['-'] * len(filler)
+
+    outb_file = file_root + '.outb'
+    with fast_io.BinaryOutputWriter(outb_file, attribute_names, attribute_units, num_steps, file_id,
+                                    'Synthetic output generated by fowt_force_gen.synthetic', col_scale, col_offset,
+                                    (0., (num_steps - 1) * dt), 0., dt) as writer:
+        for chunk_start in range(0, num_steps, chunk_size):
+            time = np.arange(chunk_start, min(chunk_start + chunk_size, num_steps)) * dt
+            writer.write(time, channel_block(time))
+    written_files = [outb_file]
+
+    num_md_steps = int(round(tmax / md_dt)) + 1
+    seg_names = ['Seg' + str(num) + 'Ten' for num in range(1, num_line_segments + 1)]
+    seg_factors = 1. + .04 * np.arange(num_line_segments)  # tension increases from anchor to fairlead
+    for line_idx in range(num_lines):
+        md_line_file = file_root + '.MD.Line' + str(line_idx + 1) + '.out'
+        with open(md_line_file, 'w') as md_file:
+            md_file.write(''.join(name.rjust(10) + ' ' for name in ['Time'] + seg_names) + '\n')
+            md_file.write(''.join(unit.rjust(10) + ' ' for unit in ['(s)'] + ['(N)'] * num_line_segments) + '\n')
+            for chunk_start in range(0, num_md_steps, chunk_size):
+                time = np.arange(chunk_start, min(chunk_start + chunk_size, num_md_steps)) * md_dt
+                block = np.column_stack([time, np.outer(line_tension(line_idx, time), seg_factors)])
+                np.savetxt(md_file, block, fmt=['%10.4f'] + ['%10.4E'] * num_line_segments)
+        written_files.append(md_line_file)
+
+    return written_files
+
+
+def generate_campaign(file_directory, file_root, wind_speeds, wind_directions, num_climates=1, seed=0, **kwargs):
+    """
+    Writes a synthetic case (see generate_output) for every combination of wind speed, wind direction, and wave
+    climate, named in the format of filegen.fst_bulk_filegen (e.g. 'Site1_10mps_0deg_Climate0'). Extra keyword
+    arguments are passed to generate_output. Returns the list of case file roots.
+    """
+    if not os.path.isdir(file_directory):
+        os.makedirs(file_directory)
+
+    case_roots = []
+    for speed in wind_speeds:
+        for direction in wind_directions:
+            for climate_num in range(num_climates):
+                case_root = os.path.join(file_directory, file_root + '_' + str(speed) + 'mps_' + str(direction) +
+                                         'deg_Climate' + str(climate_num))
+                generate_output(case_root, wind_speed=float(speed), seed=seed + len(case_roots), **kwargs)
+                case_roots.append(case_root)
+    return case_roots
+
+
+ndbc_headers = {
+    'stdmet': ['#YY  MM DD hh mm WDIR WSPD GST  WVHT   DPD   APD MWD   PRES  ATMP  WTMP  DEWP  VIS  TIDE',
+               '#yr  mo dy hr mn degT m/s  m/s     m   sec   sec degT   hPa  degC  degC  degC   mi    ft'],
+    'cwind': ['#YY  MM DD hh mm WDIR WSPD GDR GST GTIME',
+              '#yr  mo dy hr mn degT m/s degT m/s hhmm'],
+    'adcp': ['#YY  MM DD hh mm DEP01 DIR01 SPD01',
+             '#yr  mo dy hr mn     m  degT  cm/s']}
+
+
+def generate_ndbc_file(filename, data_type='stdmet', num_rows=8760, interval=60, start_year=2015,
+                       missing_fraction=.02, seed=0):
+    """
+    Writes a synthetic NOAA National Data Buoy Center archive file of the specified data_type ('stdmet' for standard
+    meteorological, 'cwind' for continuous winds, or 'adcp' for ocean current data) with num_rows measurements every
+    interval minutes from the start of start_year. A fraction missing_fraction of the values of each column is
+    replaced by NDBC's missing-value sentinels (99.0, 999, etc.).
+    """
+    rng = np.random.default_rng(seed)
+    times = np.datetime64(str(start_year) + '-01-01T00:00') + np.arange(num_rows) * np.timedelta64(interval, 'm')
+    years = times.astype('datetime64[Y]').astype(int) + 1970
+    months = times.astype('datetime64[M]').astype(int) % 12 + 1
+    days = (times - times.astype('datetime64[M]')).astype('timedelta64[D]').astype(int) + 1
+    hours = (times - times.astype('datetime64[D]')).astype('timedelta64[h]').astype(int)
+    minutes = (times - times.astype('datetime64[h]')).astype('timedelta64[m]').astype(int)
+    date_cols = [years, months, days, hours, minutes]
+
+    def with_missing(values, sentinel):
+        values = np.array(values, dtype=float)
+        values[rng.random(num_rows) < missing_fraction] = sentinel
+        return values
+
+    wind_dir = with_missing(rng.integers(0, 360, num_rows), 999)
+    wind_speed = with_missing(np.round(rng.weibull(2., num_rows) * 8., 1), 99.)
+    if data_type == 'stdmet':
+        cols = date_cols + [wind_dir, wind_speed, with_missing(np.round(wind_speed * 1.3, 1), 99.),
+                            with_missing(np.round(rng.gamma(4., .5, num_rows), 2), 99.),
+                            with_missing(np.round(rng.uniform(5., 18., num_rows), 2), 99.),
+                            with_missing(np.round(rng.uniform(4., 10., num_rows), 2), 99.),
+                            with_missing(rng.integers(0, 360, num_rows), 999),
+                            with_missing(np.round(rng.normal(1015., 8., num_rows), 1), 9999.),
+                            np.round(rng.normal(12., 3., num_rows), 1), np.round(rng.normal(13., 2., num_rows), 1),
+                            np.full(num_rows, 999.), np.full(num_rows, 99.), np.full(num_rows, 99.)]
+        fmt = '%4d %02d %02d %02d %02d %3d %4.1f %4.1f %5.2f %5.2f %5.2f %3d %6.1f %5.1f %5.1f %5.1f %4.1f %5.2f'
+    elif data_type == 'cwind':
+        cols = date_cols + [wind_dir, wind_speed, np.full(num_rows, 999), np.full(num_rows, 99.),
+                            np.full(num_rows, 9999)]
+        fmt = '%4d %02d %02d %02d %02d %3d %4.1f %3d %4.1f %4d'
+    elif data_type == 'adcp':
+        cols = date_cols + [np.full(num_rows, 2.5), with_missing(rng.integers(0, 360, num_rows), 999),
+                            with_missing(np.round(rng.gamma(3., 10., num_rows), 1), 99.)]
+        fmt = '%4d %02d %02d %02d %02d %7.1f %5d %5.1f'
+    else:
+        raise ValueError("data_type must be 'stdmet', 'cwind', or 'adcp'.")
+
+    np.savetxt(filename, np.column_stack(cols), fmt=fmt, header='\n'.join(ndbc_headers[data_type]), comments='')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates synthetic OpenFAST .outb and MoorDyn .MD.Line#.out files '
+                                                 'for benchmarking and testing post-processing')
+    parser.add_argument('-fr', '--fileroot', type=str, required=True, help='Root of the generated filenames.')
+    parser.add_argument('-t', '--tmax', type=float, default=3600., help='Simulation length in seconds')
+    parser.add_argument('-dt', '--timestep', type=float, default=.05, help='Output time step of the .outb file')
+    parser.add_argument('-nc', '--numchannels', type=int, default=53, help='Number of .outb channels, excluding time')
+    parser.add_argument('-fid', '--fileid', type=int, default=2, choices=[1, 2, 3],
+                        help='FAST binary FileID format: 1 (compressed with time), 2 (compressed), or 3 (uncompressed)')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    written_files = generate_output(args.fileroot, args.tmax, args.timestep, num_channels=args.numchannels,
+                                    file_id=args.fileid, seed=args.seed)
+    for filename in written_files:
+        print(filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+from fowt_force_gen import benchmark
+import json
+import os
+
+
+class TestBenchmark:
+    def test_benchmark_1(self, tmp_path):
+        # Every benchmark runs at a realistic scale and reports positive timings
+        results = benchmark.run_benchmarks(scales=[1], repeats=1, work_dir=str(tmp_path))
+        assert [result['benchmark'] for result in results] == list(benchmark.benchmarks)
+        for result in results:
+            assert result['seconds'] > 0
+            assert result['throughput'] > 0
+            assert result['peak_memory_mb'] >= 0
+        json.dumps(results)
+
+    def test_benchmark_2(self, tmp_path):
+        # Scaling curve of one benchmark over two input sizes, and generated inputs are kept in the work directory
+        results = benchmark.run_benchmarks(['get_param_data'], [1, 2], 1, str(tmp_path))
+        curves = benchmark.scaling_curves(results)
+        assert curves['get_param_data']['scales'] == [1, 2]
+        assert curves['get_param_data']['exponent'] is not None
+        assert os.path.isfile(str(tmp_path / 'scale2' / 'bench_case.outb'))
+
+    def test_benchmark_3(self):
+        # Regressions are reported only beyond the tolerance
+        baseline = [{'benchmark': 'a', 'scale': 1, 'seconds': 1., 'peak_memory_mb': 10.},
+                    {'benchmark': 'b', 'scale': 1, 'seconds': 1., 'peak_memory_mb': 10.}]
+        results = [{'benchmark': 'a', 'scale': 1, 'seconds': 1.1, 'peak_memory_mb': 10.},
+                   {'benchmark': 'b', 'scale': 1, 'seconds': 1., 'peak_memory_mb': 15.},
+                   {'benchmark': 'c', 'scale': 1, 'seconds': 5., 'peak_memory_mb': 10.}]
+        assert benchmark.compare_results(results, baseline, .2) == [('b', 1, 1., 1.5)]
+
+    def test_benchmark_4(self):
+        # The filegen command line tool starts within budget, without importing any slow-to-import modules
+        assert benchmark.imported_heavy_modules('filegen') == []
+        assert benchmark.imported_heavy_modules('post_fast') == []
+        assert benchmark.cli_startup_time('filegen') < benchmark.startup_budget
@@ -0,0 +1,91 @@
+from fowt_force_gen import climatology
+from fowt_force_gen import synthetic
+from fowt_force_gen import windbins
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def generate_years(directory, years, buoy_number='42001'):
+    """Writes a synthetic year of hourly met, 10-minute wind, and hourly current files for each year."""
+    for seed, year in enumerate(years):
+        num_rows = 8784 if year % 4 == 0 else 8760
+        file_root = str(directory) + '/%s_' + buoy_number + '_' + str(year) + '.txt'
+        synthetic.generate_ndbc_file(file_root % 'met_data', 'stdmet', num_rows, start_year=year, seed=seed)
+        synthetic.generate_ndbc_file(file_root % 'wind_data', 'cwind', num_rows * 6, interval=10, start_year=year,
+                                     seed=seed + 10)
+        synthetic.generate_ndbc_file(file_root % 'curr_data', 'adcp', num_rows, start_year=year, seed=seed + 20)
+
+
+class TestValueCounts:
+    def test_value_counts_1(self):
+        # Medians of the counts match numpy.nanmedian of the values, for odd and even numbers of values
+        rng = np.random.default_rng(0)
+        values = np.round(rng.normal(5., 2., 1001), 1)
+        values[rng.random(1001) < .05] = np.nan
+        categories = rng.integers(0, 3, 1001)
+        value_counts = climatology.ValueCounts(3).update(values[:500], categories[:500])
+        value_counts.update(values[500:], categories[500:])
+        assert value_counts.median() == np.nanmedian(values)
+        for category in range(3):
+            assert value_counts.median([category]) == np.nanmedian(values[categories == category])
+        assert value_counts.median([0, 2]) == np.nanmedian(values[categories != 1])
+        assert value_counts.total() == np.count_nonzero(~np.isnan(values))
+
+    def test_value_counts_2(self):
+        # Merged counts are the counts of both sets of values, and survive a round trip through a dict
+        first = climatology.ValueCounts(2).update([1., 2., 2., np.nan], [0, 1, 1, 0])
+        second = climatology.ValueCounts(2).update([2., 3.], [0, 0])
+        merged = climatology.ValueCounts.from_dict(first.merge(second).to_dict())
+        assert merged.values.tolist() == [1., 2., 3.]
+        assert merged.counts.tolist() == [[1, 1, 1], [0, 2, 0]]
+        assert (merged.min(), merged.max(), merged.median([1])) == (1., 3., 2.)
+        with pytest.raises(ValueError):
+            merged.update([1.], [2])
+
+
+class TestClimatology:
+    def test_climatology_1(self, tmp_path):
+        # Wind bin probabilities of all the years match those of the concatenated wind data
+        years = [2012, 2013, 2014]
+        generate_years(tmp_path, years)
+        clim = climatology.Climatology()
+        assert clim.add_directory(str(tmp_path), '42001') == years
+        wind_data = pd.concat([windbins.get_wind_data(str(tmp_path) + '/wind_data_42001_' + str(year) + '.txt')
+                               for year in years], ignore_index=True)
+        assert clim.get_bin_probabilities().equals(windbins.Wind(wind_data).get_bin_probabilities())
+        year_counts = clim.year_bin_counts()
+        counts = sum(year_counts[year][0] for year in years)
+        num_valid = sum(year_counts[year][1] for year in years)
+        assert (windbins.count_probabilities(counts, num_valid) == clim.get_bin_probabilities().values).all()
+        with pytest.raises(ValueError):
+            climatology.Climatology().year_bin_counts()
+
+    def test_climatology_2(self, tmp_path):
+        # Wave climates and current climate of a single complete year match windbins
+        generate_years(tmp_path, [2016])
+        clim = climatology.Climatology()
+        clim.add_year(str(tmp_path) + '/met_data_42001_2016.txt',
+                      current_file=str(tmp_path) + '/curr_data_42001_2016.txt')
+        met_data = windbins.get_met_data(str(tmp_path) + '/met_data_42001_2016.txt')
+        assert clim.partition().equals(windbins.Wave(met_data).partition())
+        assert clim.get_bin_probabilities().equals(windbins.Wind(met_data).get_bin_probabilities())
+        current_data, current_depth = windbins.get_current_data(str(tmp_path) + '/curr_data_42001_2016.txt')
+        assert clim.current_climate() == [current_depth, np.nanmedian(current_data['Current Speed']),
+                                          np.nanmedian(current_data['Current Direction'])]
+
+    def test_climatology_3(self, tmp_path):
+        # A saved climatology updated with a newly archived year matches one built from every year at once
+        generate_years(tmp_path, [2014])
+        clim = climatology.Climatology()
+        clim.add_directory(str(tmp_path), '42001')
+        clim.save(str(tmp_path / 'climatology.json'))
+        generate_years(tmp_path, [2015])
+        updated = climatology.Climatology.load(str(tmp_path / 'climatology.json'))
+        assert updated.add_directory(str(tmp_path), '42001') == [2015]
+        rebuilt = climatology.Climatology()
+        rebuilt.add_directory(str(tmp_path), '42001')
+        assert updated.years == [2014, 2015]
+        assert updated.partition().equals(rebuilt.partition())
+        assert updated.get_bin_probabilities().equals(rebuilt.get_bin_probabilities())
+        assert updated.current_climate() == rebuilt.current_climate()
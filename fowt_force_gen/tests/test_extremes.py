@@ -0,0 +1,80 @@
+from fowt_force_gen import extremes
+from fowt_force_gen import parse
+from fowt_force_gen import synthetic
+import numpy as np
+import pytest
+
+
+class TestPeakAccumulator:
+    def test_peak_accumulator_1(self):
+        # peaks over threshold are one per excursion, whatever the block size the data is fed in
+        values = np.array([[0., 2., 3., 1., 0., 4., 4.5, 0., 2.5]]).T
+        time = np.arange(len(values)) * .1
+        for chunk_size in [1, 2, 3, 9]:
+            accumulator = extremes.PeakAccumulator(['Test'], [1.5])
+            for start in range(0, len(values), chunk_size):
+                accumulator.update(time[start:start + chunk_size], values[start:start + chunk_size])
+            accumulator.close()
+            assert accumulator.peaks('Test').tolist() == [3., 4.5, 2.5]
+            assert accumulator.maxima[0] == 4.5
+            assert accumulator.minima[0] == 0.
+            assert np.isclose(accumulator.duration, .8)
+
+    def test_peak_accumulator_2(self):
+        # merged accumulators hold the peaks and case maxima of every case
+        rng = np.random.default_rng(0)
+        cases = [rng.normal(size=(1000, 2)) for _ in range(3)]
+        merged = extremes.PeakAccumulator(['A', 'B'], [1., 1.])
+        for case_data in cases:
+            accumulator = extremes.PeakAccumulator(['A', 'B'], [1., 1.])
+            accumulator.update(np.arange(1000) * .1, case_data)
+            merged.merge(accumulator.close())
+        assert (merged.case_maxima == np.array([case_data.max(axis=0) for case_data in cases])).all()
+        assert (merged.maxima == np.concatenate(cases).max(axis=0)).all()
+        assert merged.num_steps == 3000
+        assert len(merged.peaks('A')) > 0
+        open_accumulator = extremes.PeakAccumulator(['A', 'B'], [1., 1.])
+        open_accumulator.update(np.arange(10) * .1, cases[0][:10])
+        with pytest.raises(ValueError):
+            merged.merge(open_accumulator)
+
+
+class TestExtremeFits:
+    def test_extreme_fits_1(self):
+        # Gumbel and Weibull fits recover the parameters of the distributions sampled from
+        rng = np.random.default_rng(0)
+        location, scale = extremes.fit_gumbel(rng.gumbel(10., 2., 5000))
+        assert np.isclose(location, 10., rtol=.02) and np.isclose(scale, 2., rtol=.05)
+        shape, scale = extremes.fit_weibull(5. + rng.weibull(1.5, 5000) * 3., 5.)
+        assert np.isclose(shape, 1.5, rtol=.05) and np.isclose(scale, 3., rtol=.05)
+        # extremes are quantiles of the distribution of the largest of num_peaks peaks
+        assert np.isclose(extremes.weibull_extreme(1., 1., 0., 1), -np.log(1. - np.exp(-1.)))
+        assert np.isclose(extremes.weibull_extreme(2., 3., 1., 100, .5), 1. + 3. * (-np.log(1. - .5 ** .01)) ** .5)
+        assert np.isclose(extremes.gumbel_extreme(10., 2.), 10.)
+
+
+class TestCaseExtremes:
+    def test_case_extremes_1(self):
+        # case extremes match the maxima of the parsed case data
+        file_root = 'tests/test_fast/compare_output'
+        case_extremes = extremes.case_extremes(file_root, {'Line1Seg6Ten': 936700.}, chunk_size=4)
+        ptfm_surge, ptfm_sway, anchor_tension, line1_tension, line2_tension, line3_tension = \
+            parse.output_parse(file_root)
+        assert case_extremes['outb'].maxima[0] == ptfm_surge.max()
+        assert (case_extremes['outb'].maxima[2:] == anchor_tension.max(axis=0)).all()
+        assert (case_extremes['Line3'].maxima == line3_tension.max(axis=0)).all()
+        assert case_extremes['Line1'].peaks('Line1Seg6Ten').tolist() == [936800., 937100.]
+        assert len(case_extremes['Line1'].peaks('Line1Seg1Ten')) == 0
+
+    def test_case_extremes_2(self, tmp_path):
+        # cases of the same bin from different seeds are merged
+        case_roots = synthetic.generate_campaign(str(tmp_path / 'seed0'), 'Site1', [10, 12], [0], tmax=20.,
+                                                 num_channels=12, md_dt=.05)
+        case_roots += synthetic.generate_campaign(str(tmp_path / 'seed1'), 'Site1', [10], [0], seed=1, tmax=20.,
+                                                  num_channels=12, md_dt=.05)
+        binned_extremes = extremes.bin_extremes(case_roots, {'ANCHTEN1': 1.e6})
+        assert sorted(binned_extremes) == [(10., 0., 0), (12., 0., 0)]
+        assert binned_extremes[(10., 0., 0)]['outb'].case_maxima.shape == (2, 5)
+        assert binned_extremes[(12., 0., 0)]['Line2'].case_maxima.shape == (1, 6)
+        surge = parse.get_param_data(case_roots[2] + '.outb', ['PtfmSurge'])
+        assert binned_extremes[(10., 0., 0)]['outb'].case_maxima[1, 0] == surge.max()
@@ -0,0 +1,263 @@
+from fowt_force_gen import fast_io
+import numpy as np
+import pytest
+import os
+import shutil
+
+
+class TestBinaryOutput:
+    def test_binary_output_1(self):
+        # Uncompressed file (FileID 3): data and pack are identical, with time as the first column
+        outb_file = 'tests/test_fast/test.outb'
+        data, info, pack = fast_io.load_binary_output(outb_file)
+        assert data.shape == (21, 54)
+        assert len(info['attribute_names']) == 54
+        assert info['attribute_names'][0] == 'Time'
+        assert (data == pack).all()
+        assert not np.shares_memory(data, pack)
+
+    def test_binary_output_2(self):
+        # Compressed file (FileID 2): time is rebuilt from the first time and increment, channels are rescaled
+        outb_file = 'tests/test_fast/compare_tune_rough_uplift.outb'
+        data, info, pack = fast_io.load_binary_output(outb_file)
+        assert data.shape == (41, 48)
+        assert (np.round(data[:, 0], 3) == np.round(np.arange(41) * .05, 3)).all()
+        assert (data[:, 0] == pack[:, 0]).all()
+        assert pack[0, 1] == -32768.
+        assert round(data[1, 1], 3) == 360.
+
+
+class TestBinaryOutputReader:
+    def test_binary_output_reader_1(self):
+        # Selected channels match the full decode for every file format in the test files
+        for outb_file in ['tests/test_fast/test.outb', 'tests/test_fast/compare_tune_rough_uplift.outb',
+                          'tests/test_fast/compare_tune_fine_untuned.outb']:
+            data, info, pack = fast_io.load_binary_output(outb_file)
+            params = ['Time', info['attribute_names'][-1], info['attribute_names'][3]]
+            with fast_io.BinaryOutput(outb_file) as outb:
+                channel_data = outb.get_channels(params)
+            compare_data = data[:, [0, len(info['attribute_names']) - 1, 3]]
+            assert (channel_data == compare_data).all()
+
+    def test_binary_output_reader_2(self):
+        # Time slice of selected channels
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        data, info, pack = fast_io.load_binary_output(outb_file)
+        surge_col = info['attribute_names'].index('PtfmSurge')
+        with fast_io.BinaryOutput(outb_file) as outb:
+            start, stop = outb.get_step_range(10., 20.)
+            channel_data = outb.get_channels(['PtfmSurge'], start, stop)
+            time = outb.get_time(start, stop)
+        assert (start, stop) == (200, 401)
+        assert time[0] == 10. and time[-1] == 20.
+        assert (channel_data[:, 0] == data[200:401, surge_col]).all()
+
+    def test_binary_output_reader_3(self):
+        # Requesting a channel that isn't in the file
+        with fast_io.BinaryOutput('tests/test_fast/test.outb') as outb:
+            with pytest.raises(ValueError):
+                outb.get_channels(['NotAChannel'])
+
+    def test_binary_output_reader_4(self):
+        # Chunked iteration covers every time step once and matches the full decode
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        data, info, pack = fast_io.load_binary_output(outb_file)
+        chunks = list(fast_io.iter_binary_output(outb_file, chunk_size=1000))
+        assert len(chunks) == 7
+        assert (np.concatenate([time for time, _ in chunks]) == data[:, 0]).all()
+        assert (np.concatenate([chunk for _, chunk in chunks]) == data[:, 1:]).all()
+
+    def test_binary_output_reader_5(self):
+        # Chunked iteration over selected channels and a partial range of time steps
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        with fast_io.BinaryOutput(outb_file) as outb:
+            compare_data = outb.get_channels(['PtfmSurge', 'PtfmSway'], 100, 350)
+            chunks = [chunk for _, chunk in outb.iter_chunks(['PtfmSurge', 'PtfmSway'], 100, 100, 350)]
+        assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+        assert (np.concatenate(chunks) == compare_data).all()
+
+
+class TestPackedOutput:
+    def test_packed_output_1(self):
+        # Packed channels decode to the same values as the full decode
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        data, info, pack = fast_io.load_binary_output(outb_file)
+        packed, packed_info = fast_io.load_packed_output(outb_file, ['PtfmSurge', 'PtfmSway'])
+        cols = [info['attribute_names'].index('PtfmSurge'), info['attribute_names'].index('PtfmSway')]
+        assert packed.pack.dtype == np.int16
+        assert packed_info['attribute_names'] == ['PtfmSurge', 'PtfmSway']
+        assert (packed.time == data[:, 0]).all()
+        assert (packed.decode() == data[:, cols]).all()
+        assert np.allclose(packed.decode(np.float32), data[:, cols], rtol=1e-6, atol=1e-6)
+
+    def test_packed_output_2(self):
+        # Statistics of packed channels match those of the decoded data
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        packed = fast_io.load_packed_output(outb_file)[0]
+        data = packed.decode()
+        assert np.allclose(packed.mean(), data.mean(axis=0))
+        assert np.allclose(packed.std(), data.std(axis=0))
+        assert (packed.min() == data.min(axis=0)).all()
+        assert (packed.max() == data.max(axis=0)).all()
+
+    def test_packed_output_3(self):
+        # float32 decode without the pack array
+        outb_file = 'tests/test_fast/compare_tune_rough_uplift.outb'
+        data, info, pack = fast_io.load_binary_output(outb_file)
+        data32, info32, pack32 = fast_io.load_binary_output(outb_file, dtype=np.float32, return_pack=False)
+        assert data32.dtype == np.float32
+        assert pack32 is None
+        assert np.allclose(data32, data, rtol=1e-6)
+
+
+class TestBinaryOutputWriter:
+    def test_binary_output_writer_1(self, tmp_path):
+        # Written files of every format read back to within the int16 packing resolution
+        data, info, pack = fast_io.load_binary_output('tests/test_fast/compare_tune_fine_untuned.outb')
+        resolution = (data.max(axis=0) - data.min(axis=0)) / 65535
+        for file_id in [1, 2, 3]:
+            outb_file = str(tmp_path / ('writer_test_' + str(file_id) + '.outb'))
+            fast_io.write_binary_output(outb_file, data, info, file_id)
+            new_data, new_info, new_pack = fast_io.load_binary_output(outb_file)
+            assert fast_io.read_output_header(outb_file)['FileID'] == file_id
+            assert new_info['attribute_names'] == info['attribute_names']
+            assert new_info['attribute_units'] == info['attribute_units']
+            assert (np.abs(new_data[:, 1:] - data[:, 1:]) <= resolution[1:] + 1e-9).all()
+            assert np.allclose(new_data[:, 0], data[:, 0], atol=1e-6)
+
+    def test_binary_output_writer_2(self, tmp_path):
+        # Compacting a compressed file to a few channels copies the packed values exactly
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        compact_file = str(tmp_path / 'compact_test.outb')
+        fast_io.compact_binary_output(outb_file, compact_file, ['PtfmSurge', 'PtfmSway'], chunk_size=1000)
+        data, info, pack = fast_io.load_binary_output(compact_file)
+        assert info['attribute_names'] == ['Time', 'PtfmSurge', 'PtfmSway']
+        with fast_io.BinaryOutput(outb_file) as outb:
+            assert (data == outb.get_channels(['Time', 'PtfmSurge', 'PtfmSway'])).all()
+
+    def test_binary_output_writer_3(self, tmp_path):
+        # Writing fewer time steps than the header specifies, or no time steps at all, is an error
+        data, info, pack = fast_io.load_binary_output('tests/test_fast/compare_tune_fine_untuned.outb')
+        outb_file = str(tmp_path / 'short_test.outb')
+        writer = fast_io.BinaryOutputWriter(outb_file, info['attribute_names'], info['attribute_units'], len(data),
+                                            fast_io.FileFmtID_NoCompressWithoutTime, time_start=data[0, 0],
+                                            time_increment=data[1, 0] - data[0, 0])
+        writer.write(data[:10, 0], data[:10, 1:])
+        with pytest.raises(ValueError):
+            writer.close()
+        with pytest.raises(ValueError):
+            fast_io.write_binary_output(outb_file, data[:0], info)
+
+
+class TestTextOutput:
+    def test_text_output_1(self):
+        # MoorDyn line file, selected channels in requested order
+        md_file = 'tests/test_fast/compare_output.MD.Line1.out'
+        data, info = fast_io.load_ascii_output(md_file, ['Seg6Ten', 'Time'])
+        assert info['attribute_names'] == ['Seg6Ten', 'Time']
+        assert info['attribute_units'] == ['N', 's']
+        assert data.shape == (9, 2)
+        assert (data[:, 0] == [936800., 936700., 936600., 936600., 936700., 936800., 936900., 937100., 936900.]).all()
+        assert data[1, 1] == .0125
+
+    def test_text_output_2(self):
+        # MoorDyn line file, all channels as float32
+        md_file = 'tests/test_fast/compare_output.MD.Line1.out'
+        data, info = fast_io.load_ascii_output(md_file, dtype=np.float32)
+        assert data.dtype == np.float32
+        assert data.shape == (9, 7)
+        assert info['attribute_names'][0] == 'Time'
+        assert info['description'] == ''
+
+    def test_text_output_3(self, tmp_path):
+        # FAST text output with banner lines, description, and units
+        out_file = str(tmp_path / 'ascii_test.out')
+        with open(out_file, 'w') as f:
+            f.write('\n\nThese predictions were generated by OpenFAST\n\nDescription from the FAST input file\n\n'
+                    'Time\tPtfmSurge\tPtfmSway\n(s)\t(m)\t(m)\n'
+                    '0.000\t5.000E+00\t1.000E-01\n0.050\t4.990E+00\t2.000E-01\n')
+        data, info = fast_io.load_ascii_output(out_file, ['PtfmSway'])
+        assert info['description'] == 'Description from the FAST input file'
+        assert info['attribute_units'] == ['m']
+        assert (data == np.array([[.1], [.2]])).all()
+        with pytest.raises(ValueError):
+            fast_io.load_ascii_output(out_file, ['NotAChannel'])
+
+
+class TestOutputIndex:
+    def test_output_index_1(self, tmp_path):
+        # Sidecar index is only written when asked for, and reused on later reads
+        outb_file = str(tmp_path / 'index_test.outb')
+        shutil.copy('tests/test_fast/compare_tune_rough_uplift.outb', outb_file)
+        fast_io.read_output_header(outb_file)
+        assert not os.path.isfile(outb_file + fast_io.IndexSuffix)
+        header = fast_io.read_output_header(outb_file, use_index=False, write_index=True)
+        assert not os.path.isfile(outb_file + fast_io.IndexSuffix)
+        header = fast_io.read_output_header(outb_file, write_index=True)
+        assert os.path.isfile(outb_file + fast_io.IndexSuffix)
+        fast_io._header_cache.clear()
+        indexed_header = fast_io.read_output_header(outb_file)
+        assert indexed_header['ChanName'] == header['ChanName']
+        assert (indexed_header['ColScl'] == header['ColScl']).all()
+        assert indexed_header['DataStart'] == header['DataStart']
+
+    def test_output_index_2(self, tmp_path):
+        # Stale sidecar index (output file has changed since indexing) is ignored and rewritten
+        outb_file = str(tmp_path / 'index_test.outb')
+        shutil.copy('tests/test_fast/compare_tune_rough_uplift.outb', outb_file)
+        fast_io.read_output_header(outb_file, write_index=True)
+        shutil.copy('tests/test_fast/test.outb', outb_file)
+        os.utime(outb_file, ns=(0, 0))
+        header = fast_io.read_output_header(outb_file)
+        assert header['FileID'] == 3
+        assert header['NT'] == 21
+
+    def test_output_index_3(self, tmp_path):
+        # Find the files in a directory containing a certain channel
+        shutil.copy('tests/test_fast/test.outb', str(tmp_path / 'a.outb'))
+        shutil.copy('tests/test_fast/compare_tune_rough_uplift.outb', str(tmp_path / 'b.outb'))
+        assert fast_io.find_files_with_channel('TTDspFA', str(tmp_path)) == ['a.outb', 'b.outb']
+        assert fast_io.find_files_with_channel('L1N1PZ', str(tmp_path)) == ['b.outb']
+
+    def test_output_index_4(self, monkeypatch):
+        # Changing a returned header doesn't change the memoized header of later reads, and the memo is bounded
+        outb_file = 'tests/test_fast/compare_tune_rough_uplift.outb'
+        header = fast_io.read_output_header(outb_file)
+        header['ChanName'].append('NotAChannel')
+        header['ColScl'][:] = 0.
+        header = fast_io.read_output_header(outb_file)
+        assert 'NotAChannel' not in header['ChanName']
+        assert (header['ColScl'] != 0.).all()
+        data, info, pack = fast_io.load_binary_output(outb_file)
+        info['attribute_names'][0] = 'Changed'
+        assert fast_io.read_output_header(outb_file)['ChanName'][0] == 'Time'
+        monkeypatch.setattr(fast_io, 'header_cache_size', 2)
+        for outb_file in ['tests/test_fast/test.outb', 'tests/test_fast/compare_tune_fine_untuned.outb']:
+            fast_io.read_output_header(outb_file)
+        assert list(fast_io._header_cache) == [os.path.abspath('tests/test_fast/test.outb'),
+                                               os.path.abspath('tests/test_fast/compare_tune_fine_untuned.outb')]
+
+
+class TestSharedOutput:
+    def test_shared_output_1(self):
+        # Published channels are seen unchanged through an attached view, and the segment is freed on close
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        with fast_io.BinaryOutput(outb_file) as outb:
+            compare_data = outb.get_channels(['Time', 'PtfmSurge', 'PtfmSway'])
+        with fast_io.publish_binary_output(outb_file, ['Time', 'PtfmSurge', 'PtfmSway']) as shared:
+            handle = shared.handle()
+            with fast_io.attach_shared_output(handle) as attached:
+                assert attached.attribute_names == ['Time', 'PtfmSurge', 'PtfmSway']
+                assert (attached.data == compare_data).all()
+                assert attached.data.flags['F_CONTIGUOUS']
+        with pytest.raises(FileNotFoundError):
+            fast_io.attach_shared_output(handle)
+
+    def test_shared_output_2(self):
+        # Writes through an attached view are seen by the owner, with no copy in between
+        data = np.arange(12.).reshape(4, 3)
+        with fast_io.SharedOutput.from_array(data, ['a', 'b', 'c']) as shared:
+            with fast_io.attach_shared_output(shared.handle()) as attached:
+                attached.data[0, 0] = -1.
+            assert shared.data[0, 0] == -1.
+            assert (shared.data[1:] == data[1:]).all()
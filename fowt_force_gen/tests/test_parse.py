@@ -1,5 +1,12 @@
 from fowt_force_gen import parse
 import numpy as np
+import pandas as pd
+import functools
+import operator
+import pickle
+import pytest
+from scipy import signal
+import shutil
 import os
 import time
 
@@ -53,6 +60,285 @@ class TestDataParse:
         assert (np.around(ptfm_surge, 3) == np.around(compare_ptfm_surge, 3)).all()
         assert (line1_tension == compare_line1_tension).all()
 
+    def test_data_parse_5(self):
+        # make distributions of packed data straight from the packed values
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        params = ['PtfmSurge', 'PtfmSway', 'PtfmHeave']
+        packed_stats = parse.make_distributions(parse.get_param_data(outb_file, params, packed=True))
+        compare_stats = parse.make_distributions(parse.get_param_data(outb_file, params))
+        assert packed_stats.shape == (3, 2)
+        assert np.allclose(packed_stats, compare_stats, atol=.0011)
+
+    def test_data_parse_6(self):
+        # concurrent output parse gives the same results as the serial one
+        file_root = 'tests/test_fast/compare_output'
+        serial_data = parse.output_parse(file_root)
+        parse.clear_cache()
+        concurrent_data = parse.output_parse(file_root, max_workers=4)
+        for serial, concurrent in zip(serial_data, concurrent_data):
+            assert (serial == concurrent).all()
+
+    def test_data_parse_7(self):
+        # parse several cases in order while prefetching the next ones
+        file_roots = ['tests/test_fast/compare_output', 'tests/test_fast/compare_output_1seg',
+                      'tests/test_fast/compare_output']
+        parse.clear_cache()
+        parsed_cases = list(parse.iter_output_parse(file_roots, 1, max_workers=3, prefetch=2))
+        assert [file_root for file_root, _ in parsed_cases] == file_roots
+        for file_root, case_data in parsed_cases:
+            for parsed, compare in zip(case_data, parse.output_parse(file_root, 1)):
+                assert (parsed == compare).all()
+
+    def test_data_parse_8(self):
+        # make distributions of a multi-column np.ndarray without stdev gives the mean of every column
+        array_data = np.array([[1., 10.], [3., 30.]])
+        assert (parse.make_distributions(array_data, calculate_stdev=False) == np.array([2., 20.])).all()
+        assert (parse.make_distributions(array_data[:, :1], calculate_stdev=False) == np.array([2.])).all()
+
+    def test_data_parse_9(self):
+        # batched statistics of cases of different lengths match the statistics of each case
+        rng = np.random.default_rng(0)
+        cases = [rng.normal(size=(100, 3)), rng.normal(size=(80, 3)), rng.normal(size=(100, 3))]
+        stats = parse.batch_statistics(cases, percentiles=[5, 50, 95])
+        even_stats = parse.batch_statistics(np.stack([cases[0], cases[2]]), percentiles=[50])
+        for idx, case_data in enumerate(cases):
+            assert np.allclose(stats['mean'][idx], case_data.mean(axis=0))
+            assert np.allclose(stats['std'][idx], case_data.std(axis=0))
+            assert (stats['min'][idx] == case_data.min(axis=0)).all()
+            assert (stats['max'][idx] == case_data.max(axis=0)).all()
+            assert np.allclose(stats['percentiles'][idx], np.percentile(case_data, [5, 50, 95], axis=0).T)
+        assert np.allclose(even_stats['percentiles'][1, :, 0], np.median(cases[2], axis=0))
+        distributions = parse.batch_distributions(cases)
+        assert distributions.shape == (3, 3, 2)
+        assert (distributions[1] == parse.make_distributions(cases[1])).all()
+
+    def test_data_parse_10(self):
+        # campaign distributions match the distributions of each case
+        file_roots = ['tests/test_fast/compare_output', 'tests/test_fast/compare_output_1seg']
+        distributions = parse.campaign_distributions(file_roots, 1, batch_size=1)
+        for case_num, file_root in enumerate(file_roots):
+            ptfm_surge, ptfm_sway, anchor_tension, line1_tension, line2_tension, line3_tension = \
+                parse.output_parse(file_root, 1)
+            assert (distributions['surge'][case_num] == parse.make_distributions(ptfm_surge, False)).all()
+            assert (distributions['anchor'][case_num] == parse.make_distributions(anchor_tension)).all()
+            assert (distributions['line3'][case_num] == parse.make_distributions(line3_tension)).all()
+        assert distributions['line1'].shape == (2, 1, 2)
+
+    def test_data_parse_11(self):
+        # NaN in the data gives NaN statistics for cases of the same or different lengths, and only the requested
+        # statistics are computed
+        rng = np.random.default_rng(0)
+        cases = [rng.normal(size=(100, 2)), rng.normal(size=(80, 2))]
+        cases[1][5, 0] = np.nan
+        uneven_stats = parse.batch_statistics(cases, statistics=['mean', 'max'])
+        even_stats = parse.batch_statistics([cases[0][:80], cases[1]], statistics=['mean', 'max'])
+        assert set(uneven_stats) == {'mean', 'max'}
+        for stats in [uneven_stats, even_stats]:
+            assert np.isnan(stats['mean'][1, 0]) and np.isnan(stats['max'][1, 0])
+            assert not np.isnan(stats['mean'][[0, 1, 0], [0, 1, 1]]).any()
+        assert np.array_equal(uneven_stats['mean'][1], even_stats['mean'][1], equal_nan=True)
+
+
+class TestOnlineStatistics:
+    def test_online_statistics_1(self):
+        # statistics streamed in chunks from an .outb file match the batch statistics
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        params = ['PtfmSurge', 'PtfmSway', 'PtfmHeave']
+        param_data = parse.get_param_data(outb_file, params)
+        stats = parse.output_statistics(outb_file, params, chunk_size=700)
+        assert stats.count == len(param_data)
+        assert np.allclose(stats.mean, param_data.mean(axis=0))
+        assert np.allclose(stats.std, param_data.std(axis=0))
+        assert (stats.min == param_data.min(axis=0)).all()
+        assert (stats.max == param_data.max(axis=0)).all()
+        assert np.allclose(stats.distributions(), parse.make_distributions(param_data), atol=.0011)
+
+    def test_online_statistics_2(self):
+        # statistics merged across files and pickled as if from worker processes match those of all the data
+        md_files = ['tests/test_fast/compare_output.MD.Line1.out', 'tests/test_fast/compare_output.MD.Line2.out']
+        params = ['Seg1Ten', 'Seg6Ten']
+        all_data = np.concatenate([parse.get_moordyn_data(md_file, params) for md_file in md_files])
+        merged_stats = parse.OnlineStatistics(2, quantiles=True)
+        for md_file in md_files:
+            merged_stats.merge(pickle.loads(pickle.dumps(parse.output_statistics(md_file, params, 4, True))))
+        assert merged_stats.count == len(all_data)
+        assert np.allclose(merged_stats.mean, all_data.mean(axis=0))
+        assert np.allclose(merged_stats.variance, all_data.var(axis=0))
+        assert (merged_stats.distributions(False) == np.round(all_data.mean(axis=0), 3)).all()
+
+    def test_online_statistics_3(self):
+        # approximate quantiles are within the sketch accuracy, for positive, negative, and zero values
+        rng = np.random.default_rng(0)
+        data = np.column_stack([rng.normal(0., 1., 20000), rng.exponential(1e6, 20000), np.zeros(20000)])
+        stats = parse.OnlineStatistics(3, quantiles=True, relative_accuracy=.01)
+        for chunk in np.array_split(data, 9):
+            stats.update(chunk)
+        estimates = stats.quantile([.05, .5, .95])
+        exact = np.quantile(data, [.05, .5, .95], axis=0)
+        assert (np.abs(estimates[:, :2] - exact[:, :2]) <= .03 * np.abs(exact[:, :2])).all()
+        assert (estimates[:, 2] == 0.).all()
+        with pytest.raises(ValueError):
+            parse.OnlineStatistics(3).quantile([.5])
+
+
+class TestFatigue:
+    def test_fatigue_1(self):
+        # rainflow count of a short series: one full cycle and a residue of two half cycles
+        ranges, means, counts, series = parse.rainflow_cycles(np.array([0., 5., 5., 1., 4., 0.]))
+        assert ranges.tolist() == [3., 5., 5.]
+        assert means.tolist() == [2.5, 2.5, 2.5]
+        assert counts.tolist() == [1., .5, .5]
+        assert (series == 0).all()
+
+    def test_fatigue_2(self):
+        # batched damage sums of several cases and channels match each series counted alone
+        rng = np.random.default_rng(0)
+        cases = [rng.normal(size=(500, 2)).cumsum(axis=0), rng.normal(size=(300, 2)).cumsum(axis=0)]
+        damage_sums = parse.fatigue_damage_sums(cases, 4.)
+        assert damage_sums.shape == (2, 2)
+        for case_num, case_data in enumerate(cases):
+            for channel in range(2):
+                ranges, means, counts, series = parse.rainflow_cycles(case_data[:, channel])
+                assert np.isclose(damage_sums[case_num, channel], (counts * ranges ** 4.).sum())
+                # every range of the series is counted: total counts equal half the number of reversals
+                turning_points = parse._turning_points(case_data[:, channel], np.zeros(len(case_data), dtype=int))[0]
+                assert counts.sum() == (len(turning_points) - 1) / 2
+        dels = parse.damage_equivalent_loads(cases, 4., 100.)
+        assert np.allclose(dels, (damage_sums / 100.) ** .25)
+
+    def test_fatigue_3(self):
+        # campaign fatigue of the anchor and line tensions, weighted into lifetime damage by wind bin probabilities
+        file_roots = ['tests/test_fast/compare_output', 'tests/test_fast/compare_output']
+        fatigue = parse.campaign_fatigue(file_roots, 6, case_duration=.1)
+        assert fatigue['channels'][:4] == ['ANCHTEN1', 'ANCHTEN2', 'ANCHTEN3', 'Line1Seg1Ten']
+        assert fatigue['damage_sums'].shape == (2, 21)
+        ptfm_surge, ptfm_sway, anchor_tension, line1_tension, line2_tension, line3_tension = \
+            parse.output_parse(file_roots[0])
+        assert np.allclose(fatigue['damage_sums'][0, 3:9], parse.fatigue_damage_sums(line1_tension)[0])
+        assert np.allclose(fatigue['del'][0, :3], parse.damage_equivalent_loads(anchor_tension, 3., .1)[0])
+
+        bin_probabilities = pd.DataFrame([[.25, .25], [.5, 0.]], index=[10., 11.4], columns=[0., 180.])
+        case_names = ['Site_10mps_0deg_Climate0', 'Site_10mps_0deg_Climate1', 'Site_11.4mps_0deg_Climate0']
+        damage_sums = np.array([[1., 2.], [3., 2.], [10., 0.]])
+        damage = parse.lifetime_damage(damage_sums, case_names, bin_probabilities, 2., case_duration=1., lifetime=4.)
+        assert np.allclose(damage, [(.125 * 1. + .125 * 3. + .5 * 10.) * 4. / 2., (.125 * 2. + .125 * 2.) * 4. / 2.])
+        with pytest.raises(ValueError):
+            parse.lifetime_damage(damage_sums[:1], ['Site_12mps_0deg_Climate0'], bin_probabilities)
+
+
+class TestSpectra:
+    def test_spectra_1(self):
+        # batched Welch PSD matches scipy.signal.welch for cases of equal and unequal lengths
+        rng = np.random.default_rng(0)
+        cases = [rng.normal(size=(3000, 2)), rng.normal(size=(3000, 2)), rng.normal(size=(2000, 2))]
+        frequencies, psd = parse.welch_psd(cases, .05, 512)
+        assert psd.shape == (3, 2, 257)
+        for case_num, case_data in enumerate(cases):
+            compare_frequencies, compare_psd = signal.welch(case_data, fs=20., nperseg=512, axis=0)
+            assert np.allclose(frequencies, compare_frequencies)
+            assert np.allclose(psd[case_num], compare_psd.T)
+
+    def test_spectra_2(self):
+        # spectral moments and peak frequency of a sinusoid
+        time = np.arange(20000) * .05
+        data = np.column_stack([2. * np.sin(2 * np.pi * .1 * time), np.sin(2 * np.pi * .25 * time)])
+        frequencies, psd = parse.welch_psd(data, .05, 2000)
+        moments = parse.spectral_moments(frequencies, psd)
+        assert np.allclose(moments[0, :, 0], data.var(axis=0), rtol=.01)
+        assert np.allclose(np.sqrt(moments[0, :, 2] / moments[0, :, 0]), [.1, .25], rtol=.01)
+        assert np.allclose(parse.peak_frequencies(frequencies, psd)[0], [.1, .25])
+
+    def test_spectra_3(self, tmp_path):
+        # campaign spectra read through get_param_data and saved to a compact array file
+        file_roots = ['tests/test_fast/compare_tune_fine_untuned', 'tests/test_fast/compare_tune_fine_untuned']
+        spectra_file = str(tmp_path / 'spectra.npz')
+        spectra = parse.campaign_spectra(file_roots, ['PtfmSurge', 'PtfmHeave'], 1024, batch_size=1,
+                                         spectra_file=spectra_file)
+        surge = parse.get_param_data(file_roots[0] + '.outb', ['PtfmSurge'])
+        compare_frequencies, compare_psd = signal.welch(surge[:, 0], fs=20., nperseg=1024)
+        assert spectra['psd'].shape == (2, 2, 513)
+        assert spectra['psd'].dtype == np.float32
+        assert np.allclose(spectra['psd'][1, 0], compare_psd, rtol=1e-5, atol=1e-12)
+        assert spectra['moments'].shape == (2, 2, 4)
+        with np.load(spectra_file) as saved_spectra:
+            assert (saved_spectra['peak_frequency'] == spectra['peak_frequency']).all()
+
+
+class TestSharedReductions:
+    def test_shared_reductions_1(self):
+        # Analyses run in worker processes on shared channels give the same results as run directly
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        params = ['PtfmSurge', 'PtfmSway', 'PtfmHeave']
+        data = parse.get_param_data(outb_file, params)
+        reductions = {'damage': parse.fatigue_damage_sums, 'distributions': parse.make_distributions,
+                      'psd': functools.partial(parse.welch_psd, dt=.05, nperseg=256)}
+        results = parse.shared_reductions(outb_file, params, reductions, max_workers=2)
+        assert (results['damage'] == parse.fatigue_damage_sums(data)).all()
+        assert np.array_equal(results['distributions'], parse.make_distributions(data))
+        assert (results['psd'][1] == parse.welch_psd(data, .05, 256)[1]).all()
+
+    def test_shared_reductions_2(self):
+        # MoorDyn text output, and an analysis returning a view of the shared data
+        md_file = 'tests/test_fast/compare_output.MD.Line1.out'
+        results = parse.shared_reductions(md_file, ['Seg1Ten', 'Seg6Ten'], {'last': operator.itemgetter(-1)})
+        assert (results['last'] == parse.get_moordyn_data(md_file, ['Seg1Ten', 'Seg6Ten'])[-1]).all()
+
+
+class TestChannelCache:
+    def test_channel_cache_1(self):
+        # Channels of a file are decoded once and then served from the cache
+        parse.clear_cache()
+        outb_file = 'tests/test_fast/compare_tune_fine_untuned.outb'
+        surge = parse.get_param_data(outb_file, ['PtfmSurge'])
+        cached_bytes = parse._cache_settings['num_bytes']
+        both = parse.get_channels(outb_file, ['PtfmSway', 'PtfmSurge'])
+        assert parse._cache_settings['num_bytes'] == 2 * cached_bytes
+        assert parse.get_channels(outb_file, ['PtfmSurge', 'PtfmSway']).flags['F_CONTIGUOUS']
+        assert parse._cache_settings['num_bytes'] == 2 * cached_bytes
+        assert (both[:, 1] == surge[:, 0]).all()
+        both[:, 1] = 0.
+        assert (parse.get_param_data(outb_file, ['PtfmSurge']) == surge).all()
+
+    def test_channel_cache_2(self, tmp_path):
+        # Cached channels are decoded again once the file changes
+        parse.clear_cache()
+        md_file = str(tmp_path / 'cache_test.MD.Line1.out')
+        shutil.copy('tests/test_fast/compare_output.MD.Line1.out', md_file)
+        tension = parse.get_moordyn_data(md_file, ['Seg6Ten'])
+        shutil.copy('tests/test_fast/compare_output_1seg.MD.Line1.out', md_file)
+        os.utime(md_file, ns=(0, 0))
+        with pytest.raises(ValueError):
+            parse.get_moordyn_data(md_file, ['Seg6Ten'])
+        assert tension[0, 0] == 936800.
+
+    def test_channel_cache_3(self):
+        # Least recently used files are evicted beyond the cache size limit
+        parse.clear_cache()
+        files = ['tests/test_fast/compare_tune_fine_untuned.outb', 'tests/test_fast/compare_tune_rough_uplift.outb',
+                 'tests/test_fast/test.outb']
+        try:
+            parse.set_cache_size(1000)
+            for outb_file in files:
+                parse.get_param_data(outb_file, ['Time'])
+            assert list(parse._output_cache) == [os.path.abspath(outb_file) for outb_file in files[1:]]
+            parse.set_cache_size(0)
+            assert len(parse._output_cache) == 0
+            assert parse._cache_settings['num_bytes'] == 0
+        finally:
+            parse.set_cache_size(2**30)
+
+    def test_channel_cache_4(self):
+        # Campaign reads bypass the cache, but still use channels that are already cached
+        parse.clear_cache()
+        file_roots = ['tests/test_fast/compare_output', 'tests/test_fast/compare_output_1seg']
+        distributions = parse.campaign_distributions(file_roots, 1)
+        assert len(parse._output_cache) == 0 and parse._cache_settings['num_bytes'] == 0
+        parse.output_parse(file_roots[0], 1)
+        cached_bytes = parse._cache_settings['num_bytes']
+        assert cached_bytes > 0
+        assert (parse.campaign_distributions(file_roots, 1)['line1'] == distributions['line1']).all()
+        assert parse._cache_settings['num_bytes'] == cached_bytes
+
 
 class TestFileCatching:
     def test_file_catching_1(self):
@@ -77,8 +363,9 @@ class TestFileCatching:
         txt_files = parse.get_filenames('.txt', file_directory=test_dir)
         compare_txt_files = ['test_currentdata_normal.txt', 'test_currentdata_overflow.txt',
                              'test_currentdata_string.txt', 'test_datetime_normal.txt', 'test_datetime_oldstyle.txt',
-                             'test_datetime_skip.txt', 'test_metdata_normal.txt', 'test_metdata_overflow.txt',
-                             'test_winddata_normal.txt', 'test_winddata_overflow.txt', 'test_winddata_realdata.txt']
+                             'test_datetime_skip.txt', 'test_metdata_legacy.txt', 'test_metdata_normal.txt',
+                             'test_metdata_overflow.txt', 'test_winddata_normal.txt', 'test_winddata_overflow.txt',
+                             'test_winddata_realdata.txt']
         assert txt_files == compare_txt_files
 
     def test_file_catching_3(self):
@@ -147,4 +434,66 @@ class TestFileCatching:
         compare_data = np.array([[863200., 936800.], [863100., 936700.], [863000., 936600.],
                                  [862900., 936600.], [862800., 936700.], [862200., 936800.],
                                  [861700., 936900.], [861600., 937100.], [862200., 936900.]])
-        assert (data == compare_data).all()
\ No newline at end of file
+        assert (data == compare_data).all()
+
+
+class TestDirectoryIndex:
+    def test_directory_index_1(self, tmp_path):
+        # Extension, substring, and glob queries, and files added after the first listing are picked up
+        for filename in ['b_Climate0.dat', 'a_Climate1.dat', 'a_Climate0.txt']:
+            open(str(tmp_path / filename), 'w').close()
+        os.mkdir(str(tmp_path / 'subdir.dat'))
+        index = parse.DirectoryIndex(str(tmp_path))
+        assert index.files(extension='.dat') == ['a_Climate1.dat', 'b_Climate0.dat']
+        assert index.files(contains='a_') == ['a_Climate0.txt', 'a_Climate1.dat']
+        assert index.files(pattern='*_Climate0.*') == ['a_Climate0.txt', 'b_Climate0.dat']
+        open(str(tmp_path / 'c_Climate0.dat'), 'w').close()
+        assert index.files(extension='.dat', pattern='*_Climate0.*') == ['b_Climate0.dat', 'c_Climate0.dat']
+
+    def test_directory_index_2(self, tmp_path):
+        # Stat results are cached while the directory is unchanged, and kept for unchanged files on a rescan
+        open(str(tmp_path / 'a.txt'), 'w').close()
+        os.utime(str(tmp_path), ns=(0, 0))
+        index = parse.DirectoryIndex(str(tmp_path))
+        a_stat = index.stat('a.txt')
+        assert index.stat('a.txt') is a_stat
+        open(str(tmp_path / 'b.txt'), 'w').close()
+        assert index.files() == ['a.txt', 'b.txt']
+        assert index.stat('a.txt') is a_stat
+        os.remove(str(tmp_path / 'a.txt'))
+        with pytest.raises(FileNotFoundError):
+            index.stat('a.txt')
+
+    def test_directory_index_3(self, tmp_path):
+        # get_most_recent_file_containing works on a directory other than the working directory
+        for filename in ['run_1.out', 'run_2.out', 'other.out']:
+            open(str(tmp_path / filename), 'w').close()
+        assert parse.get_most_recent_file_containing('run_', '.out', str(tmp_path)) in ['run_1.out', 'run_2.out']
+        assert parse.get_filenames('.out', str(tmp_path)) == ['other.out', 'run_1.out', 'run_2.out']
+        assert parse.get_directory_index(str(tmp_path)) is parse.get_directory_index(str(tmp_path) + '/')
+
+    def test_directory_index_4(self, tmp_path):
+        # A file overwritten in place, which doesn't change the directory, becomes the most recent file
+        for filename, timestamp in [('run_1.out', 1000000000), ('run_2.out', 2000000000)]:
+            open(str(tmp_path / filename), 'w').close()
+            os.utime(str(tmp_path / filename), ns=(timestamp, timestamp))
+        os.utime(str(tmp_path), ns=(0, 0))
+        assert parse.get_most_recent_file_containing('run_', '.out', str(tmp_path)) == 'run_2.out'
+        with open(str(tmp_path / 'run_1.out'), 'w') as run_file:
+            run_file.write('rerun')
+        assert parse.get_most_recent_file_containing('run_', '.out', str(tmp_path)) == 'run_1.out'
+
+    def test_directory_index_5(self, tmp_path, monkeypatch):
+        # Shared indexes are bounded to the most recently used directories, and can be cleared
+        monkeypatch.setattr(parse, 'max_directory_indexes', 2)
+        parse.clear_directory_indexes()
+        directories = [str(tmp_path / name) for name in ['a', 'b', 'c']]
+        for directory in directories:
+            os.mkdir(directory)
+        first_index = parse.get_directory_index(directories[0])
+        parse.get_directory_index(directories[1])
+        assert parse.get_directory_index(directories[0]) is first_index
+        parse.get_directory_index(directories[2])
+        assert list(parse._directory_indexes) == [directories[0], directories[2]]
+        parse.clear_directory_indexes()
+        assert parse.get_directory_index(directories[0]) is not first_index
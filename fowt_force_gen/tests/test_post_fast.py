@@ -0,0 +1,97 @@
+from fowt_force_gen import post_fast
+from scipy import io
+import json
+import os
+import shutil
+
+
+def copy_case(case_name, run_dir):
+    shutil.copy('tests/test_fast/compare_output.outb', str(run_dir / (case_name + '.outb')))
+    for line_num in ['1', '2', '3']:
+        shutil.copy('tests/test_fast/compare_output.MD.Line' + line_num + '.out',
+                    str(run_dir / (case_name + '.MD.Line' + line_num + '.out')))
+
+
+class TestProcessCampaign:
+    def test_process_campaign_1(self, tmp_path):
+        # Failing cases are recorded without stopping the others, in serial and across worker processes
+        run_dir = tmp_path / 'run'
+        mat_dir = str(tmp_path / 'force_gen')
+        os.mkdir(str(run_dir))
+        for case_name in ['case_a', 'case_b', 'case_c']:
+            copy_case(case_name, run_dir)
+        with open(str(run_dir / 'case_b.outb'), 'wb') as f:
+            f.write(b'\x00\x00')
+        case_names = ['case_a', 'case_b', 'case_c']
+        roots = [str(run_dir / case_name) for case_name in case_names]
+
+        for processes in [1, 2]:
+            results = post_fast.process_campaign(roots, case_names, mat_dir, processes=processes, batch_size=2,
+                                                 overwrite=True)
+            assert sorted(results['processed']) == ['case_a', 'case_c']
+            assert list(results['failed']) == ['case_b']
+            assert os.path.isfile(mat_dir + '/ReliabilityResults_case_c.mat')
+            assert not os.path.isfile(mat_dir + '/Surge_case_b.mat')
+            with open(os.path.join(mat_dir, post_fast.FailureFile)) as f:
+                assert list(json.load(f)) == ['case_b']
+        assert io.loadmat(mat_dir + '/Surge_case_a.mat')['Displacements'].shape == (1, 10)
+
+    def test_process_campaign_2(self, tmp_path):
+        # Cases with up-to-date MAT files are skipped, and a case is redone once its outputs change
+        run_dir = tmp_path / 'run'
+        mat_dir = str(tmp_path / 'force_gen')
+        os.mkdir(str(run_dir))
+        copy_case('case_a', run_dir)
+        copy_case('case_b', run_dir)
+        roots = [str(run_dir / 'case_a'), str(run_dir / 'case_b')]
+        results = post_fast.process_campaign(roots, ['case_a', 'case_b'], mat_dir)
+        assert results['processed'] == ['case_a', 'case_b']
+        assert not os.path.exists(os.path.join(mat_dir, post_fast.FailureFile))
+
+        os.utime(mat_dir + '/ReliabilityResults_case_a.mat', ns=(0, 0))
+        results = post_fast.process_campaign(roots, ['case_a', 'case_b'], mat_dir)
+        assert results['processed'] == ['case_a']
+        assert results['skipped'] == ['case_b']
+        results = post_fast.process_campaign(roots, ['case_a', 'case_b'], mat_dir)
+        assert results['skipped'] == ['case_a', 'case_b']
+
+    def test_process_campaign_3(self, tmp_path, monkeypatch):
+        # After a batch fails partway through writing, only the cases without up-to-date MAT files are redone
+        run_dir = tmp_path / 'run'
+        mat_dir = str(tmp_path / 'force_gen')
+        os.mkdir(str(run_dir))
+        os.mkdir(mat_dir)
+        copy_case('case_a', run_dir)
+        copy_case('case_b', run_dir)
+        roots = [str(run_dir / 'case_a'), str(run_dir / 'case_b')]
+        write_mat_files = post_fast._write_mat_files
+        written = []
+
+        def fail_once(distributions, case_num, case_name, mat_file_dir):
+            if case_name == 'case_b' and 'case_b' not in written:
+                written.append(case_name)
+                raise MemoryError
+            written.append(case_name)
+            write_mat_files(distributions, case_num, case_name, mat_file_dir)
+
+        campaign_distributions = post_fast.parse.campaign_distributions
+        parsed = []
+
+        def record_parse(output_file_roots, *args):
+            parsed.append([os.path.basename(root) for root in output_file_roots])
+            return campaign_distributions(output_file_roots, *args)
+
+        monkeypatch.setattr(post_fast, '_write_mat_files', fail_once)
+        monkeypatch.setattr(post_fast.parse, 'campaign_distributions', record_parse)
+        assert post_fast.process_cases(roots, ['case_a', 'case_b'], mat_dir) == {}
+        assert parsed == [['case_a', 'case_b'], ['case_b']]
+        assert written == ['case_a', 'case_b', 'case_b']
+        assert os.path.isfile(mat_dir + '/Surge_case_b.mat')
+
+    def test_process_campaign_4(self, tmp_path):
+        # Case names with glob special characters only match their own MoorDyn files
+        for case_name in ['case[1]', 'case1']:
+            copy_case(case_name, tmp_path)
+        input_files = post_fast.case_input_files(str(tmp_path / 'case[1]'))
+        assert [os.path.basename(filename) for filename in input_files] == \
+            ['case[1].outb', 'case[1].MD.Line1.out', 'case[1].MD.Line2.out', 'case[1].MD.Line3.out']
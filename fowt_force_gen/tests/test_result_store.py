@@ -0,0 +1,53 @@
+from fowt_force_gen import result_store
+from fowt_force_gen import parse
+import numpy as np
+import pytest
+
+
+class TestResultStore:
+    def test_result_store_1(self):
+        # Case metadata parsed from case names
+        case_info = result_store.parse_case_name('example2_11.62mps_180deg_Climate1')
+        assert case_info == {'wind_speed': 11.62, 'wind_direction': 180., 'climate': 1}
+        case_info = result_store.parse_case_name('fine_temp')
+        assert case_info == {'wind_speed': None, 'wind_direction': None, 'climate': None}
+
+    def test_result_store_2(self, tmp_path):
+        # Converted cases read back identically to the output files through parse
+        run_dir = 'example_files/post-fast'
+        store_file = str(tmp_path / 'campaign.zip')
+        case_names = result_store.convert(run_dir, store_file, chunk_size=500)
+        assert case_names == ['example2_11.62mps_0deg_Climate0', 'example2_14.94mps_180deg_Climate1']
+
+        with result_store.ResultStore(store_file) as store:
+            assert store.find_cases(wind_direction=180.) == ['example2_14.94mps_180deg_Climate1']
+            for case_name in case_names:
+                store_outputs = parse.output_parse(case_name, store=store)
+                file_outputs = parse.output_parse(run_dir + '/' + case_name)
+                for store_output, file_output in zip(store_outputs, file_outputs):
+                    assert (store_output == file_output).all()
+
+    def test_result_store_3(self, tmp_path):
+        # Time slices spanning chunk boundaries, and missing channels
+        run_dir = 'example_files/post-fast'
+        store_file = str(tmp_path / 'campaign.zip')
+        result_store.convert(run_dir, store_file, chunk_size=500, dtype=np.float32)
+        outb_file = run_dir + '/example2_11.62mps_0deg_Climate0.outb'
+        compare_data = parse.get_param_data(outb_file, ['Time', 'PtfmSurge'])
+        with result_store.ResultStore(store_file) as store:
+            data = store.get_channels(outb_file, ['Time', 'PtfmSurge'], start=450, stop=1050)
+            assert data.dtype == np.float32
+            assert np.allclose(data, compare_data[450:1050], rtol=1e-6)
+            with pytest.raises(ValueError):
+                store.get_channels(outb_file, ['NotAChannel'])
+
+    def test_result_store_4(self, tmp_path):
+        # A conversion that fails partway leaves neither a store nor its temporary file
+        run_dir = tmp_path / 'run'
+        run_dir.mkdir()
+        with open(str(run_dir / 'broken.outb'), 'wb') as f:
+            f.write(b'\x00\x00')
+        store_file = str(tmp_path / 'campaign.zip')
+        with pytest.raises(Exception):
+            result_store.convert(str(run_dir), store_file)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['run']
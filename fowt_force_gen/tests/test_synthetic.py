@@ -0,0 +1,56 @@
+from fowt_force_gen import synthetic
+from fowt_force_gen import parse
+from fowt_force_gen import fast_io
+from fowt_force_gen import windbins
+import datetime
+import numpy as np
+import os
+
+
+class TestSyntheticOutput:
+    def test_synthetic_output_1(self, tmp_path):
+        # Synthetic case can be parsed like an OpenFAST case
+        file_root = str(tmp_path / 'synthetic_test')
+        written_files = synthetic.generate_output(file_root, tmax=60., num_channels=20, chunk_size=500)
+        assert written_files == [file_root + '.outb', file_root + '.MD.Line1.out', file_root + '.MD.Line2.out',
+                                 file_root + '.MD.Line3.out']
+        ptfm_surge, ptfm_sway, anchor_tension, line1_tension, line2_tension, line3_tension = \
+            parse.output_parse(file_root)
+        assert ptfm_surge.shape == (1201, 1)
+        assert anchor_tension.shape == (1201, 3)
+        assert line1_tension.shape == (4801, 6)
+        assert len(fast_io.read_output_header(file_root + '.outb')['ChanName']) == 21
+        assert (anchor_tension > 0).all()
+
+    def test_synthetic_output_2(self, tmp_path):
+        # Output is independent of the block size it is written in
+        synthetic.generate_output(str(tmp_path / 'a'), tmax=30., chunk_size=100, file_id=1)
+        synthetic.generate_output(str(tmp_path / 'b'), tmax=30., chunk_size=1000, file_id=1)
+        data_a = fast_io.load_binary_output(str(tmp_path / 'a.outb'))[0]
+        data_b = fast_io.load_binary_output(str(tmp_path / 'b.outb'))[0]
+        assert (data_a == data_b).all()
+        assert (parse.get_moordyn_data(str(tmp_path / 'a.MD.Line2.out'), ['Seg3Ten']) ==
+                parse.get_moordyn_data(str(tmp_path / 'b.MD.Line2.out'), ['Seg3Ten'])).all()
+
+    def test_synthetic_output_3(self, tmp_path):
+        # Campaign case names follow the filegen.fst_bulk_filegen format
+        case_roots = synthetic.generate_campaign(str(tmp_path), 'Site1', [10, 12], [0], 2, tmax=5.)
+        assert [os.path.basename(case_root) for case_root in case_roots] == \
+            ['Site1_10mps_0deg_Climate0', 'Site1_10mps_0deg_Climate1', 'Site1_12mps_0deg_Climate0',
+             'Site1_12mps_0deg_Climate1']
+        mean_surge = [np.mean(parse.get_param_data(case_root + '.outb', ['PtfmSurge'])) for case_root in case_roots]
+        assert mean_surge[2] > mean_surge[0]
+
+    def test_synthetic_output_4(self, tmp_path):
+        # Synthetic NDBC files are read by the windbins parsers, with sentinels read as missing values
+        for data_type in ['stdmet', 'cwind', 'adcp']:
+            synthetic.generate_ndbc_file(str(tmp_path / (data_type + '.txt')), data_type, 500, 10,
+                                         missing_fraction=.1)
+        met_data = windbins.get_met_data(str(tmp_path / 'stdmet.txt'))
+        wind_data = windbins.get_wind_data(str(tmp_path / 'cwind.txt'))
+        current_data, current_depth = windbins.get_current_data(str(tmp_path / 'adcp.txt'))
+        assert len(met_data) == len(wind_data) == len(current_data) == 500
+        assert 0 < met_data['Wind Speed'].isna().sum() < 500
+        assert met_data['Wind Speed'].max() < 99.
+        assert current_depth == 2.5
+        assert windbins.get_datetimes(str(tmp_path / 'cwind.txt'))[-1] == datetime.datetime(2015, 1, 4, 11, 10)
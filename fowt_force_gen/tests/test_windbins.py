@@ -1,8 +1,10 @@
+from fowt_force_gen import synthetic
 from fowt_force_gen import windbins
 import pandas as pd
 import numpy as np
 import datetime
 from unittest import mock
+import pytest
 
 
 class TestMetGeneration:
@@ -92,6 +94,61 @@ class TestCurrentGeneration:
         assert current_depth == compare_depth
 
 
+class TestNdbcColumns:
+    def test_ndbc_columns_1(self):
+        # Columns in requested order, 'MM' as NaN, and rows with fewer columns than the header
+        file = 'tests/test_data//test_currentdata_string.txt'
+        data = windbins.read_ndbc_columns(file, [7, 5, 8])
+        assert data.shape == (8, 3)
+        assert (data[:2, :2] == [[34., 3.8], [44., 3.8]]).all()
+        assert np.isnan(data[3, 0])
+        assert np.isnan(data[:, 2]).all()
+
+    def test_ndbc_columns_2(self):
+        # Sentinel values are masked, other values are kept
+        values = np.array([99., 99.01, 999., 12.5, np.nan])
+        masked = windbins.mask_sentinel(values, 99.)
+        assert np.isnan(masked[[0, 4]]).all()
+        assert (masked[[1, 2, 3]] == values[[1, 2, 3]]).all()
+
+
+class TestNdbcFile:
+    def test_ndbc_file_1(self):
+        # Named columns indexed by datetime, with each column's own sentinel masked
+        file = 'tests/test_data//test_metdata_overflow.txt'
+        ndbc_data = windbins.read_ndbc_file(file)
+        assert list(ndbc_data.columns[:3]) == ['WDIR', 'WSPD', 'GST']
+        assert ndbc_data.index[1] == datetime.datetime(2019, 11, 16, 0, 40)
+        assert np.isnan(ndbc_data['WDIR'].iloc[1]) and ndbc_data['WDIR'].iloc[0] == 260.
+        assert ndbc_data['PRES'].isna().all()
+        assert (ndbc_data['ATMP'].iloc[:2] == [11.3, 11.3]).all()
+
+    def test_ndbc_file_2(self):
+        # The parsed frame can be used in place of the file by every reader
+        met_file = 'tests/test_data//test_metdata_normal.txt'
+        ndbc_data = windbins.read_ndbc_file(met_file)
+        assert windbins.get_met_data(ndbc_data).equals(windbins.get_met_data(met_file))
+        assert windbins.get_wind_data(ndbc_data).equals(windbins.get_wind_data(met_file))
+        assert windbins.get_datetimes(ndbc_data) == windbins.get_datetimes(met_file)
+        old_file = 'tests/test_data//test_datetime_oldstyle.txt'
+        assert windbins.read_ndbc_file(old_file).index[0] == datetime.datetime(1998, 6, 30, 21, 20)
+
+    def test_ndbc_file_3(self):
+        # Legacy files with a single header line, two-digit years, no minute column, and 'WD' for the wind direction
+        file = 'tests/test_data//test_metdata_legacy.txt'
+        ndbc_data = windbins.read_ndbc_file(file)
+        assert len(ndbc_data) == 4
+        assert list(ndbc_data.columns[:3]) == ['WD', 'WSPD', 'GST']
+        assert ndbc_data.index[0] == datetime.datetime(1997, 12, 31, 22, 0)
+        assert ndbc_data.index[2] == datetime.datetime(1998, 1, 1, 0, 0)
+        met_data = windbins.get_met_data(file)
+        assert (met_data['Wind Speed'].iloc[[0, 1, 3]] == [5.1, 5.6, 6.2]).all()
+        assert (met_data['Wind Direction'].iloc[[0, 3]] == [240., 220.]).all()
+        assert (met_data['Wave Period'].iloc[[0, 1]] == [8.33, 9.09]).all()
+        assert met_data.iloc[2].isna().all() and met_data['Wave Direction'].isna().all()
+        assert windbins.get_wind_data(file).equals(met_data[['Wind Speed', 'Wind Direction']])
+
+
 class TestDatetimeGeneration:
     def test_datetime_generation_1(self):
         # Test with typical modern datetime system
@@ -135,7 +192,7 @@ class TestWaveClass:
         assert compare_partitions.equals(met_partitions)
 
     def test_wave_class_2(self, monkeypatch):
-        # Test with custom partitioning, 2 disparate wave climates
+        # Test with custom partitioning, 2 disparate wave climates, with medians recomputed over the combined divisions
         file = 'tests/test_data//test_metdata_normal.txt'
         met_data = windbins.get_met_data(file)
         waves = windbins.Wave(met_data)
@@ -144,8 +201,8 @@ class TestWaveClass:
         def dummy_inputs(mocked_inputs):
             mocked_inputs.side_effect = ['y', '2', '0 1 2 3 4', '5 6 7 8']
             met_partitions = waves.partition(custom_partitioning=True)
-            compare_partitions = {'Significant Wave Height': [1.684, 1.740], 'Wave Direction': [107.4, 110.5],
-                                  'Wave Period': [13.816, 15.59]}
+            compare_partitions = {'Significant Wave Height': [1.66, (1.76 + 1.77) / 2], 'Wave Direction': [107., 106.],
+                                  'Wave Period': [13.79, (13.79 + 17.39) / 2]}
             compare_partitions = pd.DataFrame(data=compare_partitions)
             assert compare_partitions.equals(met_partitions)
         dummy_inputs()
@@ -160,8 +217,8 @@ class TestWaveClass:
         def dummy_inputs(mocked_inputs):
             mocked_inputs.side_effect = ['y', '2', '1 3 5 7 9', '1 2 3 5 7']
             met_partitions = waves.partition(custom_partitioning=True)
-            compare_partitions = {'Significant Wave Height': [1.723, 1.694], 'Wave Direction': [98.75, 98.6],
-                                  'Wave Period': [15.368, 15.256]}
+            compare_partitions = {'Significant Wave Height': [(1.66 + 1.77) / 2, 1.66], 'Wave Direction': [96.5, 97.],
+                                  'Wave Period': [(13.79 + 17.39) / 2, 14.81]}
             compare_partitions = pd.DataFrame(data=compare_partitions)
             assert compare_partitions.equals(met_partitions)
         dummy_inputs()
@@ -182,6 +239,53 @@ class TestWaveClass:
             assert compare_partitions.equals(met_partitions)
         dummy_inputs()
 
+    def test_wave_class_5(self, tmp_path):
+        # Calendar partitioning matches the medians of each month and season of two years of data
+        met_file = str(tmp_path / 'met_data.txt')
+        synthetic.generate_ndbc_file(met_file, 'stdmet', 8760 * 2, start_year=2014)
+        ndbc_data = windbins.read_ndbc_file(met_file)
+        met_data = windbins.get_met_data(ndbc_data)
+        waves = windbins.Wave(met_data, ndbc_data.index)
+        months = ndbc_data.index.month.to_numpy()
+        compare_partitions = met_data[windbins.wave_params].groupby(months).median()
+        assert (waves.partition(by='month').to_numpy() == compare_partitions.to_numpy()).all()
+        season_partitions = waves.partition(by='season')
+        assert list(season_partitions.index) == ['DJF', 'MAM', 'JJA', 'SON']
+        winter = met_data[np.isin(months, [12, 1, 2])]
+        assert (season_partitions.loc['DJF'].to_numpy() == winter[windbins.wave_params].median().to_numpy()).all()
+        with pytest.raises(ValueError):
+            windbins.Wave(met_data).partition(by='month')
+
+    def test_wave_class_6(self):
+        # Declarative merge specs, by division number and by name, with medians of the combined measurements
+        file = 'tests/test_data//test_metdata_normal.txt'
+        met_data = windbins.get_met_data(file)
+        waves = windbins.Wave(met_data)
+        met_partitions = waves.partition(num_divisions=3, merge={'Start': [0], 'Rest': [1, 2]})
+        compare_partitions = {'Significant Wave Height': [1.58, 1.77], 'Wave Direction': [98.0, 111.5],
+                              'Wave Period': [13.79, 13.79]}
+        compare_partitions = pd.DataFrame(data=compare_partitions, index=['Start', 'Rest'])
+        assert compare_partitions.equals(met_partitions)
+        ndbc_data = windbins.read_ndbc_file(file)
+        met_partitions = windbins.Wave(met_data, ndbc_data.index).partition(by='month', merge=[['Dec', 'Jan']])
+        assert (met_partitions.to_numpy() == met_data[windbins.wave_params].median().to_numpy()).all()
+        with pytest.raises(ValueError):
+            waves.partition(num_divisions=3, merge=[[0, 3]])
+
+    def test_wave_class_7(self, tmp_path):
+        # Clustered sea states: every complete measurement is in a cluster, numbered by increasing median wave height
+        met_file = str(tmp_path / 'met_data.txt')
+        synthetic.generate_ndbc_file(met_file, 'stdmet', 8760)
+        waves = windbins.Wave(windbins.get_met_data(met_file))
+        labels, names = waves.division_labels(num_divisions=6, by='cluster')
+        complete = ~(np.isnan(waves.sig) | np.isnan(waves.periods) | np.isnan(waves.directions)).to_numpy()
+        assert names is None
+        assert (labels[complete] >= 0).all() and (labels[~complete] == -1).all()
+        assert set(labels[complete]) == set(range(6))
+        met_partitions = waves.partition(num_divisions=6, by='cluster')
+        assert (np.diff(met_partitions['Significant Wave Height']) >= 0).all()
+        assert met_partitions.equals(waves.partition(num_divisions=6, by='cluster'))
+
 
 class TestWindClass:
     def test_wind_class_1(self):
@@ -253,3 +357,39 @@ class TestWindClass:
         compare_bin_probabilities = pd.DataFrame(data=compare_bin_probabilities,
                                                  index=[3.47, 3.61, 3.75, 3.89, 4.03])
         assert compare_bin_probabilities.equals(bin_probabilities)
+
+
+class TestJointBinning:
+    def test_joint_binning_1(self):
+        # Several data sets binned in one call, padded with NaN, match binning each on its own
+        real_data = windbins.get_wind_data('tests/test_data//test_winddata_realdata.txt')
+        met_data = windbins.get_met_data('tests/test_data//test_metdata_normal.txt')
+        speeds = np.full([2, len(real_data)], np.nan)
+        directions = np.full([2, len(real_data)], np.nan)
+        speeds[0], directions[0] = real_data['Wind Speed'], real_data['Wind Direction']
+        speeds[1, :len(met_data)], directions[1, :len(met_data)] = met_data['Wind Speed'], met_data['Wind Direction']
+        probabilities = windbins.bin_probabilities(speeds, directions)
+        assert probabilities.shape == (2, 5, 16)
+        assert (probabilities[0] == windbins.Wind(real_data).get_bin_probabilities().values).all()
+        assert (probabilities[1] == windbins.Wind(met_data).get_bin_probabilities().values).all()
+
+    def test_joint_binning_2(self):
+        # Custom speed edges and sector count, including wrap-around of the north sector
+        wind_data = pd.DataFrame({'Wind Speed': [1., 4., 6., 12., 3., np.nan],
+                                  'Wind Direction': [350., 10., 100., 180., np.nan, 90.]})
+        bin_probabilities = windbins.Wind(wind_data).get_bin_probabilities(speed_edges=[0., 5., 10.], num_sectors=4)
+        assert list(bin_probabilities.index) == [2.5, 7.5]
+        assert list(bin_probabilities.columns) == [0., 90., 180., 270.]
+        assert (bin_probabilities.values == [[.5, 0., 0., 0.], [0., .25, .25, 0.]]).all()
+
+    def test_joint_binning_3(self):
+        # Bin counts are the same as windrose's
+        windrose = pytest.importorskip('windrose.windrose')
+        wind_data = windbins.get_wind_data('tests/test_data//test_winddata_realdata.txt')
+        edges = np.linspace(wind_data['Wind Speed'].min(), wind_data['Wind Speed'].max(), 6)
+        for num_sectors in [8, 16, 36]:
+            table = windrose.histogram(wind_data['Wind Direction'].values, wind_data['Wind Speed'].values, edges,
+                                       num_sectors, len(wind_data))[2]
+            counts = windbins.joint_bin_counts(wind_data['Wind Speed'], wind_data['Wind Direction'], edges,
+                                               num_sectors)[0]
+            assert (counts == table).all()
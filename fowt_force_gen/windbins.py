@@ -1,62 +1,126 @@
-import csv
-import warnings
 import pandas as pd
-import datetime
 import numpy as np
-import math
-with warnings.catch_warnings():
-    warnings.simplefilter('ignore')
-    import windrose
 
 
-# TODO: fix read issue with old text files that don't have a units header
+# Missing-data sentinels of the NDBC data columns, by column name with any depth bin number removed (e.g. 'DIR' for
+# 'DIR01'). Columns not listed (e.g. current bin depths) have no sentinel.
+ndbc_sentinels = {'WDIR': 999., 'WD': 999., 'DIR': 999., 'GDR': 999., 'MWD': 999., 'WSPD': 99., 'SPD': 99.,
+                  'GST': 99., 'GSP': 99., 'GMN': 99., 'WVHT': 99., 'DPD': 99., 'APD': 99., 'VIS': 99., 'TIDE': 99.,
+                  'PTDY': 99., 'ATMP': 999., 'WTMP': 999., 'DEWP': 999., 'PRES': 9999., 'BAR': 9999., 'GTIME': 9999.}
+
+
+# Names of the date and time columns of NDBC data files. Old files name the year 'YY' (two digits, up to 1998) or
+# 'YYYY', and files before 2005 have no minute column.
+ndbc_year_columns = ['YY', 'YYYY']
+ndbc_time_columns = ['MM', 'DD', 'hh', 'mm']
+
+
+def read_ndbc_header(csv_file):
+    """
+    Returns the column names of an NDBC data file, as in its first line without the '#', and its number of header
+    lines: the first line and the lines after it that start with '#' (e.g. the units line of newer files). Old files
+    have a single header line.
+    """
+    with open(csv_file) as data_file:
+        names = data_file.readline().lstrip('#').split()
+        num_header_lines = 1
+        for line in data_file:
+            if not line.startswith('#'):
+                break
+            num_header_lines += 1
+    return names, num_header_lines
+
+
+def read_ndbc_columns(csv_file, columns):
+    """
+    Reads the specified columns (by position, e.g. 5 for the sixth column) of a whitespace-delimited NDBC data file in
+    a single pass of pandas' C parser, skipping the header lines. Returns a float array of shape (rows, len(columns))
+    in the order of columns. Missing values ('MM') are NaN; the 99/999 sentinel values are left as they are (see
+    mask_sentinel). Rows may have fewer columns than the header, as in current (adcp) files, which only list the depth
+    bins that were measured.
+    """
+    names, num_header_lines = read_ndbc_header(csv_file)
+    num_columns = max(len(names), max(columns) + 1)
+    data = pd.read_csv(csv_file, sep=r'\s+', header=None, skiprows=num_header_lines, names=range(num_columns),
+                       na_values=['MM'], dtype=np.float64, engine='c')
+    return data[list(columns)].to_numpy(dtype=np.float64)
+
+
+def mask_sentinel(values, sentinel):
+    """Returns a copy of an array with the values equal to an NDBC missing-data sentinel (e.g. 99. or 999.) as NaN."""
+    return np.where(np.isclose(values, sentinel, rtol=1e-9, atol=0.), np.nan, values)
+
+
+def read_ndbc_file(csv_file):
+    """
+    Reads every column of an NDBC archived or real-time data file (standard meteorological, continuous wind, current,
+    etc.) in a single pass. Returns a DataFrame indexed by the datetime of each row, with one column per data column
+    named as in the file's header (e.g. 'WDIR', 'WSPD', 'WVHT', 'PRES', or 'DEP01', 'DIR01', 'SPD01'). Missing values
+    ('MM' and the sentinels in ndbc_sentinels) are NaN. Values are as in the file: directions are not yet converted to
+    the FAST convention. The datetime is built from whichever date and time columns the file has; two-digit years of
+    old files are taken as 19YY, and files without a minute column are on the hour.
+
+    The result can be passed to get_met_data, get_wind_data, get_current_data, and get_datetimes in place of the file
+    name, so a file used by several of them is only read once.
+    """
+    names, _ = read_ndbc_header(csv_file)
+    data = read_ndbc_columns(csv_file, range(len(names)))
+
+    columns = {name: col for col, name in enumerate(names)}
+    year_column = next((columns[name] for name in ndbc_year_columns if name in columns), None)
+    if year_column is None or not all(name in columns for name in ndbc_time_columns[:3]):
+        raise ValueError(csv_file + ' has no YY/YYYY, MM, DD, and hh columns')
+    year = data[:, year_column].astype(np.int64)
+    year = np.where(year < 100, year + 1900, year)
+    month, day, hour = (data[:, columns[name]].astype(np.int64) for name in ndbc_time_columns[:3])
+    minute = data[:, columns['mm']].astype(np.int64) if 'mm' in columns else 0
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    datetimes = months.astype('datetime64[m]') + ((day - 1) * 1440 + hour * 60 + minute).astype('timedelta64[m]')
+
+    ndbc_data = {}
+    for col, name in enumerate(names):
+        if name in ndbc_year_columns or name in ndbc_time_columns:
+            continue
+        sentinel = ndbc_sentinels.get(name.rstrip('0123456789'))
+        ndbc_data[name] = data[:, col] if sentinel is None else mask_sentinel(data[:, col], sentinel)
+    return pd.DataFrame(ndbc_data, index=pd.DatetimeIndex(datetimes, name='Datetime'))
+
+
+def _ndbc_values(csv_file, columns):
+    """
+    Returns the specified data columns of an NDBC file as an array of shape (rows, len(columns)). Each column is given
+    as a list of the names it goes by in different file formats (e.g. ['WDIR', 'WD']); the first name in the file's
+    header is used. csv_file is a file name or the DataFrame read_ndbc_file returns.
+    """
+    ndbc_data = csv_file if isinstance(csv_file, pd.DataFrame) else read_ndbc_file(csv_file)
+    names = []
+    for column_names in columns:
+        name = next((name for name in column_names if name in ndbc_data.columns), None)
+        if name is None:
+            raise KeyError('NDBC data has none of the columns ' + ', '.join(column_names))
+        names.append(name)
+    return ndbc_data[names].to_numpy(dtype=np.float64)
+
+
 def get_met_data(csv_file):
     """
     Gathers and returns list of lists of wind and wave information based on hourly or 10-minute data from NOAA's
     National Data Buoy Center real-time or archived data. Returned list format is [wind speeds, wind directions,
     significant wave heights, wave directions, peak wave periods].
-    Input parameter is any CSV or text file with the same formatting as the NDBC website.
+    Input parameter is any CSV or text file with the same formatting as the NDBC website, or the DataFrame
+    read_ndbc_file returns for it.
     Note this is the only function used when sampling from real-time or 10-minute data; all other functions rely on
     archived data.
     """
 
-    wind_speed = []
-    wind_dir = []
-    wave_dir = []
-    sig_wave_ht = []
-    wave_period = []
+    columns = [['WDIR', 'WD'], ['WSPD'], ['WVHT'], ['DPD'], ['MWD']]
+    wind_dir, wind_speed, sig_wave_ht, wave_period, wave_dir = _ndbc_values(csv_file, columns).T
 
-    with open(csv_file) as data_file:
-        reader = csv.reader(data_file, delimiter=' ')
-        next(reader)  # skips header lines of CSV file
-        next(reader)
-
-        for row in reader:
-            while '' in row:
-                row.remove('')
-            current_wind_speed = float(row[6])
-            current_wind_dir = 360 - int(row[5])  # FAST orients direction with opposite +y
-            current_wave_dir = 360 - int(row[11])
-            current_sig_wave_ht = float(row[8])
-            current_wave_period = float(row[9])
-            if math.isclose(current_wind_speed, 99.):
-                current_wind_speed = np.nan
-            if math.isclose(current_wind_dir, -639.):
-                current_wind_dir = np.nan
-            if math.isclose(current_wave_dir, -639.):
-                current_wave_dir = np.nan
-            if math.isclose(current_sig_wave_ht, 99.):
-                current_sig_wave_ht = np.nan
-            if math.isclose(current_wave_period, 99.):
-                current_wave_period = np.nan
-            wind_speed.append(float(current_wind_speed))
-            wind_dir.append(float(current_wind_dir))
-            wave_dir.append(float(current_wave_dir))
-            sig_wave_ht.append(float(current_sig_wave_ht))
-            wave_period.append(float(current_wave_period))
-
-    met_data = {'Wind Speed': wind_speed, 'Wind Direction': wind_dir, 'Significant Wave Height': sig_wave_ht,
-                'Wave Direction': wave_dir, 'Wave Period': wave_period}
+    met_data = {'Wind Speed': mask_sentinel(wind_speed, 99.),
+                'Wind Direction': 360 - mask_sentinel(wind_dir, 999.),  # FAST orients direction with opposite +y
+                'Significant Wave Height': mask_sentinel(sig_wave_ht, 99.),
+                'Wave Direction': 360 - mask_sentinel(wave_dir, 999.),
+                'Wave Period': mask_sentinel(wave_period, 99.)}
     met_data = pd.DataFrame(data=met_data)
     return met_data
 
@@ -65,30 +129,14 @@ def get_wind_data(csv_file):
     """
     Gathers and returns list of lists of wind information based in hourly data from NOAA's National Data Buoy Center
     archived data.  Returned list format is [wind speeds, wind directions].
-    Input parameter is any CSV or text file with the same formatting at the NDBC website.
+    Input parameter is any CSV or text file with the same formatting at the NDBC website, or the DataFrame
+    read_ndbc_file returns for it.
     """
 
-    wind_speed = []
-    wind_dir = []
+    wind_dir, wind_speed = _ndbc_values(csv_file, [['WDIR', 'WD', 'DIR'], ['WSPD', 'SPD']]).T
 
-    with open(csv_file) as data_file:
-        reader = csv.reader(data_file, delimiter=' ')
-        next(reader)  # skips header line of CSV file
-        next(reader)
-
-        for row in reader:
-            while '' in row:
-                row.remove('')
-            current_wind_dir = 360 - int(row[5])  # FAST orients direction with opposite +y
-            current_wind_speed = float(row[6])
-            if math.isclose(current_wind_speed, 99.):
-                current_wind_speed = np.nan
-            if math.isclose(current_wind_dir, -639):
-                current_wind_dir = np.nan
-            wind_dir.append(float(current_wind_dir))
-            wind_speed.append(float(current_wind_speed))
-
-    wind_data = {'Wind Speed': wind_speed, 'Wind Direction': wind_dir}
+    wind_data = {'Wind Speed': mask_sentinel(wind_speed, 99.),
+                 'Wind Direction': 360 - mask_sentinel(wind_dir, 999.)}  # FAST orients direction with opposite +y
     wind_data = pd.DataFrame(data=wind_data)
 
     return wind_data
@@ -98,88 +146,226 @@ def get_current_data(csv_file):
     """
     Gathers and returns list of lists of current information based in hourly data from NOAA's National Data Buoy Center
     archived data. Returned list format is [current depths, current speeds, current directions].
-    Input parameter is any CSV or text file with the same formatting at the NDBC website.
+    Input parameter is any CSV or text file with the same formatting at the NDBC website, or the DataFrame
+    read_ndbc_file returns for it.
     """
 
-    current_speed = []
-    current_dir = []
+    current_depth, current_dir, current_speed = _ndbc_values(csv_file, [['DEP01'], ['DIR01'], ['SPD01']]).T
 
-    with open(csv_file) as data_file:
-        reader = csv.reader(data_file, delimiter=' ')
-        next(reader)  # skips header line of CSV file
-        next(reader)
-
-        for row in reader:
-            while '' in row:
-                row.remove('')
-            current_depth = float(row[5])
-            try:
-                current_current_speed = float(row[7])
-            except ValueError:
-                current_current_speed = np.nan
-            current_current_dir = 360 - int(row[6])
-            if math.isclose(current_current_speed, 99.):
-                current_current_speed = np.nan
-            if math.isclose(current_current_dir, -639) or current_current_dir == 'MM':
-                current_current_dir = np.nan
-            current_speed.append(float(current_current_speed))
-            current_dir.append(float(current_current_dir))
-
-    current_data = {'Current Speed': current_speed, 'Current Direction': current_dir}
+    current_data = {'Current Speed': mask_sentinel(current_speed, 99.),
+                    'Current Direction': 360 - mask_sentinel(current_dir, 999.)}
     current_data = pd.DataFrame(data=current_data)
 
-    return current_data, current_depth
+    return current_data, float(current_depth[-1])
 
 
 def get_datetimes(csv_file):
     """
     Generates and returns list of datetimes of format YYYY-MM-DD HH:MM from NOAA's National Data Buoy Center
-    archived data. Input parameter is any CSV or text file with the same formatting at the NDBC website.
+    archived data. Input parameter is any CSV or text file with the same formatting at the NDBC website, or the
+    DataFrame read_ndbc_file returns for it.
     TODO: add functionality with real-time data.
     """
 
-    datetimes = []
+    ndbc_data = csv_file if isinstance(csv_file, pd.DataFrame) else read_ndbc_file(csv_file)
+    return list(ndbc_data.index.to_pydatetime())
 
-    with open(csv_file) as data_file:
-        reader = csv.reader(data_file, delimiter=' ')
-        next(reader)  # skips header line of CSV file
-        next(reader)
 
-        for row in reader:
-            while '' in row:
-                row.remove('')
-            currentyear = int(row[0])
-            if currentyear < 100:
-                currentyear = int('19' + str(currentyear))
-            currentmonth = int(row[1])
-            currentday = int(row[2])
-            currenthour = int(row[3])
-            currentmin = int(row[4])
-            datetimes.append(datetime.datetime(currentyear, currentmonth, currentday, currenthour, currentmin))
+# Names of the calendar divisions of Wave.partition. Seasons are meteorological: December to February, March to May,
+# June to August, and September to November.
+month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+season_names = ['DJF', 'MAM', 'JJA', 'SON']
+wave_params = ['Significant Wave Height', 'Wave Direction', 'Wave Period']
 
-    return datetimes
+
+def group_medians(values, labels, num_groups):
+    """
+    Returns the median of the values of each group, as numpy.nanmedian of each group's values gives it, from a single
+    sort of all the values. labels gives the group (0 to num_groups - 1) of each value; values with a negative label
+    and NaN values aren't counted. Groups without values give NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.int64)
+    keep = (labels >= 0) & (labels < num_groups) & ~np.isnan(values)
+    values, labels = values[keep], labels[keep]
+    # Sorted by value, then stably by group: faster than numpy.lexsort, as the stable sort of small integers is a radix
+    # sort
+    order = np.argsort(values)
+    sorted_values = values[order[np.argsort(labels[order], kind='stable')]]
+    group_sizes = np.bincount(labels, minlength=num_groups)
+    group_starts = np.cumsum(group_sizes) - group_sizes
+
+    medians = np.full(num_groups, np.nan)
+    has_values = group_sizes > 0
+    lower = group_starts[has_values] + (group_sizes[has_values] - 1) // 2
+    upper = group_starts[has_values] + group_sizes[has_values] // 2
+    medians[has_values] = (sorted_values[lower] + sorted_values[upper]) / 2
+    return medians
+
+
+def _squared_distances(points, centers):
+    return (points ** 2).sum(axis=1)[:, np.newaxis] - 2 * points @ centers.T + (centers ** 2).sum(axis=1)
+
+
+def kmeans_labels(points, num_clusters, seed=0, max_iterations=50, sample_size=10000):
+    """
+    Clusters points (an array of shape (points, features)) into num_clusters clusters with k-means seeded by
+    k-means++. The centers are fit to a random sample of at most sample_size points, and every point is then labeled
+    with its nearest center, so decades of data cluster in about the time a year does. Returns the cluster of each
+    point.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    sample = points if len(points) <= sample_size else points[rng.choice(len(points), sample_size, replace=False)]
+    if len(np.unique(sample, axis=0)) < num_clusters:
+        raise ValueError('There are fewer distinct points than the %d clusters requested.' % num_clusters)
+
+    centers = sample[[rng.integers(len(sample))]]
+    closest = _squared_distances(sample, centers)[:, 0]
+    for _ in range(1, num_clusters):
+        weights = np.maximum(closest, 0.)
+        centers = np.vstack([centers, sample[rng.choice(len(sample), p=weights / weights.sum())]])
+        closest = np.minimum(closest, _squared_distances(sample, centers[-1:])[:, 0])
+
+    labels = None
+    for _ in range(max_iterations):
+        new_labels = _squared_distances(sample, centers).argmin(axis=1)
+        if labels is not None and (new_labels == labels).all():
+            break
+        labels = new_labels
+        cluster_sizes = np.bincount(labels, minlength=num_clusters)
+        filled = cluster_sizes > 0
+        for feature in range(sample.shape[1]):
+            feature_sums = np.bincount(labels, sample[:, feature], minlength=num_clusters)
+            centers[filled, feature] = feature_sums[filled] / cluster_sizes[filled]
+        for empty_cluster in np.flatnonzero(~filled):
+            # An empty cluster restarts at the point farthest from its center
+            centers[empty_cluster] = sample[_squared_distances(sample, centers).min(axis=1).argmax()]
+
+    return _squared_distances(points, centers).argmin(axis=1)
 
 
 class Wave:
-    """All gathered wave directions, significant wave heights, and dominant wave periods."""
+    """
+    All gathered wave directions, significant wave heights, and dominant wave periods, with the datetime of each
+    measurement if they are known (from the datetimes argument, or the DatetimeIndex of met_data).
+    """
 
-    def __init__(self, met_data):
+    def __init__(self, met_data, datetimes=None):
         self.directions = met_data['Wave Direction']
         self.sig = met_data['Significant Wave Height']
         self.periods = met_data['Wave Period']
+        if datetimes is None and isinstance(met_data.index, pd.DatetimeIndex):
+            datetimes = met_data.index
+        self.datetimes = None if datetimes is None else pd.DatetimeIndex(datetimes)
 
-    def partition(self, custom_partitioning=False, num_divisions=12):
+    def division_labels(self, num_divisions=12, by='index', seed=0):
+        """
+        Assigns each measurement to a division. Returns (labels, names): the division of each measurement (-1 for
+        measurements in none of them), and the name of each division, or None for numbered divisions.
+
+        by selects how the measurements are divided:
+            'index': num_divisions consecutive blocks of the same number of measurements.
+            'month' or 'season': the calendar month or meteorological season (DJF, MAM, JJA, SON) of each
+                measurement, over every year of the data. Needs the datetimes of the measurements.
+            'cluster': num_divisions clusters of similar sea states, by k-means on the standardized significant wave
+                height and period and the direction as a point on the unit circle. Clusters are numbered from the
+                lowest median wave height to the highest. Measurements missing any of these (other than a quantity
+                missing from every measurement) aren't in a cluster.
+        """
+        num_measures = len(self.sig)
+        if by == 'index':
+            measures_per_division = round(num_measures / num_divisions)
+            if measures_per_division == 0:
+                return np.full(num_measures, -1), None
+            labels = np.arange(num_measures) // measures_per_division
+            labels[labels >= num_divisions] = -1
+            return labels, None
+
+        if by in ['month', 'season']:
+            if self.datetimes is None:
+                raise ValueError("Partitioning by %s needs the datetimes of the measurements. Pass them to Wave, or "
+                                 "use a met_data indexed by datetime." % by)
+            months = self.datetimes.month.to_numpy() - 1
+            if by == 'month':
+                return months, month_names
+            return (months + 1) % 12 // 3, season_names
+
+        if by == 'cluster':
+            sig = self.sig.to_numpy(dtype=np.float64)
+            periods = self.periods.to_numpy(dtype=np.float64)
+            radians = np.deg2rad(self.directions.to_numpy(dtype=np.float64))
+            features = [(sig - np.nanmean(sig)) / np.nanstd(sig), (periods - np.nanmean(periods)) / np.nanstd(periods),
+                        np.cos(radians), np.sin(radians)]
+            features = np.column_stack([feature for feature in features if not np.isnan(feature).all()])
+            complete = ~np.isnan(features).any(axis=1)
+            labels = np.full(num_measures, -1)
+            labels[complete] = kmeans_labels(features[complete], num_divisions, seed)
+            # Renumber the clusters from the lowest median wave height to the highest
+            order = np.argsort(group_medians(sig, labels, num_divisions), kind='stable')
+            labels[complete] = np.argsort(order)[labels[complete]]
+            return labels, None
+
+        raise ValueError("by must be 'index', 'month', 'season', or 'cluster'.")
+
+    def _partition_frame(self, labels, num_groups, names=None):
+        """Returns a DataFrame of the median wave parameters of each group of measurements."""
+        wave_partitions = {param: group_medians(values, labels, num_groups)
+                           for param, values in zip(wave_params, [self.sig, self.directions, self.periods])}
+        return pd.DataFrame(data=wave_partitions, index=names)
+
+    def merge_partitions(self, labels, merge, num_divisions, names=None):
         """
-        Generates num_divisions wave climates based on input meteorological information.
+        Combines divisions into wave climates, and returns the median wave parameters of each climate recomputed over
+        all of its measurements. labels and names are as returned by division_labels for num_divisions divisions
+        (named divisions are as many as their names). merge is a list of lists of the
+        divisions in each climate (by number, or by name for named divisions), or a dict of such lists by climate
+        name, which then names the rows of the result. A division may be in more than one climate.
+        """
+        climate_names = list(merge) if isinstance(merge, dict) else None
+        climates = list(merge.values()) if isinstance(merge, dict) else list(merge)
+        if names is not None:
+            num_divisions = len(names)
+
+        membership = np.zeros([len(climates), num_divisions + 1], dtype=bool)  # the last column is for label -1
+        for climate_num, divisions in enumerate(climates):
+            for division in divisions:
+                if isinstance(division, str):
+                    if names is None or division not in names:
+                        raise ValueError('%s is not the name of a division.' % division)
+                    division = names.index(division)
+                if not 0 <= division < num_divisions:
+                    raise ValueError('Divisions are numbered from 0 to %d.' % (num_divisions - 1))
+                membership[climate_num, division] = True
+
+        # Each measurement is repeated once for each climate its division is in
+        climate_nums, measure_idx = np.nonzero(membership[:, labels])
+        wave_partitions = {}
+        for param, values in zip(wave_params, [self.sig, self.directions, self.periods]):
+            values = np.asarray(values, dtype=np.float64)
+            wave_partitions[param] = group_medians(values[measure_idx], climate_nums, len(climates))
+        return pd.DataFrame(data=wave_partitions, index=climate_names)
+
+    def partition(self, custom_partitioning=False, num_divisions=12, by='index', merge=None, seed=0):
+        """
+        Generates wave climates based on input meteorological information: the median significant wave height, wave
+        direction, and wave period of each division of the measurements. By default, the measurements are split into
+        num_divisions consecutive blocks; by can also divide them by calendar month or season, or into clusters of
+        similar sea states (see division_labels). Calendar divisions are named in the rows of the result.
+
+        If merge is given, divisions are combined into wave climates as merge_partitions describes, e.g.
+        merge={'Winter': ['Dec', 'Jan', 'Feb'], 'Rest': ['Mar', 'Apr', ...]} with by='month', or
+        merge=[[0, 1, 2], [3, 4]] for numbered divisions. The medians of combined divisions are recomputed from all of
+        their measurements.
 
         If custom_partition=True, then the user will see the generated wave climates for all divisions, and will be
         allowed to combine divisions and generate wave climates based on these custom divisions. In this case, the
         custom divisions are returned instead of the specified num_divisions.
         """
 
-        # TODO: allow naming of custom partitions
         def custom_partition(existing_partitions):
-            print('Wave climate medians over ' + str(num_divisions) + ' divisions:')
+            num_existing = len(existing_partitions)
+            print('Wave climate medians over ' + str(num_existing) + ' divisions:')
             print(existing_partitions)
             having_to_loop_this_in_case_of_asshats = True
             while having_to_loop_this_in_case_of_asshats:
@@ -195,7 +381,7 @@ class Wave:
                                     input('List row numbers to include in wave climate ' + str(partition) +
                                           ' (separate divisions with spaces):\n')
                                 division_selects = division_selects.split(' ')
-                                if (any(int(items) > num_divisions-1 for items in division_selects)) or \
+                                if (any(int(items) > num_existing-1 for items in division_selects)) or \
                                    (any(int(items) < 0 for items in division_selects)):
                                     raise ValueError
                                 for idx in np.arange(len(division_selects)):
@@ -203,31 +389,15 @@ class Wave:
                                 division_combos.append(division_selects)
                             except:
                                 print('Input not recognized. Please enter integers from 0 to '
-                                      + str(num_divisions-1))
+                                      + str(num_existing-1))
                     except TypeError:
                         print('Input not recognized. Please enter a positive integer.')
                     having_to_loop_this_in_case_of_asshats = False
 
-                    custom_sig_med = np.zeros(num_custom_partitions)
-                    custom_periods_med = np.zeros(num_custom_partitions)
-                    custom_directions_med = np.zeros(num_custom_partitions)
-
-                    # TODO: make custom partitions based on overall medians, not the averages of the existing medians
-                    for custom_divisions in np.arange(num_custom_partitions):
-                        custom_sig_med[custom_divisions] =\
-                            round(np.nanmean(div_sig_med[division_combos[custom_divisions]]), 3)
-                        custom_periods_med[custom_divisions] =\
-                            round(np.nanmean(div_periods_med[division_combos[custom_divisions]]), 3)
-                        custom_directions_med[custom_divisions] =\
-                            round(np.nanmean(div_directions_med[division_combos[custom_divisions]]), 3)
-
-                    custom_partitions = {'Significant Wave Height': custom_sig_med,
-                                         'Wave Direction': custom_directions_med,
-                                         'Wave Period': custom_periods_med}
-                    custom_partitions = pd.DataFrame(data=custom_partitions)
+                    custom_partitions = self.merge_partitions(labels, division_combos, num_existing)
 
                 elif wave_climate_question.lower() == 'n':
-                    custom_partitions = wave_partitions
+                    custom_partitions = existing_partitions
                     having_to_loop_this_in_case_of_asshats = False
 
                 else:
@@ -235,26 +405,14 @@ class Wave:
 
             return custom_partitions
 
-        measures_per_division = round(len(self.sig)/num_divisions)
-
-        # Partition data into equally spaced divisions and find medians of each partition
-        div_sig_med = np.zeros(num_divisions)
-        div_periods_med = np.zeros(num_divisions)
-        div_directions_med = np.zeros(num_divisions)
+        labels, names = self.division_labels(num_divisions, by, seed)
+        if names is not None:
+            num_divisions = len(names)
 
-        for divisions in np.arange(num_divisions):
-            start_idx = measures_per_division*divisions
-            div_sig = self.sig[start_idx:start_idx+measures_per_division]
-            div_periods = self.periods[start_idx:start_idx+measures_per_division]
-            div_directions = self.directions[start_idx:start_idx+measures_per_division]
-            div_sig_med[divisions] = np.nanmedian(div_sig)
-            div_periods_med[divisions] = np.nanmedian(div_periods)
-            div_directions_med[divisions] = np.nanmedian(div_directions)
+        if merge is not None:
+            return self.merge_partitions(labels, merge, num_divisions, names)
 
-        wave_partitions = {'Significant Wave Height': div_sig_med,
-                           'Wave Direction': div_directions_med,
-                           'Wave Period': div_periods_med}
-        wave_partitions = pd.DataFrame(data=wave_partitions)
+        wave_partitions = self._partition_frame(labels, num_divisions, names)
 
         if custom_partitioning:
             wave_partitions = custom_partition(wave_partitions)
@@ -262,6 +420,135 @@ class Wave:
         return wave_partitions
 
 
+def speed_bin_edges(speeds, num_bins=5):
+    """
+    Returns the edges of num_bins equally-spaced wind speed bins spanning the smallest to the largest speed, ignoring
+    NaN, as a windrose plot bins them by default. speeds may have leading dimensions (e.g. sites or years, padded with
+    NaN to the same length), giving edges of shape (..., num_bins + 1).
+    """
+    speeds = np.asarray(speeds, dtype=np.float64)
+    return np.linspace(np.nanmin(speeds, axis=-1), np.nanmax(speeds, axis=-1), num_bins + 1, axis=-1)
+
+
+def sector_edges(num_sectors=16, sector_offset=0.):
+    """
+    Returns the edges of num_sectors + 1 direction bins, as in windrose: sectors are centered on 0 degrees (north) plus
+    sector_offset, and the last bin wraps around to the first sector.
+    """
+    angle = 360. / num_sectors
+    return np.arange(-angle / 2 + sector_offset, 360. + angle + sector_offset, angle, dtype=float)
+
+
+def sector_indices(directions, num_sectors=16, sector_offset=0.):
+    """
+    Returns the index of the direction sector (see sector_edges) of each direction, as numpy.histogram2d bins them in a
+    windrose, with directions in the last bin wrapped around to the first sector. NaN directions, and directions
+    outside the sector edges, get -1.
+    """
+    directions = np.asarray(directions, dtype=np.float64)
+    dir_edges = sector_edges(num_sectors, sector_offset)
+    dir_idx = np.searchsorted(dir_edges, directions, side='right') - 1
+    dir_idx[directions == dir_edges[-1]] -= 1
+    dir_idx[dir_idx > num_sectors] = -1
+    dir_idx[dir_idx == num_sectors] = 0  # the last bin is the first sector, wrapped around
+    return dir_idx
+
+
+def speed_bin_indices(speeds, speed_edges):
+    """
+    Returns the index of the speed bin of each speed: i for speed_edges[i] <= speed < speed_edges[i + 1], and
+    len(speed_edges) - 1 for speeds at or above the last edge, as in windrose. NaN speeds and speeds below the first
+    edge get -1. speed_edges is 1-D, or has the leading dimensions of speeds (see speed_bin_edges).
+    """
+    speeds = np.asarray(speeds, dtype=np.float64)
+    speed_edges = np.asarray(speed_edges, dtype=np.float64)
+    if speed_edges.ndim > 1:
+        speed_edges = speed_edges[..., np.newaxis, :]
+    return (speeds[..., np.newaxis] >= speed_edges).sum(axis=-1) - 1
+
+
+def joint_bin_counts(speeds, directions, speed_edges, num_sectors=16, sector_offset=0.):
+    """
+    Counts the occurrences of each wind speed and direction combination in one vectorized pass. Speeds and directions
+    are 1-D arrays, or arrays with the same leading dimensions (e.g. sites or years, padded with NaN to the same
+    length) to bin several data sets at once.
+
+    Speed bins are [speed_edges[i], speed_edges[i + 1]), plus a last bin of speeds at or above the last edge, as in
+    windrose; speeds below the first edge aren't counted. speed_edges is 1-D to bin every data set the same way, or has
+    the same leading dimensions as speeds (see speed_bin_edges). Directions are binned into num_sectors sectors centered
+    on 0 degrees plus sector_offset. Pairs with a NaN speed or direction aren't counted.
+    Returns (counts, num_valid): counts of shape (..., len(speed_edges), num_sectors), and the number of pairs with both
+    a speed and a direction, of shape (...).
+    """
+    speeds = np.asarray(speeds, dtype=np.float64)
+    directions = np.asarray(directions, dtype=np.float64)
+    if speeds.shape != directions.shape:
+        raise ValueError('speeds and directions must have the same shape.')
+    lead_shape = speeds.shape[:-1]
+    speeds = speeds.reshape(-1, speeds.shape[-1])
+    directions = directions.reshape(-1, directions.shape[-1])
+    num_sets = len(speeds)
+    speed_edges = np.broadcast_to(np.asarray(speed_edges, dtype=np.float64),
+                                  lead_shape + np.shape(speed_edges)[-1:]).reshape(num_sets, -1)
+    num_speed_bins = speed_edges.shape[-1]
+
+    speed_idx = speed_bin_indices(speeds, speed_edges)
+    dir_idx = sector_indices(directions, num_sectors, sector_offset)
+    valid = (speed_idx >= 0) & (dir_idx >= 0)
+
+    set_idx = np.broadcast_to(np.arange(num_sets)[:, np.newaxis], speeds.shape)
+    flat_idx = (set_idx[valid] * num_speed_bins + speed_idx[valid]) * num_sectors + dir_idx[valid]
+    counts = np.bincount(flat_idx, minlength=num_sets * num_speed_bins * num_sectors)
+    num_valid = (~np.isnan(speeds) & ~np.isnan(directions)).sum(axis=-1)
+
+    return (counts.reshape(lead_shape + (num_speed_bins, num_sectors)).astype(np.float64),
+            num_valid.reshape(lead_shape))
+
+
+def bin_probabilities(speeds, directions, speed_edges=None, num_sectors=16, sector_offset=0.):
+    """
+    Batched Wind.get_bin_probabilities: returns the probability of each wind speed bin and direction sector of one or
+    several data sets (see joint_bin_counts), as an array of shape (..., len(speed_edges) - 1, num_sectors). Speeds at
+    or above the last edge are counted in the last bin, and probabilities are rounded to 5 decimals, as in
+    get_bin_probabilities. speed_edges defaults to 5 equally-spaced bins per data set (see speed_bin_edges).
+    """
+    if speed_edges is None:
+        speed_edges = speed_bin_edges(speeds)
+    counts, num_valid = joint_bin_counts(speeds, directions, speed_edges, num_sectors, sector_offset)
+    return count_probabilities(counts, num_valid)
+
+
+def count_probabilities(counts, num_valid):
+    """
+    Converts joint_bin_counts output to the rounded probabilities of bin_probabilities, with the counts at or above the
+    last speed edge added to the last bin.
+    """
+    num_valid = np.asarray(num_valid, dtype=np.float64)[..., np.newaxis, np.newaxis]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        probabilities = np.round(counts * 100 / num_valid / 100, 5)
+    # since the last row is just the max value and nothing else, that max value can be added to the previous row,
+    # and that last row can be removed
+    probabilities[..., -2, :] += probabilities[..., -1, :]
+    return probabilities[..., :-1, :]
+
+
+def bin_speeds(speed_edges):
+    """Returns the list of the middle speeds of the bins between speed_edges, rounded to 3 decimals."""
+    bin_limits = np.asarray(speed_edges, dtype=np.float64).tolist()
+    return [round((edge0 + (edge1 - edge0) / 2), 3) for edge0, edge1 in zip(bin_limits, bin_limits[1:])]
+
+
+def probability_frame(probabilities, speed_edges, num_sectors=16):
+    """
+    Returns bin probabilities of shape (len(speed_edges) - 1, num_sectors) as the DataFrame of
+    Wind.get_bin_probabilities: the middle speed of each bin in rows, and the center direction of each sector in
+    columns.
+    """
+    # For dirs, 0 degrees is from the north, and degrees increase clockwise (e.g. 90 degrees is from the east)
+    dirs = (np.arange(num_sectors) * 360. / num_sectors).tolist()
+    return pd.DataFrame(probabilities, columns=dirs, index=bin_speeds(speed_edges))
+
+
 class Wind:
     """
     Contains all gathered wind directions and speeds, and functions to partition gathered wind data into closely-related
@@ -273,45 +560,31 @@ class Wind:
         self.directions = wind_data['Wind Direction']
         self.speeds = wind_data['Wind Speed']
 
-    def get_bin_speeds(self):
+    def get_bin_speeds(self, speed_edges=None):
         """
-        Splits the wind speed into five equally-spaced bins, and takes the average speed of each bin. Returns
-        a list of the average bin speeds, lowest average bin speed to highest.
+        Splits the wind speed into five equally-spaced bins (or the bins between speed_edges, if given), and takes the
+        average speed of each bin. Returns a list of the average bin speeds, lowest average bin speed to highest.
         """
 
-        bin_speeds = []
-        ax = windrose.WindroseAxes.from_ax()
-        ax.bar(self.directions, self.speeds, normed=True, nsector=16)
-        bin_limits = ax._info['bins']
-        for edge0, edge1 in zip(bin_limits, bin_limits[1:-1]):
-            bin_speeds.append(round((edge0 + (edge1 - edge0) / 2), 3))
+        if speed_edges is None:
+            speed_edges = speed_bin_edges(self.speeds)
 
-        return bin_speeds
+        return bin_speeds(speed_edges)
 
-    def get_bin_probabilities(self):
+    def get_bin_probabilities(self, speed_edges=None, num_sectors=16):
         """
         Takes the wind speeds and directions and determines the occurrence of each speed/direction combination
         of occurring in the sampled buoy data. Returns a pandas DataFrame with these probabilities of occurrence,
-        speed in rows, and direction in columns.
+        speed in rows, and direction in columns. Speeds are split into five equally-spaced bins (or the bins between
+        speed_edges, if given), and directions into num_sectors sectors centered on north; the bins are the same as
+        those of a windrose plot. Measurements missing a speed or a direction are left out.
         """
 
-        ax = windrose.WindroseAxes.from_ax()
-        ax.bar(self.directions, self.speeds, normed=True, nsector=16)
-
-        bin_percentages = ax._info['table']
-        bin_probabilities = np.round(bin_percentages/100, 5)
-        # since the last row is just the max value and nothing else, that max value can be added to the previous row,
-        # and that last row can be removed
-        bin_probabilities[-2] = bin_probabilities[-1] + bin_probabilities[-2]
-        bin_probabilities = bin_probabilities[:-1]
-
-        bin_speeds = self.get_bin_speeds()
-        # For dirs, 0 degrees is from the north, and degrees increase clockwise (e.g. 90 degrees is from the east)
-        dirs = [0, 22.5, 45, 67.5, 90, 112.5, 135, 157.5, 180, 202.5, 225, 247.5, 270, 292.5, 315, 337.5]
-
-        df = pd.DataFrame(bin_probabilities, columns=dirs, index=bin_speeds)
+        if speed_edges is None:
+            speed_edges = speed_bin_edges(self.speeds)
+        probabilities = bin_probabilities(self.speeds, self.directions, speed_edges, num_sectors)
 
-        return df
+        return probability_frame(probabilities, speed_edges, num_sectors)
 
 
 class Current: